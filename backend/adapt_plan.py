@@ -1,82 +1,67 @@
 # adapt_plan.py - Plan Adaptation and Feedback Analysis Module
-import numpy as np
 import uuid
 import os
+import copy
+import math
+import base64
 import json
 from datetime import datetime, timedelta
 import logging
+import atexit
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from feedback_analytics import FeedbackAnalytics, RunningRegression, trend_direction
+from feedback_rules import RULES_PATH, FeedbackRules
+from feedback_store import FeedbackStore, FeedbackWriter, to_millis
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on the number of sessions accepted by a single batch request
+MAX_FEEDBACK_BATCH_SIZE = 5000
+# Page sizes accepted by the feedback history endpoint
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+# Upper bound on the number of patients in one therapist overview request
+MAX_OVERVIEW_PATIENTS = 500
+OVERVIEW_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+# Session fields the plan optimizer does arithmetic on
+SESSION_NUMERIC_FIELDS = ('painLevelAfter', 'completedSets', 'completedReps', 'targetSets', 'targetReps')
+
+
 class FeedbackAnalyzer:
     """Analyzes exercise feedback and provides personalized recommendations"""
     
-    def __init__(self):
-        self.pain_threshold_high = 7
-        self.pain_threshold_low = 3
-        self.completion_threshold_low = 0.7
-        self.difficulty_adjustment_factors = {
-            'easy': 1.2,  # Increase by 20%
-            'perfect': 1.0,  # No change
-            'hard': 0.8   # Decrease by 20%
-        }
+    def __init__(self, rules_path=RULES_PATH):
+        # Thresholds, recommendations, adjustments and score weights live in feedback_rules.json
+        self.rules = FeedbackRules.load(rules_path)
+        # Called with (user_id, feedback_id, payload, timestamp_ms) for every stored session
+        self.on_stored = None
         self.data_dir = 'data'
+        self.feedback_dir = os.path.join(self.data_dir, 'feedback')
+        self._writer = None
         os.makedirs(self.data_dir, exist_ok=True)
     
+    @property
+    def writer(self):
+        """Write-behind queue in front of the feedback store, opened on first use"""
+        if self._writer is None:
+            self._writer = FeedbackWriter(FeedbackStore(self.feedback_dir))
+            # Drain queued feedback on shutdown
+            atexit.register(self._writer.close)
+        return self._writer
+    
+    @property
+    def store(self):
+        return self.writer.store
+    
     def analyze_feedback(self, feedback_data):
         """Analyze exercise feedback and provide recommendations"""
         try:
-            # Extract key metrics
-            pain_before = feedback_data.get('painLevelBefore', 5)
-            pain_after = feedback_data.get('painLevelAfter', 5)
-            pain_change = pain_after - pain_before
-            difficulty_rating = feedback_data.get('difficultyRating', 'perfect')
-            completion_rate = self._calculate_completion_rate(feedback_data)
-            
-            # Initialize recommendations list
-            recommendations = []
-            adjustments = {}
-            
-            # Analyze pain levels
-            pain_analysis = self._analyze_pain_levels(pain_before, pain_after, pain_change)
-            recommendations.extend(pain_analysis['recommendations'])
-            adjustments.update(pain_analysis['adjustments'])
-            
-            # Analyze difficulty
-            difficulty_analysis = self._analyze_difficulty(difficulty_rating, completion_rate)
-            recommendations.extend(difficulty_analysis['recommendations'])
-            adjustments.update(difficulty_analysis['adjustments'])
-            
-            # Analyze completion rate
-            completion_analysis = self._analyze_completion_rate(completion_rate)
-            recommendations.extend(completion_analysis['recommendations'])
-            adjustments.update(completion_analysis['adjustments'])
-            
-            # Calculate overall exercise effectiveness score
-            effectiveness_score = self._calculate_effectiveness_score(
-                pain_change, completion_rate, difficulty_rating
-            )
-            
-            return {
-                'recommendations': recommendations,
-                'adjustments': adjustments,
-                'effectiveness_score': effectiveness_score,
-                'pain_analysis': {
-                    'pain_change': pain_change,
-                    'is_beneficial': pain_change <= 0,
-                    'severity': self._get_pain_severity(pain_after)
-                },
-                'completion_analysis': {
-                    'completion_rate': completion_rate,
-                    'is_adequate': completion_rate >= self.completion_threshold_low
-                },
-                'difficulty_analysis': {
-                    'rating': difficulty_rating,
-                    'is_appropriate': difficulty_rating == 'perfect'
-                }
-            }
+            return self.rules.evaluate(feedback_data)
             
         except Exception as e:
             logger.error(f"Error analyzing feedback: {e}")
@@ -86,224 +71,306 @@ class FeedbackAnalyzer:
                 'effectiveness_score': 0.5,
                 'error': str(e)
             }
-    
-    def _calculate_completion_rate(self, feedback_data):
-        """Calculate completion rate based on sets and reps"""
-        completed_sets = feedback_data.get('completedSets', 0)
-        target_sets = feedback_data.get('targetSets', 1)
-        completed_reps = feedback_data.get('completedReps', 0)
-        target_reps = feedback_data.get('targetReps', 1)
-        
-        sets_completion = completed_sets / max(target_sets, 1)
-        reps_completion = completed_reps / max(target_reps, 1)
-        
-        return (sets_completion + reps_completion) / 2
-    
-    def _analyze_pain_levels(self, pain_before, pain_after, pain_change):
-        """Analyze pain level changes and provide recommendations"""
-        recommendations = []
-        adjustments = {}
-        
-        if pain_after >= self.pain_threshold_high:
-            recommendations.append("High pain level detected. Consider reducing exercise intensity.")
-            adjustments['intensity_multiplier'] = 0.7
-            adjustments['rest_time_multiplier'] = 1.5
-        elif pain_change > 2:
-            recommendations.append("Pain increased significantly. Monitor closely and consider modifications.")
-            adjustments['intensity_multiplier'] = 0.8
-        elif pain_change < -2:
-            recommendations.append("Great! Pain decreased significantly. This exercise is very beneficial.")
-            adjustments['intensity_multiplier'] = 1.1
-        elif pain_change <= 0:
-            recommendations.append("Exercise helped maintain or reduce pain levels. Continue as prescribed.")
-        
-        if pain_before >= self.pain_threshold_high and pain_after < pain_before:
-            recommendations.append("Excellent progress! Pre-exercise pain was high but improved.")
-        
-        return {
-            'recommendations': recommendations,
-            'adjustments': adjustments
-        }
-    
-    def _analyze_difficulty(self, difficulty_rating, completion_rate):
-        """Analyze difficulty rating and provide recommendations"""
-        recommendations = []
-        adjustments = {}
-        
-        if difficulty_rating == 'easy':
-            recommendations.append("Exercise seems too easy. Consider increasing intensity next time.")
-            adjustments['sets_multiplier'] = 1.2
-            adjustments['reps_multiplier'] = 1.1
-            adjustments['difficulty_level'] = 'intermediate'
-        elif difficulty_rating == 'hard':
-            if completion_rate < 0.7:
-                recommendations.append("Exercise is too challenging. Reducing intensity recommended.")
-                adjustments['sets_multiplier'] = 0.8
-                adjustments['reps_multiplier'] = 0.9
-                adjustments['difficulty_level'] = 'beginner'
-            else:
-                recommendations.append("Exercise is challenging but manageable. Good work!")
-        elif difficulty_rating == 'perfect':
-            recommendations.append("Perfect difficulty level! Maintain current intensity.")
-        
-        return {
-            'recommendations': recommendations,
-            'adjustments': adjustments
-        }
-    
-    def _analyze_completion_rate(self, completion_rate):
-        """Analyze completion rate and provide recommendations"""
-        recommendations = []
-        adjustments = {}
-        
-        if completion_rate < 0.5:
-            recommendations.append("Low completion rate. Focus on form over quantity.")
-            adjustments['sets_multiplier'] = 0.7
-            adjustments['reps_multiplier'] = 0.8
-        elif completion_rate < self.completion_threshold_low:
-            recommendations.append("Completion rate could be improved. Consider slight intensity reduction.")
-            adjustments['sets_multiplier'] = 0.9
-        elif completion_rate >= 1.0:
-            recommendations.append("Excellent completion rate! You might be ready for more challenge.")
-            adjustments['sets_multiplier'] = 1.1
-        
-        return {
-            'recommendations': recommendations,
-            'adjustments': adjustments
-        }
-    
-    def _calculate_effectiveness_score(self, pain_change, completion_rate, difficulty_rating):
-        """Calculate overall exercise effectiveness score (0-1)"""
-        score = 0.5  # Base score
-        
-        # Pain contribution (40% of score)
-        if pain_change <= -2:
-            score += 0.4  # Significant pain reduction
-        elif pain_change <= 0:
-            score += 0.2  # Pain maintained or slightly reduced
-        elif pain_change <= 2:
-            score -= 0.1  # Slight pain increase
-        else:
-            score -= 0.3  # Significant pain increase
-        
-        # Completion contribution (30% of score)
-        if completion_rate >= 0.9:
-            score += 0.3
-        elif completion_rate >= 0.7:
-            score += 0.2
-        elif completion_rate >= 0.5:
-            score += 0.1
-        else:
-            score -= 0.2
-        
-        # Difficulty contribution (30% of score)
-        if difficulty_rating == 'perfect':
-            score += 0.3
-        elif difficulty_rating == 'easy':
-            score += 0.1
-        else:  # hard
-            score += 0.15
-        
-        return max(0.0, min(1.0, score))
-    
-    def _get_pain_severity(self, pain_level):
-        """Get pain severity description"""
-        if pain_level == 0:
-            return 'no_pain'
-        elif pain_level <= 3:
-            return 'mild'
-        elif pain_level <= 5:
-            return 'moderate'
-        elif pain_level <= 7:
-            return 'severe'
-        else:
-            return 'very_severe'
+
+    def analyze_feedback_batch(self, feedback_list):
+        """analyze_feedback for many sessions at once; returns the same result for each item.
+
+        The rules are evaluated over the whole batch with masked NumPy
+        operations (see FeedbackRules.evaluate_batch). Items that are not
+        dicts or whose fields are not numbers go through analyze_feedback to
+        get its error handling.
+        """
+        results = self.rules.evaluate_batch(feedback_list)
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = self.analyze_feedback(feedback_list[i])
+        return results
 
     def store_feedback(self, feedback_data, analysis_result):
         """Store feedback data for future analysis"""
         try:
             feedback_id = str(uuid.uuid4())
-            feedback_file = f"{self.data_dir}/feedback_{feedback_id}.json"
-            
-            with open(feedback_file, 'w') as f:
-                json.dump({
-                    'id': feedback_id,
-                    'feedback': feedback_data,
-                    'analysis': analysis_result,
-                    'timestamp': datetime.now().isoformat()
-                }, f, indent=2)
+            timestamp = datetime.now()
+            payload = {
+                'id': feedback_id,
+                'feedback': feedback_data,
+                'analysis': analysis_result,
+                'timestamp': timestamp.isoformat()
+            }
+            user_id, exercise_id = feedback_ids(feedback_data)
             
-            return feedback_id
+            # Queued for the background writer; the request does not wait for the disk
+            self.writer.submit(
+                payload,
+                user_id=user_id,
+                exercise_id=exercise_id,
+                timestamp=timestamp,
+            )
         except Exception as e:
             logger.error(f"Error storing feedback: {e}")
             return None
+        
+        # The feedback is queued and will be written whatever happens here
+        if self.on_stored is not None and user_id:
+            try:
+                self.on_stored(user_id, feedback_id, payload, to_millis(timestamp))
+            except Exception as e:
+                logger.error(f"Error updating analytics for feedback {feedback_id}: {e}")
+        return feedback_id
 
+    def store_with_pending(self):
+        """The feedback store once this process's queued feedback has been written"""
+        self.writer.flush(timeout=5)
+        return self.store
+
+    def load_feedback(self, user_id, exercise_id=None, start=None, end=None):
+        """Stored feedback records for a user, optionally one exercise and a time window"""
+        return self.store_with_pending().scan(user_id=user_id, exercise_id=exercise_id, start=start, end=end)
+
+    def load_feedback_page(self, user_id, exercise_id=None, start=None, end=None, after=None,
+                           limit=DEFAULT_HISTORY_PAGE_SIZE, descending=True):
+        """One page of a user's stored feedback, newest first by default"""
+        return self.store_with_pending().page(
+            user_id=user_id, exercise_id=exercise_id, start=start, end=end,
+            after=after, limit=limit, descending=descending
+        )
+
+
+def feedback_ids(feedback_data):
+    """(userId, exerciseId) of a feedback session as the store keys it, None where absent.
+
+    Numeric ids are stored as their string form; any other type raises ValueError.
+    """
+    ids = []
+    for field in ('userId', 'exerciseId'):
+        value = feedback_data.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif value is not None and not isinstance(value, str):
+            raise ValueError(f"{field} must be a string or number")
+        ids.append(value)
+    return tuple(ids)
+
+
+def validate_session(feedback):
+    """Raise ValueError unless feedback is a session the plan optimizer can fold in"""
+    if not isinstance(feedback, dict):
+        raise ValueError("Each feedback session must be an object")
+    for field in SESSION_NUMERIC_FIELDS:
+        if field not in feedback:
+            continue
+        value = feedback[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"{field} must be a number")
+
+
+def history_key(user_id, exercise_id):
+    """Index key of one user's history for one exercise in the plan history store"""
+    return f"{user_id}\x1f{exercise_id}"
+
+
+def _feedback_key(feedback):
+    """Identifies a session well enough to tell whether a history was extended or replaced"""
+    return (
+        feedback.get('timestamp'),
+        feedback.get('painLevelAfter'),
+        feedback.get('difficultyRating'),
+        feedback.get('completedSets'),
+        feedback.get('completedReps'),
+    )
+
+
+class SessionTrends:
+    """Running pain, completion and difficulty regressions for one user's exercise"""
+
+    __slots__ = ('pain', 'completion', 'difficulty', 'last')
 
-class ExercisePlanOptimizer:
-    """Optimizes exercise plans based on user feedback and machine learning"""
-    
     def __init__(self):
-        self.feedback_history = []
-    
+        self.pain = RunningRegression()
+        self.completion = RunningRegression()
+        self.difficulty = RunningRegression()
+        self.last = None
+
+    @property
+    def count(self):
+        return self.pain.n
+
+    def copy(self):
+        trends = SessionTrends()
+        trends.pain = copy.copy(self.pain)
+        trends.completion = copy.copy(self.completion)
+        trends.difficulty = copy.copy(self.difficulty)
+        trends.last = self.last
+        return trends
+
+
+class ExercisePlanOptimizer:
+    """Optimizes exercise plans based on user feedback and machine learning.
+
+    Clients either send the whole feedbackHistory with every request, or only
+    the sessions the server does not hold yet (optimize_with_new_feedback).
+    The server-held histories are appended to their own FeedbackStore, indexed
+    by user and by history_key(user, exercise), so one user's exercise history
+    is a single index lookup and its length is the client's sequence number.
+    """
+
+    # Users/exercises whose running trend statistics are kept in memory
+    MAX_TRACKED = 10000
+
+    def __init__(self, history_dir='data/plan_history'):
+        self.history_dir = history_dir
+        self._history_store = None
+        self._trends = OrderedDict()
+        self._held = OrderedDict()
+        self._trends_lock = threading.Lock()
+
+    @property
+    def history_store(self):
+        """Server-held feedback histories, opened on first use"""
+        if self._history_store is None:
+            self._history_store = FeedbackStore(self.history_dir)
+            atexit.register(self._history_store.close)
+        return self._history_store
+
     def optimize_exercise_plan(self, user_id, exercise_id, feedback_history):
         """Optimize exercise parameters based on feedback history"""
         try:
             if not feedback_history:
                 return {'status': 'no_data', 'message': 'Insufficient data for optimization'}
             
-            # Analyze trends
-            trends = self._analyze_trends(feedback_history)
-            
-            # Generate optimized parameters
-            optimized_params = self._generate_optimized_parameters(
-                feedback_history[-1], trends
-            )
-            
-            return {
-                'status': 'success',
-                'optimized_parameters': optimized_params,
-                'trends': trends,
-                'recommendations': self._generate_optimization_recommendations(trends)
-            }
+            return self._optimize(self._sync_trends(user_id, exercise_id, feedback_history))
             
         except Exception as e:
             logger.error(f"Error optimizing exercise plan: {e}")
             return {'status': 'error', 'message': str(e)}
-    
-    def _analyze_trends(self, feedback_history):
-        """Analyze trends in feedback data"""
-        if len(feedback_history) < 3:
-            return {'insufficient_data': True}
+
+    def optimize_with_new_feedback(self, user_id, exercise_id, new_feedback, sequence=None):
+        """Optimize against the server-held history after appending the client's new sessions.
+
+        sequence is the number of sessions the client believes the server
+        holds, i.e. the position of new_feedback[0] in the history; None means
+        new_feedback follows whatever is held. Sessions the server already has
+        (a retried request) are skipped. A sequence beyond the held history
+        returns status 'resync' with the held count so the client can resend
+        from there. Every other response carries the new 'sequence'.
+        """
+        try:
+            if not user_id or not exercise_id:
+                return {'status': 'error', 'message': 'userId and exerciseId are required'}
+
+            with self._trends_lock:
+                state = self._held_state(user_id, exercise_id)
+                held = state.count
+                if sequence is None:
+                    sequence = held
+                if sequence < 0 or sequence > held:
+                    return {
+                        'status': 'resync',
+                        'message': f'Server holds {held} sessions; resend from there',
+                        'sequence': held
+                    }
+
+                new_sessions = new_feedback[held - sequence:]
+                if new_sessions:
+                    # Fold into a copy first: a session that cannot be folded in
+                    # must not reach the store, where every later call would replay it
+                    folded = state.copy()
+                    for feedback in new_sessions:
+                        validate_session(feedback)
+                        self._add_session(folded, feedback)
+                    key = history_key(user_id, exercise_id)
+                    store = self.history_store
+                    store.append_many([
+                        ({'sequence': held + i, 'feedback': feedback}, user_id, key, None)
+                        for i, feedback in enumerate(new_sessions)
+                    ])
+                    # The sequence handed back must survive a crash
+                    store.sync()
+                    state = self._held[key] = folded
+
+                if not state.count:
+                    result = {'status': 'no_data', 'message': 'Insufficient data for optimization'}
+                else:
+                    result = self._optimize(state)
+                result['sequence'] = state.count
+                return result
+
+        except Exception as e:
+            logger.error(f"Error optimizing exercise plan: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def _optimize(self, state):
+        # Analyze trends
+        trends = self._analyze_trends(state)
         
-        # Extract metrics over time
-        pain_levels = [f.get('painLevelAfter', 5) for f in feedback_history]
-        completion_rates = [self._calculate_completion_rate_simple(f) for f in feedback_history]
-        difficulty_scores = [self._get_difficulty_score(f.get('difficultyRating', 'perfect')) for f in feedback_history]
+        # Generate optimized parameters
+        optimized_params = self._generate_optimized_parameters(state.last, trends)
         
         return {
-            'pain_trend': self._calculate_trend(pain_levels),
-            'completion_trend': self._calculate_trend(completion_rates),
-            'difficulty_trend': self._calculate_trend(difficulty_scores),
-            'average_pain': np.mean(pain_levels),
-            'average_completion': np.mean(completion_rates),
-            'sessions_count': len(feedback_history)
+            'status': 'success',
+            'optimized_parameters': optimized_params,
+            'trends': trends,
+            'recommendations': self._generate_optimization_recommendations(trends)
         }
-    
-    def _calculate_trend(self, values):
-        """Calculate trend direction (improving, stable, declining)"""
-        if len(values) < 3:
-            return 'insufficient_data'
-        
-        # Simple linear trend
-        x = np.arange(len(values))
-        slope = np.polyfit(x, values, 1)[0]
-        
-        if abs(slope) < 0.1:
-            return 'stable'
-        elif slope > 0:
-            return 'increasing'
+
+    def _state(self, states, key):
+        state = states.get(key)
+        if state is None:
+            state = states[key] = SessionTrends()
+            if len(states) > self.MAX_TRACKED:
+                states.popitem(last=False)
         else:
-            return 'decreasing'
+            states.move_to_end(key)
+        return state
+
+    def _held_state(self, user_id, exercise_id):
+        """Running trends over the server-held history, rebuilt if another process appended to it"""
+        key = history_key(user_id, exercise_id)
+        store = self.history_store
+        state = self._state(self._held, key)
+        if state.count != store.count(exercise_id=key):
+            records = sorted(store.scan(exercise_id=key), key=lambda record: record['sequence'])
+            state = self._held[key] = SessionTrends()
+            for record in records:
+                self._add_session(state, record['feedback'])
+        return state
+
+    def _sync_trends(self, user_id, exercise_id, feedback_history):
+        """Running trends covering feedback_history, folding in only the sessions not seen yet.
+
+        Clients resend the whole history, which normally extends the previous
+        one; anything else (shorter, or a different session where the last one
+        seen should be) rebuilds the statistics from scratch.
+        """
+        with self._trends_lock:
+            state = self._state(self._trends, (user_id, exercise_id))
+            seen = state.count
+            if seen and (seen > len(feedback_history) or _feedback_key(feedback_history[seen - 1]) != _feedback_key(state.last)):
+                state = self._trends[(user_id, exercise_id)] = SessionTrends()
+                seen = 0
+            for feedback in feedback_history[seen:]:
+                self._add_session(state, feedback)
+            return state
+
+    def _add_session(self, state, feedback):
+        state.pain.add(feedback.get('painLevelAfter', 5))
+        state.completion.add(self._calculate_completion_rate_simple(feedback))
+        state.difficulty.add(self._get_difficulty_score(feedback.get('difficultyRating', 'perfect')))
+        state.last = feedback
+
+    def _analyze_trends(self, state):
+        """Analyze trends from running statistics in constant time"""
+        if state.count < 3:
+            return {'insufficient_data': True}
+        
+        return {
+            'pain_trend': trend_direction(state.pain.slope()),
+            'completion_trend': trend_direction(state.completion.slope()),
+            'difficulty_trend': trend_direction(state.difficulty.slope()),
+            'average_pain': state.pain.mean(),
+            'average_completion': state.completion.mean(),
+            'sessions_count': state.count
+        }
     
     def _calculate_completion_rate_simple(self, feedback):
         """Simple completion rate calculation"""
@@ -368,108 +435,27 @@ class ExercisePlanOptimizer:
         elif trends.get('completion_trend') == 'increasing':
             recommendations.append("Completion rates are improving. Consider gradual progression.")
         
-        if trends.get('average_pain') > 7:
+        if trends.get('average_pain', 0) > 7:
             recommendations.append("Average pain levels are high. Prioritize pain management.")
         
         return recommendations
 
 
-class MockDataGenerator:
-    """Generates mock trend and insight data for API endpoints"""
-    
-    @staticmethod
-    def get_feedback_trends(user_id, days_back=30):
-        """Generate mock trend data based on typical rehabilitation patterns"""
-        return {
-            'pain_levels': [6, 5.5, 5, 4.5, 4, 3.5, 3],
-            'completion_rates': [0.7, 0.75, 0.8, 0.85, 0.9, 0.92, 0.95],
-            'difficulty_ratings': ['hard', 'hard', 'perfect', 'perfect', 'perfect', 'easy', 'easy'],
-            'dates': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', 
-                     '2024-01-05', '2024-01-06', '2024-01-07'],
-            'overall_trend': 'improving',
-            'recommendations': [
-                'Pain levels are decreasing consistently - excellent progress!',
-                'Completion rates are improving steadily',
-                'Recent exercises seem too easy - consider progression'
-            ]
-        }
-    
-    @staticmethod
-    def get_exercise_insights(user_id, exercise_id):
-        """Generate mock insights data for specific exercise"""
-        return {
-            'total_attempts': 15,
-            'average_completion': 0.87,
-            'pain_improvement': -2.3,  # Negative means improvement
-            'difficulty_trend': 'stable',
-            'last_performed': '2024-01-07',
-            'recommendations': [
-                'Exercise is showing good pain reduction benefits',
-                'Completion rate is excellent - consider slight progression',
-                'Maintain current difficulty level'
-            ],
-            'effectiveness_score': 0.83,
-            'pain_levels_over_time': [6, 5, 4, 4, 3, 3, 2],
-            'difficulty_distribution': {
-                'easy': 3,
-                'perfect': 10,
-                'hard': 2
-            }
-        }
-    
-    @staticmethod
-    def get_user_analytics(user_id, time_period=30):
-        """Generate comprehensive analytics for a user"""
-        return {
-            'summary': {
-                'total_sessions': 25,
-                'average_pain_reduction': 2.1,
-                'overall_adherence': 0.85,
-                'effectiveness_score': 0.78
-            },
-            'pain_analytics': {
-                'average_pre_pain': 6.2,
-                'average_post_pain': 4.1,
-                'pain_reduction_trend': 'improving',
-                'best_exercises_for_pain': [
-                    'Straight Leg Raises',
-                    'Wall Squats',
-                    'Knee Extensions'
-                ]
-            },
-            'difficulty_analytics': {
-                'distribution': {'easy': 30, 'perfect': 60, 'hard': 10},
-                'trend': 'becoming_easier',
-                'progression_ready': True
-            },
-            'completion_analytics': {
-                'average_completion': 0.87,
-                'trend': 'improving',
-                'consistency_score': 0.82
-            },
-            'recommendations': [
-                'Excellent progress with consistent pain reduction',
-                'Ready for progression to more challenging exercises',
-                'Maintain current exercise frequency',
-                'Consider adding strength-focused exercises'
-            ],
-            'goals_progress': {
-                'pain_reduction': 0.85,  # 85% achieved
-                'range_of_motion': 0.72,
-                'strength': 0.60,
-                'daily_function': 0.78
-            }
-        }
-
-
 # Global instances
 feedback_analyzer = FeedbackAnalyzer()
 plan_optimizer = ExercisePlanOptimizer()
-mock_data = MockDataGenerator()
+feedback_analytics = FeedbackAnalytics(
+    lambda: feedback_analyzer.store_with_pending(),
+    lambda: feedback_analyzer.store
+)
+# Keep the daily rollups behind get_user_analytics current as feedback arrives
+feedback_analyzer.on_stored = feedback_analytics.record
 
 # Public interface functions
 def analyze_exercise_feedback(feedback_data):
     """Public interface to analyze exercise feedback"""
+    if isinstance(feedback_data, dict):
+        feedback_ids(feedback_data)  # ValueError before anything is stored
     analysis_result = feedback_analyzer.analyze_feedback(feedback_data)
     
     # Store feedback for future analysis
@@ -481,13 +467,95 @@ def analyze_exercise_feedback(feedback_data):
         'analysis': analysis_result
     }
 
+def analyze_exercise_feedback_batch(feedback_list):
+    """Public interface to analyze many feedback sessions, e.g. an offline sync"""
+    if len(feedback_list) > MAX_FEEDBACK_BATCH_SIZE:
+        raise ValueError(f"Batch size {len(feedback_list)} exceeds the limit of {MAX_FEEDBACK_BATCH_SIZE}")
+    for i, feedback_data in enumerate(feedback_list):
+        if isinstance(feedback_data, dict):
+            try:
+                feedback_ids(feedback_data)
+            except ValueError as e:
+                raise ValueError(f"Feedback {i}: {e}")
+    analyses = feedback_analyzer.analyze_feedback_batch(feedback_list)
+    
+    return [
+        {
+            'status': 'success',
+            'feedback_id': feedback_analyzer.store_feedback(feedback_data, analysis_result),
+            'analysis': analysis_result
+        }
+        for feedback_data, analysis_result in zip(feedback_list, analyses)
+    ]
+
 def optimize_plan_based_on_feedback(user_id, exercise_id, feedback_history):
     """Public interface to optimize exercise plan"""
     return plan_optimizer.optimize_exercise_plan(user_id, exercise_id, feedback_history)
 
+def optimize_plan_with_new_feedback(user_id, exercise_id, new_feedback, sequence=None):
+    """Public interface to optimize an exercise plan against the server-held history"""
+    return plan_optimizer.optimize_with_new_feedback(user_id, exercise_id, new_feedback, sequence)
+
+def encode_cursor(entry):
+    """Opaque page cursor for a store index entry"""
+    return base64.urlsafe_b64encode(json.dumps(list(entry)).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        timestamp_ms, segment_name, offset = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return int(timestamp_ms), str(segment_name), int(offset)
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+def project(record, fields):
+    """Copy of record with only the given fields; dotted names select nested keys"""
+    projected = {}
+    for field in fields:
+        *parents, leaf = field.split('.')
+        source = record
+        for name in parents:
+            source = source.get(name) if isinstance(source, dict) else None
+        if not isinstance(source, dict) or leaf not in source:
+            continue
+        target = projected
+        for name in parents:
+            target = target.setdefault(name, {})
+        target[leaf] = source[leaf]
+    return projected
+
+def get_feedback_history(user_id, exercise_id=None, start=None, end=None, cursor=None,
+                         limit=DEFAULT_HISTORY_PAGE_SIZE, fields=None, order='desc'):
+    """Public interface to page through a user's stored feedback"""
+    if not user_id:
+        raise ValueError("userId is required")
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}")
+    for name, value in (('start', start), ('end', end)):
+        try:
+            to_millis(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an ISO date or epoch milliseconds")
+    records, last_entry = feedback_analyzer.load_feedback_page(
+        user_id, exercise_id, start, end,
+        after=decode_cursor(cursor) if cursor else None,
+        limit=limit,
+        descending=order == 'desc'
+    )
+    if fields:
+        records = [project(record, fields) for record in records]
+    return {
+        'status': 'success',
+        'user_id': user_id,
+        'items': records,
+        'count': len(records),
+        'next_cursor': encode_cursor(last_entry) if last_entry is not None else None,
+    }
+
 def get_feedback_trends(user_id, days_back=30):
     """Public interface to get feedback trends"""
-    trends = mock_data.get_feedback_trends(user_id, days_back)
+    trends = feedback_analytics.feedback_trends(user_id, days_back)
     return {
         'status': 'success',
         'trends': trends,
@@ -497,7 +565,7 @@ def get_feedback_trends(user_id, days_back=30):
 
 def get_exercise_insights(user_id, exercise_id):
     """Public interface to get exercise insights"""
-    insights = mock_data.get_exercise_insights(user_id, exercise_id)
+    insights = feedback_analytics.exercise_insights(user_id, exercise_id)
     return {
         'status': 'success',
         'insights': insights,
@@ -507,7 +575,7 @@ def get_exercise_insights(user_id, exercise_id):
 
 def get_user_analytics(user_id, time_period=30):
     """Public interface to get user analytics"""
-    analytics = mock_data.get_user_analytics(user_id, time_period)
+    analytics = feedback_analytics.user_analytics(user_id, time_period)
     return {
         'status': 'success',
         'analytics': analytics,
@@ -516,6 +584,40 @@ def get_user_analytics(user_id, time_period=30):
         'generated_at': datetime.now().isoformat()
     }
 
+_overview_pool = None
+_overview_pool_lock = threading.Lock()
+
+def _patient_overview(user_id, time_period):
+    try:
+        return {'status': 'success', **feedback_analytics.patient_overview(user_id, time_period)}
+    except Exception as e:
+        logger.error(f"Error building overview for {user_id}: {e}")
+        return {'user_id': user_id, 'status': 'error', 'message': str(e)}
+
+def get_therapist_overview(patient_ids, time_period=30):
+    """Public interface to summarize many patients in one call, one pool task per patient"""
+    global _overview_pool
+    if len(patient_ids) > MAX_OVERVIEW_PATIENTS:
+        raise ValueError(f"At most {MAX_OVERVIEW_PATIENTS} patients per overview request")
+    if not all(isinstance(user_id, str) for user_id in patient_ids):
+        raise ValueError("patientIds must be a list of strings")
+    patient_ids = list(dict.fromkeys(patient_ids))
+    if len(patient_ids) <= 1:
+        patients = [_patient_overview(user_id, time_period) for user_id in patient_ids]
+    else:
+        with _overview_pool_lock:
+            if _overview_pool is None:
+                _overview_pool = ThreadPoolExecutor(max_workers=OVERVIEW_WORKERS, thread_name_prefix='overview')
+                atexit.register(_overview_pool.shutdown)
+        patients = list(_overview_pool.map(lambda user_id: _patient_overview(user_id, time_period), patient_ids))
+    return {
+        'status': 'success',
+        'time_period_days': time_period,
+        'count': len(patients),
+        'patients': patients,
+        'generated_at': datetime.now().isoformat()
+    }
+
 def check_adaptation_health():
     """Check if adaptation services are ready"""
     return {
@@ -523,7 +625,9 @@ def check_adaptation_health():
         'services': {
             'feedback_analyzer': 'available',
             'plan_optimizer': 'available',
-            'mock_data_generator': 'available'
+            'feedback_analytics': 'available'
         },
+        'feedback_writer': feedback_analyzer._writer.status() if feedback_analyzer._writer is not None else None,
+        'feedback_rules_version': feedback_analyzer.rules.version,
         'data_directory': os.path.exists('data')
     }
\ No newline at end of file
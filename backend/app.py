@@ -1,13 +1,21 @@
 # app.py - Main Flask Application (Modularized)
+import time
+_startup_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
 import os
 from datetime import datetime
 from flask_cors import CORS
 import logging
+import multiprocessing
 
 # Import our custom modules
 import generate_plan
 import adapt_plan
+import training_jobs
+
+# Seconds spent in each startup step, also reported by /api/health
+STARTUP_TIMINGS = {'imports': round(time.perf_counter() - _startup_started, 3)}
 
 app = Flask(__name__)
 CORS(app)
@@ -16,6 +24,17 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def days_param(data, field):
+    """data[field] as a whole number of days (default 30, null for all time); ValueError otherwise"""
+    days = data.get(field, 30)
+    if days is None:
+        return None
+    if isinstance(days, float) and days.is_integer():
+        days = int(days)
+    if isinstance(days, bool) or not isinstance(days, int) or days < 0:
+        raise ValueError(f'{field} must be a non-negative integer')
+    return days
+
 # API routes - Plan Generation
 @app.route('/api/generate_plan', methods=['POST'])
 def api_generate_plan():
@@ -29,6 +48,31 @@ def api_generate_plan():
         print(f"Error in /generate_plan: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/generate_plans_batch', methods=['POST'])
+def api_generate_plans_batch():
+    """Generate plans for many users in one request"""
+    data = request.json
+    rehab_data_list = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(rehab_data_list, list):
+        return jsonify({'error': 'Expected a JSON array of plan requests or {"requests": [...]}'}), 400
+    
+    try:
+        results = generate_plan.generate_rehabilitation_plans(rehab_data_list)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in generate_plans_batch: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    failed = sum(1 for r in results if r['status'] == 'error')
+    return jsonify({
+        'status': 'success',
+        'count': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'results': results
+    })
+
 @app.route('/api/model_metrics', methods=['GET'])
 def get_model_metrics():
     try:
@@ -39,16 +83,26 @@ def get_model_metrics():
 
 @app.route('/api/retrain_models', methods=['POST'])
 def retrain_models():
+    """Start retraining in the background; poll /api/retrain_models/<job_id> for progress"""
     try:
-        encoder, difficulty_model, sets_model, reps_model, metrics = generate_plan.retrain_plan_models()
+        job, created = training_jobs.submit_retrain_job()
         return jsonify({
-            'status': 'success',
-            'message': 'Models retrained successfully',
-            'metrics': metrics
-        })
+            'status': 'accepted',
+            'message': 'Retraining started' if created else 'Retraining already in progress',
+            'job_id': job['job_id'],
+            'job': job
+        }), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/retrain_models/<job_id>', methods=['GET'])
+def retrain_job_status(job_id):
+    job = training_jobs.get_retrain_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    job.pop('traceback', None)
+    return jsonify(job)
+
 # API routes - Feedback Analysis and Plan Adaptation
 @app.route('/api/analyze_feedback', methods=['POST'])
 def analyze_feedback():
@@ -63,23 +117,71 @@ def analyze_feedback():
         result = adapt_plan.analyze_exercise_feedback(feedback_data)
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in analyze_feedback: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/analyze_feedback_batch', methods=['POST'])
+def analyze_feedback_batch():
+    """Analyze many feedback sessions in one request, e.g. after an offline sync"""
+    data = request.json
+    feedback_list = data.get('feedback') if isinstance(data, dict) else data
+    if not isinstance(feedback_list, list):
+        return jsonify({'error': 'Expected a JSON array of feedback or {"feedback": [...]}'}), 400
+    
+    logger.info(f"Analyzing {len(feedback_list)} feedback sessions")
+    try:
+        results = adapt_plan.analyze_exercise_feedback_batch(feedback_list)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in analyze_feedback_batch: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'status': 'success',
+        'count': len(results),
+        'results': results
+    })
+
 @app.route('/api/optimize_plan', methods=['POST'])
 def optimize_exercise_plan():
-    """Optimize exercise plan based on feedback history"""
+    """Optimize exercise plan based on feedback history.
+
+    Send either the whole feedbackHistory, or newFeedback with sequence (the
+    'sequence' returned by the previous call) to have the server keep the history.
+    """
     try:
         data = request.json
         user_id = data.get('userId')
         exercise_id = data.get('exerciseId')
-        feedback_history = data.get('feedbackHistory', [])
         
         logger.info(f"Optimizing plan for user {user_id}, exercise {exercise_id}")
         
         # Optimize using our module
-        result = adapt_plan.optimize_plan_based_on_feedback(user_id, exercise_id, feedback_history)
+        if 'newFeedback' in data:
+            sequence = data.get('sequence')
+            if sequence is not None:
+                if isinstance(sequence, float) and sequence.is_integer():
+                    sequence = int(sequence)
+                if isinstance(sequence, bool) or not isinstance(sequence, int) or sequence < 0:
+                    return jsonify({'error': 'sequence must be a non-negative integer'}), 400
+            new_feedback = data['newFeedback']
+            if not isinstance(new_feedback, list):
+                return jsonify({'error': 'newFeedback must be a list of feedback sessions'}), 400
+            try:
+                for feedback in new_feedback:
+                    adapt_plan.validate_session(feedback)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            result = adapt_plan.optimize_plan_with_new_feedback(
+                user_id, exercise_id, new_feedback, sequence
+            )
+        else:
+            feedback_history = data.get('feedbackHistory', [])
+            result = adapt_plan.optimize_plan_based_on_feedback(user_id, exercise_id, feedback_history)
         return jsonify(result)
         
     except Exception as e:
@@ -89,10 +191,14 @@ def optimize_exercise_plan():
 @app.route('/api/feedback_trends', methods=['POST'])
 def get_feedback_trends():
     """Get feedback trends for a user"""
+    data = request.json or {}
+    try:
+        days_back = days_param(data, 'daysBack')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
-        data = request.json
         user_id = data.get('userId')
-        days_back = data.get('daysBack', 30)
         
         result = adapt_plan.get_feedback_trends(user_id, days_back)
         return jsonify(result)
@@ -119,10 +225,14 @@ def get_exercise_insights():
 @app.route('/api/user_analytics', methods=['POST'])
 def get_user_analytics():
     """Get comprehensive analytics for a user"""
+    data = request.json or {}
+    try:
+        time_period = days_param(data, 'timePeriod')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
-        data = request.json
         user_id = data.get('userId')
-        time_period = data.get('timePeriod', 30)  # days
         
         result = adapt_plan.get_user_analytics(user_id, time_period)
         return jsonify(result)
@@ -131,6 +241,62 @@ def get_user_analytics():
         logger.error(f"Error getting user analytics: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/feedback_history', methods=['POST'])
+def get_feedback_history():
+    """Page through stored feedback, newest first.
+
+    Pass the returned next_cursor as 'cursor' to get the following page; it is
+    null on the last page. Optional filters: exerciseId, start, end (ISO or
+    epoch ms), limit, fields (e.g. ["timestamp", "feedback.painLevelAfter"])
+    and order ("desc" or "asc").
+    """
+    data = request.json or {}
+    fields = data.get('fields')
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        return jsonify({'error': 'fields must be a list of field names'}), 400
+    
+    try:
+        result = adapt_plan.get_feedback_history(
+            data.get('userId'),
+            exercise_id=data.get('exerciseId'),
+            start=data.get('start'),
+            end=data.get('end'),
+            cursor=data.get('cursor'),
+            limit=data.get('limit', adapt_plan.DEFAULT_HISTORY_PAGE_SIZE),
+            fields=fields,
+            order=data.get('order', 'desc'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting feedback history: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(result)
+
+@app.route('/api/therapist_overview', methods=['POST'])
+def get_therapist_overview():
+    """Summary metrics for all of a therapist's patients in one request"""
+    data = request.json or {}
+    patient_ids = data.get('patientIds')
+    if not isinstance(patient_ids, list) or not all(isinstance(p, str) for p in patient_ids):
+        return jsonify({'error': 'Expected {"patientIds": [...]} with string ids'}), 400
+    try:
+        time_period = days_param(data, 'timePeriod')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    logger.info(f"Building therapist overview for {len(patient_ids)} patients")
+    try:
+        result = adapt_plan.get_therapist_overview(patient_ids, time_period)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting therapist overview: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(result)
+
 # Debug endpoint for testing
 @app.route('/api/debug_plan', methods=['POST'])
 def debug_generate_plan():
@@ -227,6 +393,7 @@ def health_check():
     
     return jsonify({
         'status': 'ok',
+        'ready': plan_health['ready'],
         'timestamp': datetime.now().isoformat(),
         'services': {
             'plan_generation': plan_health['status'],
@@ -236,24 +403,32 @@ def health_check():
         'modules': {
             'generate_plan': plan_health,
             'adapt_plan': adaptation_health
-        }
+        },
+        'startup': STARTUP_TIMINGS
     })
 
 # Initialize modules on startup
 def initialize():
     try:
-        print("Initializing plan generation module...")
-        generate_plan.initialize_plan_generator()
-        print("Plan generation module initialized successfully")
+        # Models load in the background; /api/health reports when they are ready
+        print("Starting plan generation model warmup...")
+        generate_plan.start_plan_generator_warmup()
         
         print("Adaptation module ready")
+        STARTUP_TIMINGS['initialize'] = round(
+            time.perf_counter() - _startup_started - STARTUP_TIMINGS['imports'], 3
+        )
+        STARTUP_TIMINGS['total'] = round(time.perf_counter() - _startup_started, 3)
+        logger.info("Startup: " + ", ".join(f"{k}={v:.3f}s" for k, v in STARTUP_TIMINGS.items()))
         print("All modules initialized successfully")
     except Exception as e:
         print(f"Error initializing modules: {e}")
 
-# Initialize on startup
-with app.app_context():
-    initialize()
+# Initialize on startup, but not in the spawned training worker: when the
+# server runs as `python app.py` the worker re-imports this file as __mp_main__
+if multiprocessing.current_process().name == 'MainProcess':
+    with app.app_context():
+        initialize()
 
 if __name__ == '__main__':
     print("Starting Enhanced Flask backend server...")
@@ -261,14 +436,19 @@ if __name__ == '__main__':
     print("\n=== Available Endpoints ===")
     print("Health check: GET /api/health")
     print("Generate plan: POST /api/generate_plan")
+    print("Generate plans (batch): POST /api/generate_plans_batch")
     print("Model metrics: GET /api/model_metrics")
     print("Retrain models: POST /api/retrain_models")
+    print("Retrain job status: GET /api/retrain_models/<job_id>")
     print("\n=== Feedback Analysis Endpoints ===")
     print("Analyze feedback: POST /api/analyze_feedback")
+    print("Analyze feedback (batch): POST /api/analyze_feedback_batch")
     print("Optimize plan: POST /api/optimize_plan")
     print("Feedback trends: POST /api/feedback_trends")
     print("Exercise insights: POST /api/exercise_insights")
     print("User analytics: POST /api/user_analytics")
+    print("Feedback history: POST /api/feedback_history")
+    print("Therapist overview: POST /api/therapist_overview")
     print("Debug plan: POST /api/debug_plan")
     print("\n=== Features ===")
     print("✅ Pain level-based plan generation")
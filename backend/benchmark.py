@@ -0,0 +1,488 @@
+# benchmark.py - Micro-benchmarks for the backend hot paths
+#
+# Usage (from the backend directory):
+#   python benchmark.py                 # run every benchmark
+#   python benchmark.py batch_plans     # run a single benchmark
+import contextlib
+import io
+import sys
+import time
+
+import numpy as np
+
+
+def _timeit(fn, repeat=5):
+    """Return the best wall-clock time of fn() over `repeat` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _sample_rehab_payloads(n, seed=0):
+    """Build n plan generation payloads shaped like the Flutter client's"""
+    rng = np.random.default_rng(seed)
+    body_parts = ['Knee', 'Shoulder', 'Ankle', 'Wrist', 'Elbow', 'Hip', 'Back', 'Neck']
+    goals = ['Pain reduction', 'Improve range of motion', 'Increase strength']
+    return [
+        {
+            'medicalHistory': {'previousInjuries': 'None', 'surgicalHistory': 'None'},
+            'physicalCondition': {
+                'bodyPart': body_parts[rng.integers(len(body_parts))],
+                'painLevel': int(rng.integers(1, 11)),
+                'painLocation': 'Joint',
+            },
+            'rehabilitationGoals': goals[:rng.integers(1, len(goals) + 1)],
+        }
+        for _ in range(n)
+    ]
+
+
+def _loaded_plan_generator():
+    """The global plan generator with its models loaded (training them if needed)"""
+    import generate_plan
+
+    model = generate_plan.plan_generator
+    if model.encoder is None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.load_models()
+    return model
+
+
+def benchmark_batch_plans(sizes=(100, 1000)):
+    """Compare one batch call against calling generate_plan in a loop"""
+    model = _loaded_plan_generator()
+    print("\n=== Batch plan generation ===")
+    for n in sizes:
+        payloads = _sample_rehab_payloads(n)
+
+        def loop():
+            # The single-plan path logs to stdout; keep that out of the timing output
+            with contextlib.redirect_stdout(io.StringIO()):
+                for payload in payloads:
+                    model.generate_plan(payload)
+
+        loop_time = _timeit(loop, repeat=3)
+        batch_time = _timeit(lambda: model.generate_plans(payloads), repeat=3)
+        print(f"{n:>7} plans | loop: {loop_time * 1000:9.2f} ms | batch: {batch_time * 1000:9.2f} ms "
+              f"| speedup: {loop_time / batch_time:5.1f}x")
+
+
+def benchmark_compiled_inference(n_calls=200):
+    """Single-row live inference: pandas encoding vs the compiled encoder"""
+    import pandas as pd
+    import generate_plan
+
+    model = _loaded_plan_generator()
+    features = {
+        'body_part': 'Knee', 'pain_level': 6, 'pain_location': 'Joint',
+        'previous_injuries': 'ACL tear', 'surgical_history': 'None', 'primary_goal': 'Pain reduction',
+    }
+    frame = pd.DataFrame([features], columns=generate_plan.FEATURE_COLUMNS)
+
+    def pandas_path():
+        for _ in range(n_calls):
+            model.bundle.predict_frame(frame)
+
+    def compiled_path():
+        for _ in range(n_calls):
+            model.bundle.predict_rows([features])
+
+    pandas_time = _timeit(pandas_path, repeat=3) / n_calls
+    compiled_time = _timeit(compiled_path, repeat=3) / n_calls
+    print("\n=== Single-row live inference ===")
+    print(f"pandas: {pandas_time * 1000:7.3f} ms | compiled: {compiled_time * 1000:7.3f} ms "
+          f"| speedup: {pandas_time / compiled_time:5.1f}x")
+
+
+def benchmark_tree_ensemble(sizes=(1, 10000)):
+    """sklearn predict vs the flattened array evaluator, per model and batch size"""
+    import warnings
+    from tree_ensemble import FlatTreeEnsemble
+
+    model = _loaded_plan_generator()
+    rng = np.random.default_rng(0)
+    n_features = model.bundle.compiled_encoder.n_features
+
+    print("\n=== Tree ensemble evaluation ===")
+    for name in ('difficulty_model', 'sets_model', 'reps_model'):
+        estimator = getattr(model, name)
+        flat = FlatTreeEnsemble.from_sklearn(estimator)
+        for n in sizes:
+            X = np.zeros((n, n_features), dtype=np.float32)
+            X[:, 0] = rng.integers(1, 11, n)
+            X[np.arange(n)[:, None], rng.integers(1, n_features, (n, 5))] = 1.0
+            with warnings.catch_warnings():
+                # The models were fitted on DataFrames; plain arrays trigger a feature-name warning
+                warnings.simplefilter('ignore', UserWarning)
+                assert np.array_equal(estimator.predict(X), flat.predict(X))
+                sklearn_time = _timeit(lambda: estimator.predict(X))
+            flat_time = _timeit(lambda: flat.predict(X))
+            print(f"{name:>16} | {n:>6} rows | sklearn: {sklearn_time * 1000:9.3f} ms "
+                  f"| flat: {flat_time * 1000:9.3f} ms | speedup: {sklearn_time / flat_time:5.1f}x")
+
+
+def benchmark_training_data(sizes=(500, 100000, 1000000), chunk_size=100000):
+    """Synthetic training data generation, in one shot and streamed in chunks"""
+    import generate_plan
+
+    print("\n=== Training data generation ===")
+    for n in sizes:
+        one_shot = _timeit(lambda: generate_plan.generate_training_data(n, seed=0), repeat=3)
+        streamed = _timeit(
+            lambda: sum(len(chunk) for chunk in generate_plan.iter_training_data(n, chunk_size, seed=0)),
+            repeat=3,
+        )
+        print(f"{n:>8} rows | one shot: {one_shot * 1000:9.2f} ms ({n / one_shot:12,.0f} rows/s) "
+              f"| streamed: {streamed * 1000:9.2f} ms")
+
+
+def _sample_feedback_events(n, n_users=200, n_exercises=40, seed=0):
+    """n feedback events spread over 30 days, shaped like analyze_feedback's input"""
+    from datetime import datetime, timedelta
+
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 1, 1)
+    users = rng.integers(n_users, size=n)
+    exercises = rng.integers(n_exercises, size=n)
+    offsets = np.sort(rng.integers(30 * 24 * 3600, size=n))
+    return [
+        {
+            'userId': f'user{users[i]}',
+            'exerciseId': f'exercise{exercises[i]}',
+            'exerciseName': 'Straight Leg Raises',
+            'painLevelBefore': int(rng.integers(1, 11)),
+            'painLevelAfter': int(rng.integers(1, 11)),
+            'difficultyRating': 'perfect',
+            'completedSets': 3, 'completedReps': 10, 'targetSets': 3, 'targetReps': 10,
+            'timestamp': (start + timedelta(seconds=int(offsets[i]))).isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+def benchmark_feedback_store(n=20000):
+    """Ingest and a one-user time-window scan: one JSON file per event vs the segment store"""
+    import glob
+    import json
+    import os
+    import shutil
+    import tempfile
+    import uuid
+    from feedback_store import FeedbackStore
+
+    events = _sample_feedback_events(n)
+    window = ('2025-01-08T00:00:00', '2025-01-15T00:00:00')
+    root = tempfile.mkdtemp()
+    try:
+        legacy_dir = os.path.join(root, 'legacy')
+        os.makedirs(legacy_dir)
+
+        def legacy_ingest():
+            for event in events:
+                feedback_id = str(uuid.uuid4())
+                with open(f"{legacy_dir}/feedback_{feedback_id}.json", 'w') as f:
+                    json.dump({'id': feedback_id, 'feedback': event, 'timestamp': event['timestamp']}, f, indent=2)
+
+        def legacy_scan():
+            found = []
+            for path in glob.glob(os.path.join(legacy_dir, 'feedback_*.json')):
+                with open(path) as f:
+                    record = json.load(f)
+                if record['feedback']['userId'] == 'user7' and window[0] <= record['timestamp'] < window[1]:
+                    found.append(record)
+            return sorted(found, key=lambda record: record['timestamp'])
+
+        store = FeedbackStore(os.path.join(root, 'store'))
+
+        def store_ingest():
+            for event in events:
+                store.append(
+                    {'id': str(uuid.uuid4()), 'feedback': event, 'timestamp': event['timestamp']},
+                    user_id=event['userId'], exercise_id=event['exerciseId'], timestamp=event['timestamp'],
+                )
+
+        legacy_ingest_time = _timeit(legacy_ingest, repeat=1)
+        store_ingest_time = _timeit(store_ingest, repeat=1)
+        assert [r['feedback'] for r in legacy_scan()] == [r['feedback'] for r in store.scan('user7', start=window[0], end=window[1])]
+        legacy_scan_time = _timeit(legacy_scan, repeat=3)
+        store_scan_time = _timeit(lambda: store.scan('user7', start=window[0], end=window[1]), repeat=3)
+        store.close()
+        reopen_time = _timeit(lambda: FeedbackStore(os.path.join(root, 'store')), repeat=3)
+
+        print(f"\n=== Feedback storage ({n} events) ===")
+        print(f"ingest | files: {n / legacy_ingest_time:10,.0f} events/s | store: {n / store_ingest_time:10,.0f} events/s "
+              f"| speedup: {legacy_ingest_time / store_ingest_time:6.1f}x")
+        print(f"scan   | files: {legacy_scan_time * 1000:10.2f} ms | store: {store_scan_time * 1000:10.2f} ms "
+              f"| speedup: {legacy_scan_time / store_scan_time:6.1f}x")
+        print(f"reopen | store: {reopen_time * 1000:.2f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def benchmark_feedback_latency(n=5000):
+    """Per-request feedback persistence latency: synchronous durable write vs write-behind"""
+    import os
+    import shutil
+    import tempfile
+    import uuid
+    from feedback_store import FeedbackStore, FeedbackWriter
+
+    events = _sample_feedback_events(n)
+    root = tempfile.mkdtemp()
+    try:
+        def record(event):
+            return {'id': str(uuid.uuid4()), 'feedback': event, 'timestamp': event['timestamp']}
+
+        def latencies(persist):
+            samples = np.empty(n)
+            for i, event in enumerate(events):
+                start = time.perf_counter()
+                persist(event)
+                samples[i] = time.perf_counter() - start
+            return samples * 1000
+
+        sync_store = FeedbackStore(os.path.join(root, 'sync'))
+
+        def sync_persist(event):
+            sync_store.append(record(event), event['userId'], event['exerciseId'], event['timestamp'])
+            sync_store.sync()
+
+        writer = FeedbackWriter(FeedbackStore(os.path.join(root, 'write_behind')))
+
+        def write_behind_persist(event):
+            writer.submit(record(event), event['userId'], event['exerciseId'], event['timestamp'])
+
+        print(f"\n=== Feedback persistence latency ({n} requests) ===")
+        for name, persist in (('sync + fsync', sync_persist), ('write-behind', write_behind_persist)):
+            samples = latencies(persist)
+            print(f"{name:>13} | p50: {np.percentile(samples, 50):8.3f} ms | p99: {np.percentile(samples, 99):8.3f} ms "
+                  f"| max: {samples.max():8.3f} ms")
+        writer.flush()
+        print(f"writer: {writer.status()}")
+        writer.close()
+        sync_store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def benchmark_feedback_analytics(n=10000):
+    """Trends, insights and analytics for one user with n sessions: first (cold) and cached calls"""
+    import os
+    import shutil
+    import tempfile
+    from datetime import datetime, timedelta
+    from feedback_analytics import FeedbackAnalytics
+    from feedback_store import FeedbackStore
+
+    now = datetime.now()
+    events = _sample_feedback_events(n, n_users=1)
+    root = tempfile.mkdtemp()
+    try:
+        store = FeedbackStore(os.path.join(root, 'store'))
+        store.append_many([
+            ({'feedback': event}, event['userId'], event['exerciseId'], now - timedelta(minutes=5 * (n - i)))
+            for i, event in enumerate(events)
+        ])
+        analytics = FeedbackAnalytics(lambda: store)
+
+        cold = _timeit(lambda: analytics.columns('user0'), repeat=1)
+        rollups = _timeit(lambda: analytics.rollups('user0'), repeat=1)
+        print(f"\n=== Feedback analytics ({n} sessions for one user) ===")
+        print(f"decode columns (first request): {cold * 1000:8.2f} ms")
+        print(f" build rollups (first request): {rollups * 1000:8.2f} ms")
+        for name, fn in (
+            ('feedback_trends', lambda: analytics.feedback_trends('user0', 30)),
+            ('exercise_insights', lambda: analytics.exercise_insights('user0', 'exercise3')),
+            ('user_analytics', lambda: analytics.user_analytics('user0', 30)),
+        ):
+            print(f"{name:>17} (cached): {_timeit(fn) * 1000:8.3f} ms")
+        payload = {'id': 'new', 'feedback': events[-1], 'analysis': {}}
+        record = _timeit(lambda: analytics.record('user0', 'new', payload, int(now.timestamp() * 1000)), repeat=100)
+        print(f"rollup record (per ingested event): {record * 1e6:6.2f} us")
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def benchmark_optimizer_trends(sizes=(10, 1000, 100000)):
+    """optimize_plan with one new session: polyfit over the history vs extending running statistics"""
+    from adapt_plan import ExercisePlanOptimizer
+
+    print("\n=== Plan optimizer trends (history grows by one session) ===")
+    for n in sizes:
+        history = _sample_feedback_events(n + 1, n_users=1, n_exercises=1)
+        x = np.arange(n + 1)
+        pain = np.array([f['painLevelAfter'] for f in history], dtype=float)
+        polyfit = _timeit(lambda: np.polyfit(x, pain, 1), repeat=3)
+
+        optimizer = ExercisePlanOptimizer()
+        optimizer.optimize_exercise_plan('user0', 'exercise0', history[:n])
+        extend = _timeit(lambda: optimizer.optimize_exercise_plan('user0', 'exercise0', history), repeat=1)
+        state = optimizer._trends[('user0', 'exercise0')]
+        assert abs(state.pain.slope() - np.polyfit(x, pain, 1)[0]) < 1e-9
+        print(f"{n:>7} sessions: polyfit (one series) {polyfit * 1e6:9.1f} us | "
+              f"optimize, 1 new session {extend * 1e6:6.1f} us")
+
+
+def benchmark_optimize_payload(sizes=(10, 1000, 10000)):
+    """optimize_plan request size and handling time: whole feedbackHistory vs one new session"""
+    import json
+    import shutil
+    import tempfile
+    from adapt_plan import ExercisePlanOptimizer
+
+    print("\n=== optimize_plan request (history of n sessions, one new) ===")
+    root = tempfile.mkdtemp()
+    try:
+        for n in sizes:
+            history = _sample_feedback_events(n + 1, n_users=1, n_exercises=1)
+            optimizer = ExercisePlanOptimizer(history_dir=f'{root}/{n}')
+            optimizer.optimize_with_new_feedback('user0', 'exercise0', history[:n], 0)
+            full_body = json.dumps({'userId': 'user0', 'exerciseId': 'exercise0', 'feedbackHistory': history})
+            delta_body = json.dumps({'userId': 'user0', 'exerciseId': 'exercise0',
+                                     'newFeedback': history[n:], 'sequence': n})
+
+            def full():
+                data = json.loads(full_body)
+                ExercisePlanOptimizer().optimize_exercise_plan(data['userId'], data['exerciseId'], data['feedbackHistory'])
+
+            def delta():
+                data = json.loads(delta_body)
+                optimizer.optimize_with_new_feedback(data['userId'], data['exerciseId'], data['newFeedback'], data['sequence'])
+
+            full_seconds = _timeit(full, repeat=3)
+            delta_seconds = _timeit(delta, repeat=1)
+            print(f"{n:>6} sessions: feedbackHistory {len(full_body) / 1024:8.1f} KiB {full_seconds * 1000:8.2f} ms | "
+                  f"newFeedback {len(delta_body) / 1024:5.1f} KiB {delta_seconds * 1000:6.2f} ms")
+            optimizer.history_store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def benchmark_feedback_batch(sizes=(1000, 100000)):
+    """analyze_feedback called per session vs analyze_feedback_batch"""
+    from adapt_plan import FeedbackAnalyzer
+
+    analyzer = FeedbackAnalyzer()
+    print("\n=== Feedback analysis ===")
+    for n in sizes:
+        events = _sample_feedback_events(n)
+        repeat = 3 if n <= 10000 else 1
+        scalar = _timeit(lambda: [analyzer.analyze_feedback(f) for f in events], repeat=repeat)
+        batch = _timeit(lambda: analyzer.analyze_feedback_batch(events), repeat=repeat)
+        assert analyzer.analyze_feedback_batch(events) == [analyzer.analyze_feedback(f) for f in events]
+        print(f"{n:>7} sessions: per session {scalar * 1000:8.1f} ms | batch {batch * 1000:8.1f} ms "
+              f"({scalar / batch:.1f}x)")
+
+
+def benchmark_feedback_history(n=100000, page_size=50):
+    """Fetching one history page: full scan then slice vs cursor pages at increasing depth"""
+    import os
+    import shutil
+    import tempfile
+    from datetime import datetime, timedelta
+    from feedback_store import FeedbackStore
+
+    now = datetime.now()
+    events = _sample_feedback_events(n, n_users=1)
+    root = tempfile.mkdtemp()
+    try:
+        store = FeedbackStore(os.path.join(root, 'store'))
+        store.append_many([
+            ({'id': str(i), 'feedback': event}, event['userId'], event['exerciseId'], now - timedelta(minutes=n - i))
+            for i, event in enumerate(events)
+        ])
+        cursors = {1: None}
+        after, page = None, 1
+        while after is not None or page == 1:
+            records, after = store.page('user0', after=after, limit=page_size, descending=True)
+            page += 1
+            if page in (10, 100, n // page_size):
+                cursors[page] = after
+
+        print(f"\n=== Feedback history ({n} sessions for one user, {page_size} per page) ===")
+        scan = _timeit(lambda: store.scan('user0')[::-1][:page_size], repeat=1)
+        print(f"      scan everything and slice: {scan * 1000:8.2f} ms")
+        for depth, cursor in cursors.items():
+            seconds = _timeit(lambda: store.page('user0', after=cursor, limit=page_size, descending=True))
+            print(f"cursor page {depth:>5} (newest first): {seconds * 1000:8.3f} ms")
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def benchmark_therapist_overview(n_patients=200, sessions=200):
+    """Therapist dashboard: user_analytics and exercise_insights per patient vs one overview call"""
+    import os
+    import shutil
+    import tempfile
+    from datetime import datetime, timedelta
+    import adapt_plan
+    from feedback_analytics import FeedbackAnalytics
+    from feedback_store import FeedbackStore
+
+    now = datetime.now()
+    events = _sample_feedback_events(n_patients * sessions, n_users=n_patients, n_exercises=8)
+    patient_ids = [f'user{i}' for i in range(n_patients)]
+    root = tempfile.mkdtemp()
+    saved = adapt_plan.feedback_analytics
+    try:
+        store = FeedbackStore(os.path.join(root, 'store'))
+        store.append_many([
+            ({'id': str(i), 'feedback': event}, event['userId'], event['exerciseId'],
+             now - timedelta(minutes=len(events) - i))
+            for i, event in enumerate(events)
+        ])
+
+        def per_patient():
+            for user_id in patient_ids:
+                adapt_plan.get_user_analytics(user_id, 30)
+                for exercise in range(8):
+                    adapt_plan.get_exercise_insights(user_id, f'exercise{exercise}')
+
+        def overview():
+            adapt_plan.get_therapist_overview(patient_ids, 30)
+
+        print(f"\n=== Therapist overview ({n_patients} patients, {sessions} sessions each) ===")
+        for name, fn in (('per patient (1 + 8 calls each)', per_patient), ('therapist_overview', overview)):
+            adapt_plan.feedback_analytics = FeedbackAnalytics(lambda: store)
+            cold = _timeit(fn, repeat=1)
+            warm = _timeit(fn, repeat=3)
+            print(f"{name:>31}: first load {cold * 1000:8.1f} ms | cached {warm * 1000:7.1f} ms")
+        store.close()
+    finally:
+        adapt_plan.feedback_analytics = saved
+        shutil.rmtree(root, ignore_errors=True)
+
+
+BENCHMARKS = {
+    'batch_plans': benchmark_batch_plans,
+    'compiled_inference': benchmark_compiled_inference,
+    'tree_ensemble': benchmark_tree_ensemble,
+    'training_data': benchmark_training_data,
+    'feedback_store': benchmark_feedback_store,
+    'feedback_latency': benchmark_feedback_latency,
+    'feedback_analytics': benchmark_feedback_analytics,
+    'optimizer_trends': benchmark_optimizer_trends,
+    'optimize_payload': benchmark_optimize_payload,
+    'feedback_batch': benchmark_feedback_batch,
+    'therapist_overview': benchmark_therapist_overview,
+    'feedback_history': benchmark_feedback_history,
+}
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
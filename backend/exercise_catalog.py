@@ -0,0 +1,136 @@
+# exercise_catalog.py - Exercise catalog loaded from exercise_catalog.json
+#
+# File format:
+#   {"version": <int>, "exercises": {"<body part>": [<exercise>, ...], "default": [...]}}
+# Each exercise has name, description, bodyPart and durationSeconds, and may
+# list the "difficulties" it suits; without that list it is used at every
+# difficulty. The "default" group is used for body parts without exercises.
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exercise_catalog.json')
+DEFAULT_KEY = 'default'
+DIFFICULTY_LEVELS = ('beginner', 'intermediate', 'advanced')
+REQUIRED_FIELDS = ('name', 'description', 'bodyPart', 'durationSeconds')
+# Minimum seconds between checks of the file for changes
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+class ExerciseCatalog:
+    """Read-only index of the catalog by (body part, difficulty).
+
+    Every bucket is a precomputed tuple of read-only exercise mappings, so a
+    lookup is one dict access and plan generation never copies the catalog.
+    """
+
+    def __init__(self, version, groups):
+        self.version = version
+        self.size = sum(len(exercises) for exercises in groups.values())
+        if not groups.get(DEFAULT_KEY):
+            raise ValueError(f"Exercise catalog has no '{DEFAULT_KEY}' exercises")
+
+        index = {}
+        for key, exercises in groups.items():
+            for difficulty in DIFFICULTY_LEVELS:
+                bucket = tuple(
+                    exercise for exercise in exercises
+                    if 'difficulties' not in exercise or difficulty in exercise['difficulties']
+                )
+                if bucket:
+                    index[(key, difficulty)] = bucket
+            # Lookups with an unknown difficulty get the whole group
+            index[(key, None)] = tuple(exercises)
+        self._index = index
+
+    @classmethod
+    def from_dict(cls, data):
+        groups = {}
+        for key, exercises in data['exercises'].items():
+            checked = []
+            for exercise in exercises:
+                missing = [field for field in REQUIRED_FIELDS if field not in exercise]
+                if missing:
+                    raise ValueError(f"Exercise {exercise.get('name', '?')} in '{key}' is missing {', '.join(missing)}")
+                exercise = dict(exercise)
+                if 'difficulties' in exercise:
+                    exercise['difficulties'] = tuple(exercise['difficulties'])
+                checked.append(MappingProxyType(exercise))
+            groups[key.lower()] = tuple(checked)
+        return cls(data.get('version'), groups)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def exercises_for(self, body_part, difficulty=None):
+        """Exercises for a body part at a difficulty, falling back to the default group"""
+        key = body_part.lower()
+        index = self._index
+        return (
+            index.get((key, difficulty))
+            or index.get((DEFAULT_KEY, difficulty))
+            or index[(DEFAULT_KEY, None)]
+        )
+
+    def body_parts(self):
+        return sorted({key for key, _ in self._index if key != DEFAULT_KEY})
+
+
+class CatalogLoader:
+    """Holds the current catalog and reloads it when the file changes.
+
+    A file that fails to load is logged and the previous catalog stays in use.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._catalog = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def get(self):
+        now = time.monotonic()
+        if self._catalog is not None and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return self._catalog
+        with self._lock:
+            self._checked_at = now
+            try:
+                stamp = self._file_stamp()
+            except FileNotFoundError:
+                if self._catalog is None:
+                    raise
+                logger.error(f"Exercise catalog {self.path} disappeared; keeping version {self._catalog.version}")
+                return self._catalog
+            if stamp != self._stamp:
+                try:
+                    catalog = ExerciseCatalog.load(self.path)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    if self._catalog is None:
+                        raise
+                    logger.error(f"Failed to reload exercise catalog: {e}; keeping version {self._catalog.version}")
+                else:
+                    if self._catalog is not None:
+                        logger.info(f"Reloaded exercise catalog version {catalog.version} ({catalog.size} exercises)")
+                    self._catalog = catalog
+                self._stamp = stamp
+            return self._catalog
+
+
+catalog_loader = CatalogLoader()
+
+
+def get_catalog():
+    """The current exercise catalog, reloaded if the file changed"""
+    return catalog_loader.get()
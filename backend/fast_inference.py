@@ -0,0 +1,68 @@
+# fast_inference.py - Pandas-free inference path for the plan models
+import threading
+
+import numpy as np
+
+# Trees compare features as float32, so rows are built in that dtype up front
+DTYPE = np.float32
+
+
+class CompiledFeatureEncoder:
+    """Maps raw feature dicts straight into model input rows.
+
+    Built from a fitted OneHotEncoder: every (feature, category) pair is
+    resolved to its output column once, so encoding a row is one dict lookup
+    per categorical feature and a write into a preallocated buffer. The column
+    layout matches encode_features in generate_plan: the numeric features
+    first, then the one-hot blocks in the encoder's order. Unknown categories
+    leave their block at zero, like handle_unknown='ignore'.
+    """
+
+    def __init__(self, encoder, categorical_features, numeric_features=('pain_level',)):
+        self.categorical_features = list(categorical_features)
+        self.numeric_features = list(numeric_features)
+
+        self.column_maps = []
+        offset = len(self.numeric_features)
+        for name, categories in zip(self.categorical_features, encoder.categories_):
+            self.column_maps.append(
+                (name, {category: offset + i for i, category in enumerate(categories.tolist())})
+            )
+            offset += len(categories)
+        self.n_features = offset
+
+        # One preallocated row per thread, since requests are served concurrently
+        self._local = threading.local()
+
+    def _fill(self, out, features):
+        """Write the encoding of one feature dict into a zeroed 1-D row"""
+        for i, name in enumerate(self.numeric_features):
+            out[i] = float(features[name])
+        for name, columns in self.column_maps:
+            try:
+                column = columns.get(features.get(name))
+            except TypeError:  # unhashable value, treat as unknown
+                column = None
+            if column is not None:
+                out[column] = 1.0
+
+    def transform_row(self, features):
+        """Encode one feature dict into this thread's (1, n_features) buffer.
+
+        The returned array is reused by the next call; copy it to keep it.
+        """
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.zeros((1, self.n_features), dtype=DTYPE)
+        else:
+            row.fill(0.0)
+        self._fill(row[0], features)
+        return row
+
+    def transform(self, features_list):
+        """Encode a list of feature dicts into a new (n, n_features) array"""
+        X = np.zeros((len(features_list), self.n_features), dtype=DTYPE)
+        for out, features in zip(X, features_list):
+            self._fill(out, features)
+        return X
+
@@ -0,0 +1,641 @@
+# feedback_analytics.py - Per-user analytics computed from the feedback store
+#
+# Each user's feedback is decoded once into parallel NumPy columns sorted by
+# time and cached; later requests only decode records added since. Trends,
+# distributions and per-day series are then array operations over a
+# searchsorted time window.
+#
+# user_analytics instead reads per-user daily rollups: one bucket of sums and
+# counts per UTC day, updated as feedback is ingested and rebuilt from the
+# store when a user is first queried, so a window of N days combines at most
+# N buckets however many sessions they hold.
+import bisect
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+DIFFICULTY_RATINGS = ['easy', 'perfect', 'hard']
+# Same scale as ExercisePlanOptimizer._get_difficulty_score
+DIFFICULTY_SCORES = np.array([1.0, 2.0, 3.0])
+DEFAULT_DIFFICULTY = DIFFICULTY_RATINGS.index('perfect')
+TREND_SLOPE_THRESHOLD = 0.1
+# Client-facing names for the direction of each series
+PAIN_TREND_NAMES = {'decreasing': 'improving', 'increasing': 'worsening'}
+COMPLETION_TREND_NAMES = {'increasing': 'improving', 'decreasing': 'declining'}
+DIFFICULTY_TREND_NAMES = {'decreasing': 'becoming_easier', 'increasing': 'becoming_harder'}
+DAY_MS = 24 * 60 * 60 * 1000
+# How many users' columns to keep decoded in memory
+MAX_CACHED_USERS = 10000
+# Sessions user_analytics looks at to judge recent difficulty
+RECENT_SESSIONS = 5
+# Feedback a user's rollups may hold before the store has caught up with it;
+# past this the rollups are dropped and rebuilt on the next query
+MAX_PENDING_RECORDS = 10000
+
+
+def session_values(record):
+    """(pain_before, pain_after, completion, difficulty code, effectiveness, exercise id, exercise name) of a stored record.
+
+    None if a numeric field is not a finite number, so callers skip the record
+    instead of failing halfway through adding it.
+    """
+    feedback = record.get('feedback', {})
+    analysis = record.get('analysis', {})
+    rating = feedback.get('difficultyRating', 'perfect')
+    effectiveness = analysis.get('effectiveness_score')
+    try:
+        pain_before = float(feedback.get('painLevelBefore', 5))
+        pain_after = float(feedback.get('painLevelAfter', 5))
+        completion = float(_completion_rate(feedback))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    if not (math.isfinite(pain_before) and math.isfinite(pain_after) and math.isfinite(completion)):
+        return None
+    exercise_id = feedback.get('exerciseId') or ''
+    return (
+        pain_before,
+        pain_after,
+        completion,
+        DIFFICULTY_RATINGS.index(rating) if rating in DIFFICULTY_RATINGS else DEFAULT_DIFFICULTY,
+        float(effectiveness) if isinstance(effectiveness, (int, float)) else np.nan,
+        exercise_id if isinstance(exercise_id, str) else str(exercise_id),
+        feedback.get('exerciseName'),
+    )
+
+
+def _completion_rate(feedback):
+    """Completion rate as FeedbackAnalyzer computes it, or from completionPercentage for older clients"""
+    if 'completedSets' in feedback or 'targetSets' in feedback or 'completionPercentage' not in feedback:
+        sets_completion = feedback.get('completedSets', 0) / max(feedback.get('targetSets', 1), 1)
+        reps_completion = feedback.get('completedReps', 0) / max(feedback.get('targetReps', 1), 1)
+        return (sets_completion + reps_completion) / 2
+    return feedback['completionPercentage'] / 100
+
+
+def slope(values):
+    """Least-squares slope of values against 0..n-1 (np.polyfit degree 1), None below 3 points"""
+    n = len(values)
+    if n < 3:
+        return None
+    x = np.arange(n, dtype=np.float64)
+    x -= x.mean()
+    return float(np.dot(x, values - values.mean()) / np.dot(x, x))
+
+
+def trend_direction(value):
+    if value is None:
+        return 'insufficient_data'
+    if abs(value) < TREND_SLOPE_THRESHOLD:
+        return 'stable'
+    return 'increasing' if value > 0 else 'decreasing'
+
+
+class RunningRegression:
+    """Least-squares fit of y against the sample index 0, 1, 2, ..., updated in O(1).
+
+    Keeps the count, the means and the centered sums (co-moment of x and y,
+    squared deviations of x) instead of raw sums, which lose precision once
+    n reaches the hundreds of thousands. slope() equals np.polyfit(x, y, 1)[0]
+    up to rounding.
+    """
+
+    __slots__ = ('n', 'mean_x', 'mean_y', 'c_xy', 'm2_x')
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.c_xy = 0.0
+        self.m2_x = 0.0
+
+    def add(self, y):
+        x = self.n
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        self.mean_y += (y - self.mean_y) / self.n
+        self.c_xy += dx * (y - self.mean_y)
+        self.m2_x += dx * (x - self.mean_x)
+
+    def slope(self):
+        """None below 3 points, like the trend helpers"""
+        if self.n < 3:
+            return None
+        return self.c_xy / self.m2_x
+
+    def mean(self):
+        return self.mean_y if self.n else None
+
+
+def daily_groups(timestamp):
+    """(days, day_index, sessions_per_day) for a sorted timestamp column"""
+    days, day_index = np.unique(timestamp // DAY_MS, return_inverse=True)
+    return days, day_index, np.bincount(day_index)
+
+
+def daily_mean(day_index, per_day, values):
+    return np.bincount(day_index, weights=values) / per_day
+
+
+def _round(value, digits=2):
+    return round(float(value), digits)
+
+
+class UserFeedbackColumns:
+    """One user's feedback as parallel arrays, sorted by timestamp"""
+
+    def __init__(self):
+        self.seen = set()
+        self.timestamp = np.empty(0, dtype=np.int64)
+        self.pain_before = np.empty(0)
+        self.pain_after = np.empty(0)
+        self.completion = np.empty(0)
+        self.difficulty = np.empty(0, dtype=np.int8)
+        self.effectiveness = np.empty(0)
+        self.exercise = np.empty(0, dtype=np.int32)
+        self.exercise_codes = {}
+        self.exercise_ids = []
+        self.exercise_names = []
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def _exercise_code(self, exercise_id, name):
+        code = self.exercise_codes.get(exercise_id)
+        if code is None:
+            code = self.exercise_codes[exercise_id] = len(self.exercise_ids)
+            self.exercise_ids.append(exercise_id)
+            self.exercise_names.append(name or exercise_id)
+        return code
+
+    def extend(self, entries, records):
+        """Add decoded records (with their store index entries) and restore time order"""
+        if not records:
+            return
+        rows = []
+        for (timestamp_ms, _, _), record in zip(entries, records):
+            values = session_values(record)
+            if values is None:
+                continue
+            *values, exercise_id, exercise_name = values
+            rows.append((timestamp_ms, *values, self._exercise_code(exercise_id, exercise_name)))
+        self.seen.update(entries)
+        if not rows:
+            return
+
+        new = list(zip(*rows))
+        columns = ('timestamp', 'pain_before', 'pain_after', 'completion', 'difficulty', 'effectiveness', 'exercise')
+        for name, values in zip(columns, new):
+            current = getattr(self, name)
+            setattr(self, name, np.concatenate([current, np.asarray(values, dtype=current.dtype)]))
+
+        if (np.diff(self.timestamp) < 0).any():
+            order = np.argsort(self.timestamp, kind='stable')
+            for name in columns:
+                setattr(self, name, getattr(self, name)[order])
+
+    def window_start(self, days_back):
+        """Index of the first row inside the last days_back days"""
+        if days_back is None:
+            return 0
+        start_ms = int(datetime.now().timestamp() * 1000) - int(days_back) * DAY_MS
+        return int(np.searchsorted(self.timestamp, start_ms, side='left'))
+
+
+class DailyRollup:
+    """Sums and counts of one user's sessions on one UTC day"""
+
+    __slots__ = ('sessions', 'pain_before', 'pain_after', 'completion', 'completion_sq',
+                 'difficulty', 'effectiveness', 'effectiveness_count', 'exercises')
+
+    def __init__(self):
+        self.sessions = 0
+        self.pain_before = 0.0
+        self.pain_after = 0.0
+        self.completion = 0.0
+        self.completion_sq = 0.0
+        self.difficulty = [0] * len(DIFFICULTY_RATINGS)
+        self.effectiveness = 0.0
+        self.effectiveness_count = 0
+        # exercise id -> [sessions, summed pain reduction, summed completion]
+        self.exercises = {}
+
+    def add(self, pain_before, pain_after, completion, difficulty, effectiveness, exercise_id):
+        self.sessions += 1
+        self.pain_before += pain_before
+        self.pain_after += pain_after
+        self.completion += completion
+        self.completion_sq += completion * completion
+        self.difficulty[difficulty] += 1
+        if effectiveness == effectiveness:  # not NaN
+            self.effectiveness += effectiveness
+            self.effectiveness_count += 1
+        exercise = self.exercises.get(exercise_id)
+        if exercise is None:
+            exercise = self.exercises[exercise_id] = [0, 0.0, 0.0]
+        exercise[0] += 1
+        exercise[1] += pain_before - pain_after
+        exercise[2] += completion
+
+
+class UserRollups:
+    """One user's daily rollups, plus what is needed to keep them in step with the store"""
+
+    def __init__(self):
+        # Held while syncing, adding or reading, so users can be served in parallel
+        self.lock = threading.Lock()
+        self.day_numbers = []  # sorted days since the epoch that have a bucket
+        self.buckets = {}
+        # Store index entries already folded in and their feedback ids, and ids
+        # of feedback recorded directly whose store entries have not been seen yet
+        self.seen = set()
+        self.stored_ids = set()
+        self.pending_ids = set()
+        # exercise id -> (order first performed, name)
+        self.exercises = {}
+        # Last RECENT_SESSIONS (timestamp_ms, difficulty code), oldest first
+        self.recent = []
+        self.last_exercise_ms = {}
+
+    def add(self, timestamp_ms, record):
+        """Fold one stored record in; records with unusable values are skipped"""
+        values = session_values(record)
+        if values is None:
+            return
+        pain_before, pain_after, completion, difficulty, effectiveness, exercise_id, name = values
+        day = timestamp_ms // DAY_MS
+        bucket = self.buckets.get(day)
+        if bucket is None:
+            bucket = self.buckets[day] = DailyRollup()
+            bisect.insort(self.day_numbers, day)
+        bucket.add(pain_before, pain_after, completion, difficulty, effectiveness, exercise_id)
+        if exercise_id not in self.exercises:
+            self.exercises[exercise_id] = (len(self.exercises), name or exercise_id)
+        if timestamp_ms > self.last_exercise_ms.get(exercise_id, -1):
+            self.last_exercise_ms[exercise_id] = timestamp_ms
+        if len(self.recent) < RECENT_SESSIONS or timestamp_ms >= self.recent[0][0]:
+            bisect.insort(self.recent, (timestamp_ms, difficulty))
+            del self.recent[:-RECENT_SESSIONS]
+
+    def window(self, days_back):
+        """(first day number, buckets) of the last days_back days including today"""
+        if days_back is None:
+            start_day = self.day_numbers[0] if self.day_numbers else 0
+        else:
+            start_day = int(datetime.now().timestamp() * 1000) // DAY_MS - int(days_back) + 1
+        days = self.day_numbers[bisect.bisect_left(self.day_numbers, start_day):]
+        return start_day, [self.buckets[day] for day in days]
+
+    def totals(self, days_back):
+        """Per-day series and window totals of the last days_back days; call with lock held"""
+        start_day, buckets = self.window(days_back)
+        by_exercise = {}
+        for bucket in buckets:
+            for exercise_id, (count, reduction, completion) in bucket.exercises.items():
+                totals = by_exercise.setdefault(exercise_id, [0, 0.0, 0.0])
+                totals[0] += count
+                totals[1] += reduction
+                totals[2] += completion
+        return {
+            'per_day': np.array([bucket.sessions for bucket in buckets], dtype=np.float64),
+            'pain_before': np.array([bucket.pain_before for bucket in buckets]),
+            'pain_after': np.array([bucket.pain_after for bucket in buckets]),
+            'completion': np.array([bucket.completion for bucket in buckets]),
+            'completion_sq': sum(bucket.completion_sq for bucket in buckets),
+            'difficulty': np.array([bucket.difficulty for bucket in buckets], dtype=np.float64).reshape(-1, len(DIFFICULTY_RATINGS)),
+            'effectiveness': sum(bucket.effectiveness for bucket in buckets),
+            'effectiveness_count': sum(bucket.effectiveness_count for bucket in buckets),
+            'by_exercise': by_exercise,
+            'exercises': dict(self.exercises),
+            'last_exercise_ms': {exercise_id: self.last_exercise_ms[exercise_id] for exercise_id in by_exercise},
+            'recent': np.array(
+                [difficulty for timestamp_ms, difficulty in self.recent if timestamp_ms // DAY_MS >= start_day],
+                dtype=np.int8
+            ),
+        }
+
+
+class FeedbackAnalytics:
+    """Analytics over a FeedbackStore with a per-user column cache"""
+
+    def __init__(self, get_store, get_store_nowait=None):
+        self._get_store = get_store
+        # The store without waiting for this process's queued writes; the
+        # rollups get those through record() instead
+        self._get_store_nowait = get_store_nowait or get_store
+        self._cache = OrderedDict()
+        self._rollups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def columns(self, user_id):
+        """The user's feedback columns, decoding only records not seen before"""
+        store = self._get_store()
+        entries = store.entries(user_id=user_id)
+        with self._lock:
+            columns = self._cache.get(user_id)
+            if columns is None:
+                columns = self._cache[user_id] = UserFeedbackColumns()
+                if len(self._cache) > MAX_CACHED_USERS:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(user_id)
+            if len(entries) != len(columns.seen):
+                new = [entry for entry in entries if entry not in columns.seen]
+                columns.extend(new, [store.read(entry) for entry in new])
+            return columns
+
+    def feedback_trends(self, user_id, days_back=30):
+        columns = self.columns(user_id)
+        start = columns.window_start(days_back)
+        timestamp = columns.timestamp[start:]
+        pain = columns.pain_after[start:]
+        completion = columns.completion[start:]
+        difficulty = columns.difficulty[start:]
+
+        if len(timestamp) == 0:
+            return {
+                'pain_levels': [],
+                'completion_rates': [],
+                'difficulty_ratings': [],
+                'dates': [],
+                'overall_trend': 'insufficient_data',
+                'sessions_count': 0,
+                'recommendations': ['No feedback recorded in this period yet.'],
+            }
+
+        # Per-day series; trends are taken over the daily means
+        days, day_index, per_day = daily_groups(timestamp)
+        daily_pain = daily_mean(day_index, per_day, pain)
+        daily_completion = daily_mean(day_index, per_day, completion)
+        daily_difficulty = np.bincount(
+            day_index * len(DIFFICULTY_RATINGS) + difficulty, minlength=len(days) * len(DIFFICULTY_RATINGS)
+        ).reshape(len(days), len(DIFFICULTY_RATINGS)).argmax(axis=1)
+
+        pain_trend = trend_direction(slope(daily_pain))
+        completion_trend = trend_direction(slope(daily_completion))
+        overall_trend = PAIN_TREND_NAMES.get(pain_trend, pain_trend)
+
+        recommendations = []
+        if pain_trend == 'decreasing':
+            recommendations.append('Pain levels are decreasing consistently - excellent progress!')
+        elif pain_trend == 'increasing':
+            recommendations.append('Pain levels are increasing. Consider reducing intensity or consulting your therapist.')
+        if completion_trend == 'increasing':
+            recommendations.append('Completion rates are improving steadily')
+        elif completion_trend == 'decreasing':
+            recommendations.append('Completion rates are declining. Focus on consistency over intensity.')
+        recent = np.bincount(difficulty[-5:], minlength=len(DIFFICULTY_RATINGS)) / len(difficulty[-5:])
+        if recent[DIFFICULTY_RATINGS.index('easy')] > 0.5:
+            recommendations.append('Recent exercises seem too easy - consider progression')
+        elif recent[DIFFICULTY_RATINGS.index('hard')] > 0.5:
+            recommendations.append('Recent exercises seem too hard - consider reducing intensity')
+
+        return {
+            'pain_levels': [_round(value) for value in daily_pain],
+            'completion_rates': [_round(value) for value in daily_completion],
+            'difficulty_ratings': [DIFFICULTY_RATINGS[code] for code in daily_difficulty],
+            'dates': [str(day) for day in days.astype('datetime64[D]')],
+            'overall_trend': overall_trend,
+            'sessions_count': int(len(timestamp)),
+            'recommendations': recommendations,
+        }
+
+    def exercise_insights(self, user_id, exercise_id):
+        columns = self.columns(user_id)
+        code = columns.exercise_codes.get(exercise_id)
+        rows = np.flatnonzero(columns.exercise == code) if code is not None else np.empty(0, dtype=np.intp)
+
+        if len(rows) == 0:
+            return {
+                'total_attempts': 0,
+                'average_completion': 0.0,
+                'pain_improvement': 0.0,
+                'difficulty_trend': 'insufficient_data',
+                'last_performed': None,
+                'recommendations': ['No feedback recorded for this exercise yet.'],
+                'effectiveness_score': 0.0,
+                'pain_levels_over_time': [],
+                'difficulty_distribution': {rating: 0 for rating in DIFFICULTY_RATINGS},
+            }
+
+        pain_after = columns.pain_after[rows]
+        pain_change = pain_after - columns.pain_before[rows]
+        completion = columns.completion[rows]
+        difficulty = columns.difficulty[rows]
+        effectiveness = columns.effectiveness[rows]
+        difficulty_trend = trend_direction(slope(DIFFICULTY_SCORES[difficulty]))
+        difficulty_trend = DIFFICULTY_TREND_NAMES.get(difficulty_trend, difficulty_trend)
+
+        average_completion = completion.mean()
+        pain_improvement = pain_change.mean()
+        recommendations = []
+        if pain_improvement < 0:
+            recommendations.append('Exercise is showing good pain reduction benefits')
+        elif pain_improvement > 0:
+            recommendations.append('Pain tends to increase after this exercise - consider reducing intensity')
+        if average_completion >= 0.85:
+            recommendations.append('Completion rate is excellent - consider slight progression')
+        elif average_completion < 0.7:
+            recommendations.append('Low completion rate. Focus on form over quantity.')
+        if difficulty_trend == 'stable':
+            recommendations.append('Maintain current difficulty level')
+
+        counts = np.bincount(difficulty, minlength=len(DIFFICULTY_RATINGS))
+        last_ms = int(columns.timestamp[rows[-1]])
+        return {
+            'total_attempts': int(len(rows)),
+            'average_completion': _round(average_completion),
+            'pain_improvement': _round(pain_improvement),  # Negative means improvement
+            'difficulty_trend': difficulty_trend,
+            'last_performed': datetime.fromtimestamp(last_ms / 1000).date().isoformat(),
+            'recommendations': recommendations,
+            'effectiveness_score': _round(np.nanmean(effectiveness)) if not np.isnan(effectiveness).all() else 0.0,
+            'pain_levels_over_time': [_round(value) for value in pain_after],
+            'difficulty_distribution': dict(zip(DIFFICULTY_RATINGS, counts.tolist())),
+        }
+
+    def record(self, user_id, feedback_id, payload, timestamp_ms):
+        """Fold newly ingested feedback into the user's rollups, if they are materialized.
+
+        payload is the stored record ({'feedback': ..., 'analysis': ...}).
+        Users without rollups get them built from the store on first query.
+        """
+        with self._lock:
+            rollups = self._rollups.get(user_id)
+            if rollups is None:
+                return
+            if len(rollups.pending_ids) >= MAX_PENDING_RECORDS:
+                del self._rollups[user_id]
+                return
+        with rollups.lock:
+            # The writer may have flushed it and a query folded it in already
+            if feedback_id in rollups.stored_ids:
+                return
+            rollups.add(timestamp_ms, payload)
+            rollups.pending_ids.add(feedback_id)
+
+    def rollups(self, user_id):
+        """The user's daily rollups, folding in stored feedback they do not cover yet"""
+        store = self._get_store_nowait()
+        stored = store.count(user_id=user_id)
+        with self._lock:
+            rollups = self._rollups.get(user_id)
+            if rollups is None:
+                rollups = self._rollups[user_id] = UserRollups()
+                if len(self._rollups) > MAX_CACHED_USERS:
+                    self._rollups.popitem(last=False)
+            else:
+                self._rollups.move_to_end(user_id)
+        with rollups.lock:
+            if stored != len(rollups.seen):
+                for entry in store.entries(user_id=user_id):
+                    if entry in rollups.seen:
+                        continue
+                    rollups.seen.add(entry)
+                    record = store.read(entry)
+                    feedback_id = record.get('id')
+                    if feedback_id is not None:
+                        rollups.stored_ids.add(feedback_id)
+                    if feedback_id in rollups.pending_ids:
+                        rollups.pending_ids.discard(feedback_id)
+                    else:
+                        rollups.add(entry[0], record)
+            return rollups
+
+    def rebuild_rollups(self, user_id):
+        """Discard the user's rollups and rebuild them from the store"""
+        with self._lock:
+            self._rollups.pop(user_id, None)
+        return self.rollups(user_id)
+
+    def window_totals(self, user_id, time_period=30):
+        """UserRollups.totals for the user's last time_period days"""
+        rollups = self.rollups(user_id)
+        with rollups.lock:
+            return rollups.totals(time_period)
+
+    def user_analytics(self, user_id, time_period=30, totals=None):
+        if totals is None:
+            totals = self.window_totals(user_id, time_period)
+        per_day = totals['per_day']
+        pain_before_sum = totals['pain_before']
+        pain_after_sum = totals['pain_after']
+        completion_sum = totals['completion']
+        difficulty_counts = totals['difficulty']
+        exercises = totals['exercises']
+        recent = totals['recent']
+        sessions = int(per_day.sum())
+
+        if sessions == 0:
+            return {
+                'summary': {
+                    'total_sessions': 0,
+                    'average_pain_reduction': 0.0,
+                    'overall_adherence': 0.0,
+                    'effectiveness_score': 0.0,
+                },
+                'pain_analytics': {},
+                'difficulty_analytics': {},
+                'completion_analytics': {},
+                'recommendations': ['No feedback recorded in this period yet.'],
+                'goals_progress': {},
+            }
+
+        average_pre_pain = pain_before_sum.sum() / sessions
+        average_post_pain = pain_after_sum.sum() / sessions
+        average_reduction = average_pre_pain - average_post_pain
+        average_completion = completion_sum.sum() / sessions
+        effectiveness_score = (
+            totals['effectiveness'] / totals['effectiveness_count'] if totals['effectiveness_count'] else 0.0
+        )
+
+        # Exercises with the largest average pain reduction, ties in the order first performed
+        ranked = sorted(
+            totals['by_exercise'].items(),
+            key=lambda item: (-(item[1][1] / item[1][0]), exercises[item[0]][0])
+        )[:3]
+        best = [exercises[exercise_id][1] for exercise_id, (_, reduction, _) in ranked if reduction > 0]
+
+        pain_trend = trend_direction(slope(pain_after_sum / per_day))
+        completion_trend = trend_direction(slope(completion_sum / per_day))
+        difficulty_trend = trend_direction(slope(difficulty_counts @ DIFFICULTY_SCORES / per_day))
+        distribution = difficulty_counts.sum(axis=0) / sessions
+        progression_ready = bool(
+            average_completion >= 0.85
+            and (recent == DIFFICULTY_RATINGS.index('easy')).mean() >= 0.5
+            and pain_trend != 'increasing'
+        )
+        variance = max(totals['completion_sq'] / sessions - average_completion ** 2, 0.0)
+        consistency = max(0.0, 1.0 - float(np.sqrt(variance)))
+
+        recommendations = []
+        if average_reduction > 0 and pain_trend != 'increasing':
+            recommendations.append('Good progress with consistent pain reduction')
+        elif pain_trend == 'increasing':
+            recommendations.append('Pain levels are rising. Consider reducing intensity or consulting your therapist.')
+        if progression_ready:
+            recommendations.append('Ready for progression to more challenging exercises')
+        if average_completion < 0.7:
+            recommendations.append('Completion rates are low. Focus on consistency over intensity.')
+        elif consistency >= 0.8:
+            recommendations.append('Maintain current exercise frequency')
+
+        return {
+            'summary': {
+                'total_sessions': sessions,
+                'average_pain_reduction': _round(average_reduction),
+                'overall_adherence': _round(average_completion),
+                'effectiveness_score': _round(effectiveness_score),
+            },
+            'pain_analytics': {
+                'average_pre_pain': _round(average_pre_pain),
+                'average_post_pain': _round(average_post_pain),
+                'pain_reduction_trend': PAIN_TREND_NAMES.get(pain_trend, pain_trend),
+                'best_exercises_for_pain': best,
+            },
+            'difficulty_analytics': {
+                'distribution': {rating: int(round(share * 100)) for rating, share in zip(DIFFICULTY_RATINGS, distribution)},
+                'trend': DIFFICULTY_TREND_NAMES.get(difficulty_trend, difficulty_trend),
+                'progression_ready': progression_ready,
+            },
+            'completion_analytics': {
+                'average_completion': _round(average_completion),
+                'trend': COMPLETION_TREND_NAMES.get(completion_trend, completion_trend),
+                'consistency_score': _round(consistency),
+            },
+            'recommendations': recommendations,
+            # Only pain reduction can be measured from feedback; share of the starting pain removed
+            'goals_progress': {
+                'pain_reduction': _round(min(max(average_reduction / max(average_pre_pain, 1.0), 0.0), 1.0)),
+            },
+        }
+
+    def patient_overview(self, user_id, time_period=30):
+        """Dashboard summary of one patient, built from a single read of their rollups"""
+        totals = self.window_totals(user_id, time_period)
+        analytics = self.user_analytics(user_id, time_period, totals=totals)
+        exercises = totals['exercises']
+        per_exercise = sorted(totals['by_exercise'].items(), key=lambda item: exercises[item[0]][0])
+        last_ms = max(totals['last_exercise_ms'].values(), default=None)
+        return {
+            'user_id': user_id,
+            'summary': analytics['summary'],
+            'pain_trend': analytics['pain_analytics'].get('pain_reduction_trend'),
+            'completion_trend': analytics['completion_analytics'].get('trend'),
+            'progression_ready': analytics['difficulty_analytics'].get('progression_ready', False),
+            'last_session': datetime.fromtimestamp(last_ms / 1000).isoformat() if last_ms is not None else None,
+            'exercises': [
+                {
+                    'exercise_id': exercise_id,
+                    'name': exercises[exercise_id][1],
+                    'attempts': count,
+                    'average_completion': _round(completion / count),
+                    'pain_improvement': _round(reduction / count),
+                }
+                for exercise_id, (count, reduction, completion) in per_exercise
+            ],
+            'recommendations': analytics['recommendations'],
+        }
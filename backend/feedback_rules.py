@@ -0,0 +1,331 @@
+# feedback_rules.py - Feedback analysis rules loaded from feedback_rules.json
+#
+# The file holds every threshold, recommendation, adjustment and score weight
+# used to analyze a feedback session:
+#   thresholds             named values that conditions can refer to
+#   rule_groups            ordered groups of rules; in each group the first rule
+#                          whose condition holds gives the recommendation and
+#                          adjustments
+#   adjustment_precedence  every group name, highest first: when rules from two
+#                          groups set the same adjustment, the higher group wins
+#   effectiveness          base score, [min, max] and score terms added in
+#                          order, each taking the score of its first matching rule
+#   severity               first matching rule gives the pain severity label
+#   flags                  named conditions reported in the analysis
+# A condition ("when") is a list of [metric, operator, value] clauses that must
+# all hold; a rule without one always matches. Metrics are pain_before,
+# pain_after, pain_change and completion_rate, compared with < <= > >= == !=
+# against a number or a threshold name, and difficulty, compared with == or !=
+# against a rating.
+import json
+import operator
+import os
+
+import numpy as np
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feedback_rules.json')
+NUMERIC_METRICS = ('pain_before', 'pain_after', 'pain_change', 'completion_rate')
+CATEGORICAL_METRICS = ('difficulty',)
+METRIC_SLOTS = {name: slot for slot, name in enumerate(NUMERIC_METRICS + CATEGORICAL_METRICS)}
+OPERATORS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne,
+}
+CATEGORICAL_OPERATORS = ('==', '!=')
+REQUIRED_FLAGS = ('is_beneficial', 'is_adequate', 'is_appropriate')
+# Request fields evaluate_batch loads into arrays, with the defaults feedback_metrics uses
+NUMERIC_FIELDS = {
+    'painLevelBefore': 5, 'painLevelAfter': 5,
+    'completedSets': 0, 'targetSets': 1, 'completedReps': 0, 'targetReps': 1,
+}
+# Batch code of a rating no rule mentions
+OTHER_CATEGORY = -1
+# evaluate() remembers the decision for this many distinct metric tuples
+MAX_CACHED_DECISIONS = 65536
+
+
+def feedback_metrics(feedback):
+    """(pain_before, pain_after, pain_change, completion_rate, difficulty) of one session"""
+    pain_before = feedback.get('painLevelBefore', 5)
+    pain_after = feedback.get('painLevelAfter', 5)
+    pain_change = pain_after - pain_before
+    difficulty = feedback.get('difficultyRating', 'perfect')
+    sets_completion = feedback.get('completedSets', 0) / max(feedback.get('targetSets', 1), 1)
+    reps_completion = feedback.get('completedReps', 0) / max(feedback.get('targetReps', 1), 1)
+    return pain_before, pain_after, pain_change, (sets_completion + reps_completion) / 2, difficulty
+
+
+def _float_or_none(value):
+    """value as a float; None for non-numbers and for ints too large for a float"""
+    if not isinstance(value, (int, float)):
+        return None
+    try:
+        return float(value)
+    except OverflowError:
+        return None
+
+
+def _first_match(rules, metrics, default):
+    """Result of the first (clauses, result) rule whose clauses all hold"""
+    for clauses, result in rules:
+        for slot, compare, value, _ in clauses:
+            if not compare(metrics[slot], value):
+                break
+        else:
+            return result
+    return default
+
+
+def _holds(clauses, metrics):
+    for slot, compare, value, _ in clauses:
+        if not compare(metrics[slot], value):
+            return False
+    return True
+
+
+class FeedbackRules:
+    """The rule table compiled into an evaluation plan.
+
+    Conditions become (slot, operator, value, batch value) clause tuples
+    against a fixed metrics tuple, so evaluate() does no lookups by name, and
+    evaluate_batch() runs the same clauses over NumPy columns. Each group's
+    outcome is the index of its first matching rule (or "none"); the group
+    indexes together form one outcome key, and the merged recommendations and
+    adjustments of a key are built once and cached. evaluate() also caches
+    the whole decision per metrics tuple.
+    """
+
+    def __init__(self, data):
+        self.version = data.get('version')
+        thresholds = data.get('thresholds', {})
+        # Rating literals get small integer codes for the batch path
+        self._categories = {}
+
+        def compile_condition(clauses):
+            compiled = []
+            for clause in clauses or ():
+                metric, op, value = clause
+                if metric not in METRIC_SLOTS:
+                    raise ValueError(f"Unknown metric '{metric}' in feedback rules")
+                if op not in OPERATORS:
+                    raise ValueError(f"Unknown operator '{op}' in feedback rules")
+                if metric in CATEGORICAL_METRICS:
+                    if op not in CATEGORICAL_OPERATORS:
+                        raise ValueError(f"Operator '{op}' cannot be used with {metric}")
+                    if not isinstance(value, str):
+                        raise ValueError(f"{metric} must be compared with a string, not {value!r}")
+                    batch_value = self._categories.setdefault(value, len(self._categories))
+                else:
+                    if isinstance(value, str):
+                        if value not in thresholds:
+                            raise ValueError(f"Unknown threshold '{value}' in feedback rules")
+                        value = thresholds[value]
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        raise ValueError(f"{metric} must be compared with a number, not {value!r}")
+                    batch_value = value
+                compiled.append((METRIC_SLOTS[metric], OPERATORS[op], value, batch_value))
+            return tuple(compiled)
+
+        self.group_names = []
+        self._groups = []
+        for group in data['rule_groups']:
+            self.group_names.append(group['name'])
+            self._groups.append([
+                (compile_condition(rule.get('when')), i, rule.get('recommendation'), rule.get('adjustments', {}))
+                for i, rule in enumerate(group['rules'])
+            ])
+        self._plan = [([(clauses, i) for clauses, i, _, _ in rules], len(rules) + 1) for rules in self._groups]
+
+        precedence = data['adjustment_precedence']
+        if sorted(precedence) != sorted(self.group_names):
+            raise ValueError("adjustment_precedence must list every rule group exactly once")
+        # Lowest precedence first, so later updates win
+        self._merge_order = [self.group_names.index(name) for name in reversed(precedence)]
+
+        effectiveness = data['effectiveness']
+        self.score_base = float(effectiveness['base'])
+        self.score_min = float(effectiveness['min'])
+        self.score_max = float(effectiveness['max'])
+        self._score_terms = [
+            [(compile_condition(rule.get('when')), float(rule['score'])) for rule in term['rules']]
+            for term in effectiveness['terms']
+        ]
+        self._severity = [(compile_condition(rule.get('when')), rule['label']) for rule in data['severity']]
+
+        missing = [name for name in REQUIRED_FLAGS if name not in data['flags']]
+        if missing:
+            raise ValueError(f"Feedback rules are missing flags {', '.join(missing)}")
+        self._flags = [compile_condition(data['flags'][name]) for name in REQUIRED_FLAGS]
+
+        self._outcomes = {}
+        self._decisions = {}
+
+    @classmethod
+    def load(cls, path=RULES_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _outcome(self, key):
+        """Merged (recommendations, adjustments) of an outcome key"""
+        outcome = self._outcomes.get(key)
+        if outcome is None:
+            indexes = []
+            rest = key
+            for _, size in reversed(self._plan):
+                rest, index = divmod(rest, size)
+                indexes.append(index)
+            matched = [
+                rules[index] if index < len(rules) else None
+                for rules, index in zip(self._groups, reversed(indexes))
+            ]
+            recommendations = [rule[2] for rule in matched if rule is not None and rule[2]]
+            adjustments = {}
+            for group in self._merge_order:
+                if matched[group] is not None:
+                    adjustments.update(matched[group][3])
+            outcome = self._outcomes[key] = (recommendations, adjustments)
+        return outcome
+
+    def _decide(self, metrics):
+        """(outcome, score, severity, flags) for a metrics tuple"""
+        key = 0
+        for rules, size in self._plan:
+            key = key * size + _first_match(rules, metrics, size - 1)
+        score = self.score_base
+        for rules in self._score_terms:
+            score += _first_match(rules, metrics, 0.0)
+        return (
+            self._outcome(key),
+            max(self.score_min, min(self.score_max, score)),
+            _first_match(self._severity, metrics, None),
+            tuple(_holds(clauses, metrics) for clauses in self._flags),
+        )
+
+    def evaluate(self, feedback):
+        """Analysis of one feedback dict"""
+        metrics = feedback_metrics(feedback)
+        # Sessions repeat the same few pain levels, set counts and ratings, so
+        # most decisions come from the cache
+        try:
+            decision = self._decisions.get(metrics)
+        except TypeError:
+            # Unhashable rating
+            decision = self._decide(metrics)
+        if decision is None:
+            if len(self._decisions) >= MAX_CACHED_DECISIONS:
+                self._decisions.clear()
+            decision = self._decisions[metrics] = self._decide(metrics)
+        (recommendations, adjustments), score, severity, flags = decision
+        is_beneficial, is_adequate, is_appropriate = flags
+
+        return {
+            'recommendations': list(recommendations),
+            'adjustments': dict(adjustments),
+            'effectiveness_score': score,
+            'pain_analysis': {
+                'pain_change': metrics[2],
+                'is_beneficial': is_beneficial,
+                'severity': severity
+            },
+            'completion_analysis': {
+                'completion_rate': metrics[3],
+                'is_adequate': is_adequate
+            },
+            'difficulty_analysis': {
+                'rating': metrics[4],
+                'is_appropriate': is_appropriate
+            }
+        }
+
+    def evaluate_batch(self, feedback_list):
+        """evaluate() for every item, with None for items that need the scalar path.
+
+        Those are non-dicts and items with a non-numeric field, whose errors
+        evaluate() raises. Results with the same outcome share one
+        recommendations list and adjustments dict (treat them as read-only).
+        """
+        results = [None] * len(feedback_list)
+        rows = [i for i, feedback in enumerate(feedback_list) if isinstance(feedback, dict)]
+        items = [feedback_list[i] for i in rows]
+        columns = {field: [f.get(field, default) for f in items] for field, default in NUMERIC_FIELDS.items()}
+        valid = np.ones(len(items), dtype=bool)
+        arrays = {}
+        for field, values in columns.items():
+            try:
+                array = np.array(values)
+            except ValueError:
+                # Ragged lists somewhere in this column
+                array = None
+            if array is None or array.ndim != 1 or array.dtype.kind not in 'biuf':
+                # Strings, None, lists or huge ints somewhere in this column
+                floats = [_float_or_none(value) for value in values]
+                valid &= [value is not None for value in floats]
+                array = np.array([0.0 if value is None else value for value in floats])
+            arrays[field] = array.astype(float)
+        if not valid.any():
+            return results
+
+        ratings = [f.get('difficultyRating', 'perfect') for f in items]
+        categories = self._categories
+        pain_before = arrays['painLevelBefore']
+        pain_after = arrays['painLevelAfter']
+        completion_rate = (
+            arrays['completedSets'] / np.maximum(arrays['targetSets'], 1)
+            + arrays['completedReps'] / np.maximum(arrays['targetReps'], 1)
+        ) / 2
+        metrics = (
+            pain_before, pain_after, pain_after - pain_before, completion_rate,
+            np.array([categories.get(r, OTHER_CATEGORY) if isinstance(r, str) else OTHER_CATEGORY for r in ratings]),
+        )
+
+        def mask(clauses):
+            holds = np.ones(len(items), dtype=bool)
+            for slot, compare, _, value in clauses:
+                holds &= compare(metrics[slot], value)
+            return holds
+
+        def first_match(rules, default):
+            if not rules:
+                return np.full(len(items), default)
+            return np.select([mask(clauses) for clauses, _ in rules], [result for _, result in rules], default=default)
+
+        key = np.zeros(len(items), dtype=np.int64)
+        for rules, size in self._plan:
+            key = key * size + first_match(rules, size - 1)
+        score = np.full(len(items), self.score_base)
+        for rules in self._score_terms:
+            score = score + first_match(rules, 0.0)
+        score = np.clip(score, self.score_min, self.score_max)
+        labels = [label for _, label in self._severity] + [None]
+        severity = first_match([(clauses, i) for i, (clauses, _) in enumerate(self._severity)], len(labels) - 1)
+        is_beneficial, is_adequate, is_appropriate = [mask(clauses).tolist() for clauses in self._flags]
+
+        # Python lists: indexing them per item is far cheaper than indexing arrays
+        key = key.tolist()
+        score = score.tolist()
+        severity = severity.tolist()
+        completion_rate = completion_rate.tolist()
+        before = columns['painLevelBefore']
+        after = columns['painLevelAfter']
+        for j in np.flatnonzero(valid).tolist():
+            recommendations, adjustments = self._outcome(key[j])
+            results[rows[j]] = {
+                'recommendations': recommendations,
+                'adjustments': adjustments,
+                'effectiveness_score': score[j],
+                'pain_analysis': {
+                    # From the request values, so ints stay ints as in evaluate()
+                    'pain_change': after[j] - before[j],
+                    'is_beneficial': is_beneficial[j],
+                    'severity': labels[severity[j]]
+                },
+                'completion_analysis': {
+                    'completion_rate': completion_rate[j],
+                    'is_adequate': is_adequate[j]
+                },
+                'difficulty_analysis': {
+                    'rating': ratings[j],
+                    'is_appropriate': is_appropriate[j]
+                }
+            }
+        return results
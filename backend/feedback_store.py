@@ -0,0 +1,651 @@
+# feedback_store.py - Append-only segmented storage for exercise feedback
+#
+# Feedback events are appended as checksummed records to segment files under
+# one directory. Every process writes to its own active segment and rotates it
+# once it passes segment_max_bytes, so gunicorn workers never share a file.
+#
+# Record layout (little endian):
+#   u32 length     bytes after this field
+#   u32 crc32      of everything after this field
+#   i64 timestamp  milliseconds since the epoch
+#   u16 user_len, u16 exercise_len
+#   user_id, exercise_id (utf-8), then the JSON payload
+#
+# Readers index records by user and exercise from the fixed header alone and
+# pick up records appended by other processes on their next scan. A torn or
+# corrupted record (e.g. after a crash mid-write) fails its checksum and is
+# skipped. Sealed segments get a .idx sidecar so reopening does not rescan them.
+#
+# Usage (from the backend directory), to import the old one-file-per-event data:
+#   python feedback_store.py migrate data data/feedback
+import bisect
+import glob
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<IIqHH')
+PREFIX = struct.Struct('<II')
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# Records larger than this are treated as corruption when scanning
+MAX_RECORD_BYTES = 16 * 1024 * 1024
+# Directories modified this recently are listed on every refresh (mtime granularity)
+LISTING_SLACK_NS = 2 * 10**9
+# Queue marker telling the writer thread to write its batch now
+_FLUSH = object()
+
+
+def to_millis(value):
+    """Accept datetimes, ISO strings, or epoch milliseconds (int or float).
+
+    Raises ValueError for anything else, including malformed ISO strings.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Not a timestamp: {value!r}")
+    if isinstance(value, (int, float)):
+        try:
+            return int(value)
+        except (ValueError, OverflowError):  # NaN, infinity
+            raise ValueError(f"Not a timestamp: {value!r}")
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)  # ValueError when malformed
+    if not isinstance(value, datetime):
+        raise ValueError(f"Not a timestamp: {value!r}")
+    return int(value.timestamp() * 1000)
+
+
+def encode_record(timestamp_ms, user_id, exercise_id, payload):
+    user = (user_id or '').encode('utf-8')
+    exercise = (exercise_id or '').encode('utf-8')
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+    fixed = struct.pack('<qHH', timestamp_ms, len(user), len(exercise))
+    rest = fixed + user + exercise + body
+    return PREFIX.pack(len(rest) + 4, zlib.crc32(rest)) + rest
+
+
+class _Segment:
+    """Index state for one segment file"""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.scanned = 0  # bytes already indexed
+        self.corrupt = 0
+
+
+class FeedbackStore:
+    """Append-only feedback records with per-user, per-exercise and per-pair indexes.
+
+    Index entries are (timestamp_ms, segment_name, offset) tuples kept sorted
+    by timestamp, so a time-window scan is two bisects plus one read per
+    matching record.
+    """
+
+    def __init__(self, directory, segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._segments = {}
+        self._by_user = {}
+        self._by_exercise = {}
+        self._by_pair = {}  # (user_id, exercise_id) -> entries
+        self._unsorted_users = set()
+        self._unsorted_exercises = set()
+        self._unsorted_pairs = set()
+        self._read_handles = {}
+        # Segments other processes may still append to, and the directory mtime last listed
+        self._tailing = {}
+        self._listed = None
+
+        self._active_fd = None
+        self._active_name = None
+        self._active_size = 0
+        self._active_entries = []  # sidecar rows for the active segment
+        self.stats = {'appended': 0, 'corrupt_records': 0, 'segments_rotated': 0}
+
+        self.refresh()
+
+    # Writing
+
+    def _open_segment(self):
+        name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self._active_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | os.O_EXCL, 0o644)
+        self._active_name = name
+        self._active_size = 0
+        self._active_entries = []
+        self._segments[name] = _Segment(name, path)
+
+    def _seal_active(self):
+        """Close the active segment and write its index sidecar"""
+        if self._active_fd is None:
+            return
+        os.fsync(self._active_fd)
+        os.close(self._active_fd)
+        self._active_fd = None
+        segment = self._segments[self._active_name]
+        self._write_sidecar(segment, self._active_entries)
+        self._active_name = None
+        self._active_entries = []
+        self.stats['segments_rotated'] += 1
+
+    def _retire_active(self):
+        """Stop appending to the active segment after a failed write, whatever state it is in.
+
+        No sidecar is written, since the file may end in a torn record; readers
+        rescan the segment and stop at the incomplete tail.
+        """
+        if self._active_fd is None:
+            return
+        fd = self._active_fd
+        self._active_fd = None
+        self._active_name = None
+        self._active_entries = []
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+    def append(self, payload, user_id=None, exercise_id=None, timestamp=None):
+        """Append one record; returns its timestamp in milliseconds"""
+        return self.append_many([(payload, user_id, exercise_id, timestamp)])[0]
+
+    def append_many(self, records):
+        """Append (payload, user_id, exercise_id, timestamp) tuples with one write per segment.
+
+        Returns the timestamps in milliseconds. Nothing is fsynced; call sync().
+        An OSError carries records_written: how many leading records were
+        appended in full before it, so a retry can resend only the rest.
+        """
+        now_ms = int(time.time() * 1000)
+        encoded = []
+        for payload, user_id, exercise_id, timestamp in records:
+            timestamp_ms = to_millis(timestamp) if timestamp is not None else now_ms
+            encoded.append((timestamp_ms, user_id or '', exercise_id or '',
+                            encode_record(timestamp_ms, user_id, exercise_id, payload)))
+
+        with self._lock:
+            i = 0
+            done = 0  # records appended in full
+            try:
+                while i < len(encoded):
+                    if self._active_fd is None or self._active_size >= self.segment_max_bytes:
+                        self._seal_active()
+                        self._open_segment()
+                    # Take records until this segment is full
+                    start = i
+                    size = self._active_size
+                    while i < len(encoded) and (i == start or size < self.segment_max_bytes):
+                        size += len(encoded[i][3])
+                        i += 1
+                    data = b''.join(record for *_, record in encoded[start:i])
+                    view = memoryview(data)
+                    error = None
+                    end = self._active_size + len(data)
+                    try:
+                        while view:
+                            written = os.write(self._active_fd, view)
+                            view = view[written:]
+                    except OSError as e:
+                        error = e
+                        # A failed write may still have put part of the data on disk
+                        try:
+                            end = os.fstat(self._active_fd).st_size
+                        except OSError:
+                            end = self._active_size + len(data) - len(view)
+                    # Index our own writes directly; refresh() never rescans the active segment.
+                    # After a failed write that is only the records that made it in whole.
+                    offset = self._active_size
+                    for timestamp_ms, user_id, exercise_id, record in encoded[start:i]:
+                        if offset + len(record) > end:
+                            break
+                        self._index(timestamp_ms, self._active_name, offset, user_id, exercise_id)
+                        self._active_entries.append([user_id, exercise_id, timestamp_ms, offset])
+                        offset += len(record)
+                        done += 1
+                    self._active_size = offset
+                    self._segments[self._active_name].scanned = offset
+                    if error is not None:
+                        raise error
+            except OSError as e:
+                # Part of a record may be on disk and appending after it would break
+                # the framing, so the next write starts a fresh segment
+                self._retire_active()
+                self.stats['appended'] += done
+                e.records_written = done
+                raise
+            self.stats['appended'] += len(encoded)
+        return [timestamp_ms for timestamp_ms, *_ in encoded]
+
+    def sync(self):
+        """Flush the active segment to disk"""
+        with self._lock:
+            if self._active_fd is not None:
+                os.fsync(self._active_fd)
+
+    def close(self):
+        with self._lock:
+            self._seal_active()
+            for handle in self._read_handles.values():
+                handle.close()
+            self._read_handles.clear()
+
+    # Indexing
+
+    def _index(self, timestamp_ms, segment_name, offset, user_id, exercise_id):
+        entry = (timestamp_ms, segment_name, offset)
+        for index, unsorted, key in ((self._by_user, self._unsorted_users, user_id),
+                                     (self._by_exercise, self._unsorted_exercises, exercise_id),
+                                     (self._by_pair, self._unsorted_pairs, (user_id, exercise_id))):
+            entries = index.get(key)
+            if entries is None:
+                index[key] = [entry]
+            else:
+                if entries[-1] > entry:
+                    unsorted.add(key)
+                entries.append(entry)
+
+    def _scan_segment(self, segment):
+        """Index records from segment.scanned up to the last complete record"""
+        try:
+            size = os.path.getsize(segment.path)
+        except FileNotFoundError:
+            return
+        if size <= segment.scanned:
+            return
+        with open(segment.path, 'rb') as f:
+            f.seek(segment.scanned)
+            data = f.read(size - segment.scanned)
+
+        position = 0
+        while position + HEADER.size <= len(data):
+            length, crc = PREFIX.unpack_from(data, position)
+            if length < HEADER.size - 4 or length > MAX_RECORD_BYTES:
+                # A garbage length means the rest of the segment cannot be framed
+                logger.error(f"Unreadable record at {segment.name}:{segment.scanned + position}; skipping the rest")
+                segment.corrupt += 1
+                self.stats['corrupt_records'] += 1
+                position = len(data)
+                break
+            end = position + 4 + length
+            if end > len(data):
+                break  # incomplete tail, possibly still being written
+            if zlib.crc32(data[position + 8:end]) != crc:
+                segment.corrupt += 1
+                self.stats['corrupt_records'] += 1
+            else:
+                _, _, timestamp_ms, user_len, exercise_len = HEADER.unpack_from(data, position)
+                start = position + HEADER.size
+                user_id = data[start:start + user_len].decode('utf-8')
+                exercise_id = data[start + user_len:start + user_len + exercise_len].decode('utf-8')
+                self._index(timestamp_ms, segment.name, segment.scanned + position, user_id, exercise_id)
+            position = end
+        segment.scanned += position
+
+    def _write_sidecar(self, segment, entries):
+        sidecar = {'size': segment.scanned, 'corrupt': segment.corrupt, 'entries': entries}
+        path = os.path.join(self.directory, segment.name + INDEX_SUFFIX)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _load_sidecar(self, segment):
+        path = os.path.join(self.directory, segment.name + INDEX_SUFFIX)
+        try:
+            with open(path, 'r') as f:
+                sidecar = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if sidecar['size'] != os.path.getsize(segment.path):
+            return False
+        for user_id, exercise_id, timestamp_ms, offset in sidecar['entries']:
+            self._index(timestamp_ms, segment.name, offset, user_id, exercise_id)
+        segment.scanned = sidecar['size']
+        segment.corrupt = sidecar.get('corrupt', 0)
+        return True
+
+    def refresh(self):
+        """Index segments and records written since the last refresh, by any process.
+
+        Sealed segments are never looked at again and segments other processes
+        are still writing cost one stat each. The directory is only listed
+        again when its modification time says files were added.
+        """
+        with self._lock:
+            try:
+                listed = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                listed = None
+            # A file created within the filesystem's timestamp granularity may
+            # leave the mtime unchanged, so recently modified directories are listed anyway
+            if listed is None or listed != self._listed or time.time_ns() - listed < LISTING_SLACK_NS:
+                self._listed = listed
+                self._discover()
+            for segment in list(self._tailing.values()):
+                self._scan_segment(segment)
+            self._sort_pending()
+
+    def _discover(self):
+        """Pick up new segments and stop tailing the ones their writer has sealed"""
+        try:
+            names = set(os.listdir(self.directory))
+        except FileNotFoundError:
+            return
+        for filename in sorted(names):
+            if not filename.endswith(SEGMENT_SUFFIX):
+                continue
+            name = filename[:-len(SEGMENT_SUFFIX)]
+            if name in self._segments:
+                continue
+            segment = self._segments[name] = _Segment(name, os.path.join(self.directory, filename))
+            if not self._load_sidecar(segment):
+                self._tailing[name] = segment
+        for name, segment in list(self._tailing.items()):
+            if name + INDEX_SUFFIX in names:
+                # Sealed since the last listing; the sidecar is written after the final fsync
+                self._scan_segment(segment)
+                del self._tailing[name]
+
+    def _sort_pending(self):
+        for index, unsorted in ((self._by_user, self._unsorted_users),
+                                (self._by_exercise, self._unsorted_exercises),
+                                (self._by_pair, self._unsorted_pairs)):
+            for key in unsorted:
+                index[key].sort()
+            unsorted.clear()
+
+    # Reading
+
+    def _read_at(self, segment_name, offset):
+        handle = self._read_handles.get(segment_name)
+        if handle is None:
+            handle = self._read_handles[segment_name] = open(self._segments[segment_name].path, 'rb')
+        handle.seek(offset)
+        prefix = handle.read(PREFIX.size)
+        length, crc = PREFIX.unpack(prefix)
+        rest = handle.read(length - 4)
+        if zlib.crc32(rest) != crc:
+            raise ValueError(f"Checksum mismatch at {segment_name}:{offset}")
+        _, user_len, exercise_len = struct.unpack_from('<qHH', rest)
+        return json.loads(rest[12 + user_len + exercise_len:])
+
+    def _entries_for(self, user_id, exercise_id):
+        if user_id is None and exercise_id is None:
+            raise ValueError("scan needs a user_id or an exercise_id")
+        if exercise_id is None:
+            return self._by_user.get(user_id, [])
+        if user_id is None:
+            return self._by_exercise.get(exercise_id, [])
+        return self._by_pair.get((user_id, exercise_id), [])
+
+    def _read_entries(self, selected):
+        records = []
+        for timestamp_ms, segment_name, offset in selected:
+            try:
+                records.append(self._read_at(segment_name, offset))
+            except (ValueError, struct.error) as e:
+                logger.error(f"Skipping unreadable feedback record: {e}")
+        return records
+
+    def scan(self, user_id=None, exercise_id=None, start=None, end=None):
+        """Records for a user and/or exercise in [start, end), oldest first.
+
+        start and end accept datetimes, ISO strings or epoch milliseconds.
+        At least one of user_id and exercise_id is required.
+        """
+        start_ms = to_millis(start)
+        end_ms = to_millis(end)
+
+        with self._lock:
+            self.refresh()
+            entries = self._entries_for(user_id, exercise_id)
+            lo = 0 if start_ms is None else bisect.bisect_left(entries, (start_ms,))
+            hi = len(entries) if end_ms is None else bisect.bisect_left(entries, (end_ms,))
+            return self._read_entries(entries[lo:hi])
+
+    def page(self, user_id=None, exercise_id=None, start=None, end=None, after=None, limit=50, descending=False):
+        """One page of scan(), continuing past the index entry `after`.
+
+        Returns (records, last_entry); pass last_entry back as `after` for the
+        next page, or stop when it is None. A page costs two bisects plus one
+        read per record however deep into the history it is.
+        """
+        start_ms = to_millis(start)
+        end_ms = to_millis(end)
+
+        with self._lock:
+            self.refresh()
+            entries = self._entries_for(user_id, exercise_id)
+            lo = 0 if start_ms is None else bisect.bisect_left(entries, (start_ms,))
+            hi = len(entries) if end_ms is None else bisect.bisect_left(entries, (end_ms,))
+            if after is not None:
+                after = tuple(after)
+                if descending:
+                    hi = min(hi, bisect.bisect_left(entries, after))
+                else:
+                    lo = max(lo, bisect.bisect_right(entries, after))
+            if descending:
+                selected = entries[max(lo, hi - limit):hi][::-1]
+            else:
+                selected = entries[lo:min(hi, lo + limit)]
+            return self._read_entries(selected), (selected[-1] if hi - lo > limit else None)
+
+    def entries(self, user_id=None, exercise_id=None):
+        """Sorted (timestamp_ms, segment, offset) index entries for a user or an exercise"""
+        with self._lock:
+            self.refresh()
+            if user_id is not None:
+                return list(self._by_user.get(user_id, []))
+            return list(self._by_exercise.get(exercise_id, []))
+
+    def read(self, entry):
+        """The record behind one index entry"""
+        with self._lock:
+            return self._read_at(entry[1], entry[2])
+
+    def count(self, user_id=None, exercise_id=None):
+        with self._lock:
+            self.refresh()
+            if user_id is not None:
+                return len(self._by_user.get(user_id, []))
+            if exercise_id is not None:
+                return len(self._by_exercise.get(exercise_id, []))
+            return sum(len(entries) for entries in self._by_user.values())
+
+    def users(self):
+        with self._lock:
+            self.refresh()
+            return sorted(user_id for user_id in self._by_user if user_id)
+
+
+class FeedbackWriter:
+    """Write-behind queue in front of a FeedbackStore.
+
+    submit() only enqueues. A background thread collects up to batch_size
+    records, or whatever arrived within flush_interval seconds, appends them
+    with one write and makes them durable with one fsync. close() drains the
+    queue, so registering it with atexit keeps clean shutdowns lossless.
+    """
+
+    def __init__(self, store, batch_size=512, flush_interval=0.05, max_queue=100000, max_retries=3):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self._flushed = threading.Condition()
+        self._submitted = 0
+        self._written = 0  # records written or dropped, in submission order
+        self.stats = {
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'write_errors': 0,
+            'last_flush_ms': None,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def _ensure_started(self):
+        # Started on first use so forked web workers each get their own thread
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, payload, user_id=None, exercise_id=None, timestamp=None):
+        """Queue one record for writing; blocks only if the queue is full"""
+        if self._closed:
+            raise RuntimeError("FeedbackWriter is closed")
+        self._ensure_started()
+        with self._flushed:
+            self._submitted += 1
+        self._queue.put((payload, user_id, exercise_id, timestamp))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if item is _FLUSH:
+                continue
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        count = len(batch)
+        started = time.perf_counter()
+        pending = batch
+        for attempt in range(self.max_retries):
+            try:
+                if pending:
+                    self.store.append_many(pending)
+                    pending = []
+                self.store.sync()
+                break
+            except OSError as e:
+                # Resend only what did not make it in whole, so nothing is written twice
+                if pending:
+                    pending = pending[getattr(e, 'records_written', 0):]
+                self.stats['write_errors'] += 1
+                logger.error(f"Feedback write failed (attempt {attempt + 1}): {e}")
+                time.sleep(0.1 * (attempt + 1))
+            except Exception as e:
+                # Records that cannot be encoded fail before anything is written;
+                # retrying cannot help, and the writer thread must keep running
+                logger.exception(f"Dropping {len(pending)} feedback records that could not be written: {e}")
+                self.stats['write_errors'] += 1
+                self.stats['dropped'] += len(pending)
+                count -= len(pending)
+                break
+        else:
+            logger.error(f"Dropping {count} feedback records after {self.max_retries} failed writes")
+            self.stats['dropped'] += count
+            count = 0
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats['written'] += count
+        self.stats['batches'] += 1
+        self.stats['last_flush_ms'] = round(elapsed_ms, 3)
+        self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], elapsed_ms), 3)
+        self.stats['total_flush_ms'] += elapsed_ms
+        with self._flushed:
+            self._written += len(batch)
+            self._flushed.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every record submitted before this call is on disk"""
+        with self._flushed:
+            target = self._submitted
+            if self._written >= target:
+                return True
+        # Cut the batching wait short
+        self._queue.put(_FLUSH)
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self, timeout=10):
+        """Stop accepting records, drain the queue and close the store"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self.store.close()
+
+    def status(self):
+        batches = self.stats['batches']
+        return {
+            'queue_depth': self._queue.qsize(),
+            'written': self.stats['written'],
+            'dropped': self.stats['dropped'],
+            'batches': batches,
+            'write_errors': self.stats['write_errors'],
+            'last_flush_ms': self.stats['last_flush_ms'],
+            'max_flush_ms': self.stats['max_flush_ms'],
+            'avg_flush_ms': round(self.stats['total_flush_ms'] / batches, 3) if batches else None,
+        }
+
+
+def migrate_json_files(source_dir, store):
+    """Append every legacy data/feedback_<id>.json file to the store; returns the count"""
+    count = 0
+    for path in sorted(glob.glob(os.path.join(source_dir, 'feedback_*.json'))):
+        with open(path, 'r') as f:
+            record = json.load(f)
+        feedback = record.get('feedback', {})
+        store.append(
+            record,
+            user_id=feedback.get('userId'),
+            exercise_id=feedback.get('exerciseId'),
+            timestamp=record.get('timestamp'),
+        )
+        count += 1
+    store.close()
+    return count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'migrate':
+        print("Usage: python feedback_store.py migrate <legacy data dir> <store dir>")
+        sys.exit(1)
+    migrated = migrate_json_files(sys.argv[2], FeedbackStore(sys.argv[3]))
+    print(f"Migrated {migrated} feedback files into {sys.argv[3]}")
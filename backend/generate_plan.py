@@ -1,149 +1,462 @@
 # generate_plan.py - Rehabilitation Plan Generation Module
-import pandas as pd
+#
+# pandas, sklearn and joblib are imported inside the functions that need them,
+# so importing this module (and starting the web server) stays cheap; they are
+# loaded by the background warmup or the first training run.
 import numpy as np
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report, confusion_matrix
-from sklearn.model_selection import train_test_split
-import joblib
 import uuid
 import os
 import json
 from datetime import datetime
 import logging
+import threading
+import time
+import tracemalloc
+
+from exercise_catalog import get_catalog
+from model_registry import ModelRegistry
+from prediction_table import PredictionTable, fingerprint_files
+from fast_inference import CompiledFeatureEncoder
+from tree_ensemble import FlatTreeEnsemble
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Vocabularies of the model input features, as produced by generate_training_data
+BODY_PARTS = ['Knee', 'Shoulder', 'Ankle', 'Wrist', 'Elbow', 'Hip', 'Back', 'Neck']
+PAIN_LEVELS = list(range(1, 11))
+PAIN_LOCATIONS = ['Joint', 'Muscle', 'Tendon', 'Ligament', 'Other']
+PREVIOUS_INJURIES = ['ACL tear', 'Meniscus tear', 'Rotator cuff injury', 'Ankle sprain', 
+                     'Tendonitis', 'Fracture', 'Dislocation', 'Muscle strain', 'None']
+SURGICAL_HISTORIES = ['ACL reconstruction', 'Meniscus repair', 'Rotator cuff repair', 
+                      'Joint replacement', 'None']
+PRIMARY_GOALS = ['Pain reduction', 'Improve range of motion', 'Increase strength', 
+                 'Return to sports', 'Post-surgery recovery']
+DIFFICULTY_LEVELS = ['beginner', 'intermediate', 'advanced']
+
+FEATURE_VOCABULARY = [
+    ('body_part', BODY_PARTS),
+    ('pain_level', PAIN_LEVELS),
+    ('pain_location', PAIN_LOCATIONS),
+    ('previous_injuries', PREVIOUS_INJURIES),
+    ('surgical_history', SURGICAL_HISTORIES),
+    ('primary_goal', PRIMARY_GOALS),
+]
+FEATURE_COLUMNS = [name for name, _ in FEATURE_VOCABULARY]
+CATEGORICAL_FEATURES = ['body_part', 'pain_location', 'previous_injuries', 
+                        'surgical_history', 'primary_goal']
+MODEL_FILES = ['feature_encoder.pkl', 'difficulty_model.pkl', 'sets_model.pkl', 'reps_model.pkl']
+
+# Target rules for the synthetic training data, ordered from lowest to highest pain.
+# A pain level belongs to the last band whose min_pain it reaches.
+SAMPLE_PAIN_BANDS = [
+    {
+        'min_pain': 1,  # Low pain (1-4)
+        'difficulty': ['intermediate', 'advanced'],
+        'difficulty_p': [0.6, 0.4],
+        'sets': [3, 4],
+        'reps': [10, 12, 15],
+    },
+    {
+        'min_pain': 5,  # Moderate pain (5-7)
+        'difficulty': ['beginner', 'intermediate'],
+        'difficulty_p': [0.7, 0.3],
+        'sets': [2, 3],
+        'reps': [8, 10],
+    },
+    {
+        'min_pain': 8,  # High pain (8-10): fewer sets and reps
+        'difficulty': ['beginner'],
+        'difficulty_p': [1.0],
+        'sets': [1, 2],
+        'reps': [5, 8],
+    },
+]
+SAMPLE_NOISE_RATE = 0.1  # share of rows whose targets are redrawn at random
+SAMPLE_NOISE_SETS = [1, 2, 3, 4]
+SAMPLE_NOISE_REPS = [5, 8, 10, 12, 15]
+
+# Pain level tiers, ordered from lowest to highest pain.
+# A pain level belongs to the last tier whose threshold it reaches.
+PAIN_TIER_THRESHOLDS = np.array([2, 4, 6, 8])
+PAIN_TIERS = [
+    {
+        'label': 'Very low pain',  # 0-1
+        'difficulty': 'advanced',
+        'sets': 4,
+        'reps': 15,
+        'max_duration': 90,
+        'plan_type': 'intensive, strength-focused',
+        'pain_priority': 'low',
+        'description': "An intensive, strength-focused plan for {body_part} recovery with advanced exercises.",
+    },
+    {
+        'label': 'Low-moderate pain',  # 2-3
+        'difficulty': 'intermediate',
+        'sets': 3,
+        'reps': 12,
+        'max_duration': 60,
+        'plan_type': 'progressive',
+        'pain_priority': 'low',
+        'description': "A progressive plan for {body_part} recovery with strength and mobility focus.",
+    },
+    {
+        'label': 'Moderate pain',  # 4-5
+        'difficulty': 'intermediate',
+        'sets': 2,
+        'reps': 10,
+        'max_duration': 45,
+        'plan_type': 'balanced intensity',
+        'pain_priority': 'medium',
+        'description': "A balanced intensity plan for {body_part} recovery with moderate pain management.",
+    },
+    {
+        'label': 'Moderate-high pain',  # 6-7
+        'difficulty': 'beginner',
+        'sets': 2,
+        'reps': 6,
+        'max_duration': 25,
+        'plan_type': 'careful, low-intensity',
+        'pain_priority': 'high',
+        'description': "A careful, low-intensity plan for {body_part} recovery focusing on pain management.",
+    },
+    {
+        'label': 'High pain',  # 8-10
+        'difficulty': 'beginner',
+        'sets': 1,
+        'reps': 5,
+        'max_duration': 15,
+        'plan_type': 'gentle, beginner-friendly',
+        'pain_priority': 'high',
+        'description': "A gentle, beginner-friendly plan for {body_part} recovery with high pain management focus.",
+    },
+]
+
+# Upper bound on the number of payloads accepted by a single batch request
+MAX_BATCH_SIZE = 1000
+
+def pain_tier_index(pain_levels):
+    """Map a pain level (or an array of them) to its index in PAIN_TIERS"""
+    return np.searchsorted(PAIN_TIER_THRESHOLDS, pain_levels, side='right')
+
+def _choose(rng, options, size, p=None):
+    """Draw `size` items from a list of options as an array of their own dtype"""
+    options = np.asarray(options, dtype=object if isinstance(options[0], str) else None)
+    if p is None:
+        return options[rng.integers(len(options), size=size)]
+    return options[np.searchsorted(np.cumsum(p), rng.random(size), side='right').clip(0, len(options) - 1)]
+
+def generate_training_data(n_samples=500, seed=None):
+    """Generate synthetic training rows with every column drawn as one array.
+
+    The targets follow SAMPLE_PAIN_BANDS, and SAMPLE_NOISE_RATE of the rows get
+    random targets instead. The same seed always gives the same DataFrame.
+    """
+    import pandas as pd
+    
+    rng = np.random.default_rng(seed)
+    data = {
+        name: _choose(rng, values, n_samples)
+        for name, values in FEATURE_VOCABULARY
+    }
+    pain_levels = data['pain_level']
+    
+    difficulty = np.empty(n_samples, dtype=object)
+    sets = np.empty(n_samples, dtype=np.int64)
+    reps = np.empty(n_samples, dtype=np.int64)
+    band_index = np.searchsorted([band['min_pain'] for band in SAMPLE_PAIN_BANDS], pain_levels, side='right') - 1
+    for b, band in enumerate(SAMPLE_PAIN_BANDS):
+        mask = band_index == b
+        count = int(mask.sum())
+        difficulty[mask] = _choose(rng, band['difficulty'], count, band['difficulty_p'])
+        sets[mask] = _choose(rng, band['sets'], count)
+        reps[mask] = _choose(rng, band['reps'], count)
+    
+    # Add some randomness but keep correlation
+    noise = rng.random(n_samples) < SAMPLE_NOISE_RATE
+    count = int(noise.sum())
+    difficulty[noise] = _choose(rng, DIFFICULTY_LEVELS, count)
+    sets[noise] = _choose(rng, SAMPLE_NOISE_SETS, count)
+    reps[noise] = _choose(rng, SAMPLE_NOISE_REPS, count)
+    
+    data['difficulty_level'] = difficulty
+    data['sets'] = sets
+    data['reps'] = reps
+    return pd.DataFrame(data)
+
+def iter_training_data(n_samples, chunk_size=100000, seed=None):
+    """Yield generate_training_data chunks totalling n_samples rows.
+
+    Each chunk gets its own child of the seed, so a (seed, chunk_size) pair
+    always streams the same data without holding it all in memory.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_samples // chunk_size))
+    for i, chunk_seed in enumerate(seeds):
+        yield generate_training_data(min(chunk_size, n_samples - i * chunk_size), chunk_seed)
+
+def _report_stage(progress, stage):
+    if progress is not None:
+        progress(stage)
+
+def _fit_and_measure(name, model, X, y):
+    """Fit one model, recording its wall-clock time and peak traced memory.
+
+    Runs in a joblib worker process, so the tracemalloc peak covers this fit only.
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    model.fit(X, y)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    # Forests were fitted in parallel; predict single-threaded at serving time
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = None
+    return name, model, {'fit_seconds': round(elapsed, 3), 'peak_memory_mb': round(peak / 2**20, 2)}
+
+def encode_features(encoder, X):
+    """One-hot encode raw features into the column layout the models were trained on"""
+    import pandas as pd
+    
+    X_cat = pd.DataFrame(
+        encoder.transform(X[CATEGORICAL_FEATURES]),
+        columns=encoder.get_feature_names_out(CATEGORICAL_FEATURES)
+    )
+    X_num = X[['pain_level']].reset_index(drop=True)
+    return pd.concat([X_num, X_cat], axis=1)
+
+class ModelBundle:
+    """One trained model version together with everything derived from it.
+
+    A bundle is fully built before it is served and never mutated afterwards,
+    so swapping PlanGenerationModel.bundle is the only step needed to move every
+    request to a new version.
+    """
+    
+    def __init__(self, encoder, difficulty_model, sets_model, reps_model, metrics, version=None, directory=None):
+        self.encoder = encoder
+        self.difficulty_model = difficulty_model
+        self.sets_model = sets_model
+        self.reps_model = reps_model
+        self.metrics = metrics
+        self.version = version
+        self.directory = directory
+        self.compiled_encoder = None
+        self.flat_models = None
+        self.prediction_table = None
+
+    def models(self):
+        return self.difficulty_model, self.sets_model, self.reps_model
+
+    @staticmethod
+    def fingerprint(directory):
+        """Content hash of the saved model files the prediction table was built from"""
+        return fingerprint_files(os.path.join(directory, name) for name in MODEL_FILES)
+
+    def build_prediction_table(self, directory, save=True):
+        """Run the models over the whole feature vocabulary, saving the table in directory"""
+        print("Building prediction table...")
+        self.prediction_table = PredictionTable.build(
+            FEATURE_VOCABULARY, self.predict_frame, self.fingerprint(directory)
+        )
+        if save:
+            self.prediction_table.save(directory)
+        print(f"Prediction table built with {len(self.prediction_table.table)} entries.")
+        return self.prediction_table
+
+    def predict_frame(self, X):
+        """Live inference: run all three models over a DataFrame of raw features"""
+        X_processed = encode_features(self.encoder, X)
+        return tuple(model.predict(X_processed) for model in self.models())
+
+    def compile_inference(self, n_check=256):
+        """Build the pandas-free inference path and check it against the pandas path.
+
+        The encoder is compiled into a column-index map and the three models are
+        flattened into arrays. Both paths then run over a fixed sample of the
+        vocabulary plus an out-of-vocabulary row; on any mismatch the compiled
+        path stays disabled.
+        """
+        import pandas as pd
+        
+        compiled = CompiledFeatureEncoder(self.encoder, CATEGORICAL_FEATURES)
+        flat_models = [FlatTreeEnsemble.from_sklearn(model) for model in self.models()]
+        
+        rng = np.random.default_rng(0)
+        sample = [
+            {name: values[rng.integers(len(values))] for name, values in FEATURE_VOCABULARY}
+            for _ in range(n_check)
+        ]
+        sample.append(dict(sample[0], body_part='Unknown', primary_goal='Unknown'))
+        
+        expected = self.predict_frame(pd.DataFrame(sample, columns=FEATURE_COLUMNS))
+        X = compiled.transform(sample)
+        actual = [flat.predict(X) for flat in flat_models]
+        
+        if all(np.array_equal(e, a) for e, a in zip(expected, actual)):
+            self.compiled_encoder = compiled
+            self.flat_models = flat_models
+        else:
+            logger.warning("Compiled inference disagrees with the pandas path; using pandas")
+        return self.compiled_encoder
+
+    def predict_rows(self, features_list):
+        """Live inference over feature dicts, via the compiled path when available"""
+        if self.compiled_encoder is None:
+            import pandas as pd
+            return self.predict_frame(pd.DataFrame(features_list, columns=FEATURE_COLUMNS))
+        if len(features_list) == 1:
+            X = self.compiled_encoder.transform_row(features_list[0])
+        else:
+            X = self.compiled_encoder.transform(features_list)
+        return tuple(flat.predict(X) for flat in self.flat_models)
+
+    def predict(self, features):
+        """Predict difficulty, sets and reps for a dict of raw model features.
+
+        In-vocabulary inputs are served from the prediction table; anything
+        else falls back to live inference.
+        """
+        prediction = None
+        if self.prediction_table is not None:
+            prediction = self.prediction_table.lookup(features)
+        source = 'table'
+        if prediction is None:
+            try:
+                difficulty, sets, reps = self.predict_rows([features])
+            except Exception as e:
+                logger.warning(f"Live inference failed for {features}: {e}")
+                return None
+            prediction = (difficulty[0], int(sets[0]), int(reps[0]))
+            source = 'model'
+        
+        return {
+            'difficultyLevel': str(prediction[0]),
+            'sets': prediction[1],
+            'reps': prediction[2],
+            'source': source,
+        }
+
+    def predict_batch(self, features_list):
+        """Batch version of predict with one table gather for all hits"""
+        predictions = [None] * len(features_list)
+        if not features_list:
+            return predictions
+        
+        hits = np.zeros(len(features_list), dtype=bool)
+        if self.prediction_table is not None:
+            rows, hits = self.prediction_table.lookup_many(features_list)
+            classes = self.prediction_table.difficulty_classes
+            for i in np.flatnonzero(hits):
+                predictions[i] = {
+                    'difficultyLevel': classes[rows[i, 0]],
+                    'sets': int(rows[i, 1]),
+                    'reps': int(rows[i, 2]),
+                    'source': 'table',
+                }
+        
+        misses = np.flatnonzero(~hits)
+        if len(misses):
+            try:
+                difficulty, sets, reps = self.predict_rows([features_list[i] for i in misses])
+            except Exception as e:
+                logger.warning(f"Live inference failed for {len(misses)} batch rows: {e}")
+                return predictions
+            for j, i in enumerate(misses):
+                predictions[i] = {
+                    'difficultyLevel': str(difficulty[j]),
+                    'sets': int(sets[j]),
+                    'reps': int(reps[j]),
+                    'source': 'model',
+                }
+        return predictions
+
 class PlanGenerationModel:
     def __init__(self):
-        self.encoder = None
-        self.difficulty_model = None
-        self.sets_model = None
-        self.reps_model = None
-        self.metrics = None
+        self.bundle = None
         self.models_dir = 'models'
+        self.registry = ModelRegistry(self.models_dir)
+        self._pointer_stamp = None
+        self._swap_lock = threading.Lock()
+        self.warmup_state = 'not_started'
+        self.warmup_timings = {}
+        self.warmup_error = None
         
         # Ensure models directory exists
         os.makedirs(self.models_dir, exist_ok=True)
     
-    def generate_sample_data(self):
+    def generate_sample_data(self, n_samples=500, seed=None):
         """Generate sample training data with logical pain level correlations"""
-        body_parts = ['Knee', 'Shoulder', 'Ankle', 'Wrist', 'Elbow', 'Hip', 'Back', 'Neck']
-        pain_levels = list(range(1, 11))
-        pain_locations = ['Joint', 'Muscle', 'Tendon', 'Ligament', 'Other']
-        previous_injuries = ['ACL tear', 'Meniscus tear', 'Rotator cuff injury', 'Ankle sprain', 
-                             'Tendonitis', 'Fracture', 'Dislocation', 'Muscle strain', 'None']
-        surgical_histories = ['ACL reconstruction', 'Meniscus repair', 'Rotator cuff repair', 
-                             'Joint replacement', 'None']
-        goals = ['Pain reduction', 'Improve range of motion', 'Increase strength', 
-                 'Return to sports', 'Post-surgery recovery']
-        
-        difficulty_levels = ['beginner', 'intermediate', 'advanced']
-        
-        data = []
-        
-        # Generate sample data with more logical pain level correlations
-        for _ in range(500):  # Increased sample size
-            body_part = np.random.choice(body_parts)
-            pain_level = np.random.choice(pain_levels)
-            pain_location = np.random.choice(pain_locations)
-            previous_injury = np.random.choice(previous_injuries)
-            surgical_history = np.random.choice(surgical_histories)
-            goal = np.random.choice(goals)
-            
-            # Better pain level to difficulty mapping
-            if pain_level >= 8:  # High pain (8-10)
-                difficulty = 'beginner'
-                sets = np.random.choice([1, 2])  # Fewer sets for high pain
-                reps = np.random.choice([5, 8])  # Fewer reps for high pain
-            elif pain_level >= 5:  # Moderate pain (5-7)
-                difficulty = np.random.choice(['beginner', 'intermediate'], p=[0.7, 0.3])
-                sets = np.random.choice([2, 3])
-                reps = np.random.choice([8, 10])
-            else:  # Low pain (1-4)
-                difficulty = np.random.choice(['intermediate', 'advanced'], p=[0.6, 0.4])
-                sets = np.random.choice([3, 4])
-                reps = np.random.choice([10, 12, 15])
-                
-            # Add some randomness but keep correlation
-            if np.random.random() < 0.1:  # 10% random variation
-                difficulty = np.random.choice(difficulty_levels)
-                sets = np.random.choice([1, 2, 3, 4])
-                reps = np.random.choice([5, 8, 10, 12, 15])
-            
-            data.append({
-                'body_part': body_part,
-                'pain_level': pain_level,
-                'pain_location': pain_location,
-                'previous_injuries': previous_injury,
-                'surgical_history': surgical_history,
-                'primary_goal': goal,
-                'difficulty_level': difficulty,
-                'sets': sets,
-                'reps': reps
-            })
-        
-        return pd.DataFrame(data)
+        return generate_training_data(n_samples, seed)
+
+    def train_models_with_metrics(self, progress=None, n_samples=500, seed=None):
+        """Train and save the models with metrics calculation.
 
-    def train_models_with_metrics(self):
-        """Train and save the models with metrics calculation"""
+        progress, if given, is called with the name of each stage as it starts.
+        n_samples and seed control the generated training data.
+        """
+        import joblib
+        from sklearn.tree import DecisionTreeClassifier
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import OneHotEncoder
+        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report, confusion_matrix
+        from sklearn.model_selection import train_test_split
+        
         print("Training models with metrics evaluation...")
         
         # Generate sample data
-        df = self.generate_sample_data()
+        _report_stage(progress, 'generating_data')
+        df = self.generate_sample_data(n_samples, seed)
         
         # Prepare features and targets
-        X = df[['body_part', 'pain_level', 'pain_location', 'previous_injuries', 
-                'surgical_history', 'primary_goal']]
+        X = df[FEATURE_COLUMNS]
         y_difficulty = df['difficulty_level']
         y_sets = df['sets']
         y_reps = df['reps']
         
-        # Split data into training and testing sets
-        X_train, X_test, y_diff_train, y_diff_test = train_test_split(X, y_difficulty, test_size=0.2, random_state=42)
-        _, _, y_sets_train, y_sets_test = train_test_split(X, y_sets, test_size=0.2, random_state=42)
-        _, _, y_reps_train, y_reps_test = train_test_split(X, y_reps, test_size=0.2, random_state=42)
-        
-        # Encode categorical features
-        categorical_features = ['body_part', 'pain_location', 'previous_injuries', 
-                               'surgical_history', 'primary_goal']
-        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-        
-        # Fit encoder on training data only
-        X_cat_train = pd.DataFrame(
-            encoder.fit_transform(X_train[categorical_features]),
-            columns=encoder.get_feature_names_out(categorical_features)
-        )
-        
-        # Transform test data
-        X_cat_test = pd.DataFrame(
-            encoder.transform(X_test[categorical_features]),
-            columns=encoder.get_feature_names_out(categorical_features)
+        # Split data into training and testing sets once, for all three targets
+        _report_stage(progress, 'training')
+        (X_train, X_test, y_diff_train, y_diff_test, y_sets_train, y_sets_test,
+         y_reps_train, y_reps_test) = train_test_split(
+            X, y_difficulty, y_sets, y_reps, test_size=0.2, random_state=42
         )
         
-        # Combine with numerical features
-        X_num_train = X_train[['pain_level']].reset_index(drop=True)
-        X_processed_train = pd.concat([X_num_train, X_cat_train], axis=1)
-        
-        X_num_test = X_test[['pain_level']].reset_index(drop=True)
-        X_processed_test = pd.concat([X_num_test, X_cat_test], axis=1)
+        # Encode categorical features, fitting the encoder on training data only
+        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+        encoder.fit(X_train[CATEGORICAL_FEATURES])
+        X_processed_train = encode_features(encoder, X_train)
+        X_processed_test = encode_features(encoder, X_test)
         
-        # Train models
+        # Train models in parallel
         # Decision Tree for difficulty level (categorical)
-        dt_diff = DecisionTreeClassifier(max_depth=5, random_state=42)
-        dt_diff.fit(X_processed_train, y_diff_train)
-        
         # Random Forest for sets and reps (numerical)
-        rf_sets = RandomForestClassifier(n_estimators=50, random_state=42)
-        rf_sets.fit(X_processed_train, y_sets_train)
+        n_parallel = min(3, os.cpu_count() or 1)
+        forest_jobs = max(1, (os.cpu_count() or 1) // n_parallel)
+        tasks = [
+            ('difficulty', DecisionTreeClassifier(max_depth=5, random_state=42), y_diff_train),
+            ('sets', RandomForestClassifier(n_estimators=50, random_state=42, n_jobs=forest_jobs), y_sets_train),
+            ('reps', RandomForestClassifier(n_estimators=50, random_state=42, n_jobs=forest_jobs), y_reps_train),
+        ]
+        training_started = time.perf_counter()
+        results = joblib.Parallel(n_jobs=n_parallel)(
+            joblib.delayed(_fit_and_measure)(name, model, X_processed_train, y)
+            for name, model, y in tasks
+        )
+        training_stats = {name: stats for name, _, stats in results}
+        training_stats['wall_seconds'] = round(time.perf_counter() - training_started, 3)
+        training_stats['parallel_models'] = n_parallel
+        training_stats['jobs_per_forest'] = forest_jobs
+        dt_diff, rf_sets, rf_reps = (model for _, model, _ in results)
         
-        rf_reps = RandomForestClassifier(n_estimators=50, random_state=42)
-        rf_reps.fit(X_processed_train, y_reps_train)
+        print("\nTraining time and peak memory:")
+        for name, _, stats in results:
+            print(f"{name}: {stats['fit_seconds']:.3f}s, {stats['peak_memory_mb']:.1f} MB")
+        print(f"Total wall time: {training_stats['wall_seconds']:.3f}s")
         
         # Evaluate models
+        _report_stage(progress, 'evaluating')
         y_diff_pred = dt_diff.predict(X_processed_test)
         y_sets_pred = rf_sets.predict(X_processed_test)
         y_reps_pred = rf_reps.predict(X_processed_test)
@@ -204,336 +517,217 @@ class PlanGenerationModel:
                 'accuracy': reps_accuracy,
                 'report': reps_report,
                 'confusion_matrix': reps_cm
-            }
+            },
+            'training': training_stats
         }
         
-        # Save metrics to a file
-        with open(f'{self.models_dir}/metrics.json', 'w') as f:
-            json.dump(metrics, f, indent=4, default=str)
-        
-        # Save models and encoder
+        # Save models, encoder and metrics as a new immutable model version
+        _report_stage(progress, 'saving')
+        version, staging_dir = self.registry.begin_version()
         try:
-            joblib.dump(dt_diff, f'{self.models_dir}/difficulty_model.pkl')
-            joblib.dump(rf_sets, f'{self.models_dir}/sets_model.pkl')
-            joblib.dump(rf_reps, f'{self.models_dir}/reps_model.pkl')
-            joblib.dump(encoder, f'{self.models_dir}/feature_encoder.pkl')
-            print("Models saved successfully.")
+            with open(os.path.join(staging_dir, 'metrics.json'), 'w') as f:
+                json.dump(metrics, f, indent=4, default=str)
+            joblib.dump(dt_diff, os.path.join(staging_dir, 'difficulty_model.pkl'))
+            joblib.dump(rf_sets, os.path.join(staging_dir, 'sets_model.pkl'))
+            joblib.dump(rf_reps, os.path.join(staging_dir, 'reps_model.pkl'))
+            joblib.dump(encoder, os.path.join(staging_dir, 'feature_encoder.pkl'))
+            
+            bundle = ModelBundle(encoder, dt_diff, rf_sets, rf_reps, metrics, version=version)
+            bundle.compile_inference()
+            # Precompute predictions for every in-vocabulary input
+            _report_stage(progress, 'building_prediction_table')
+            bundle.build_prediction_table(staging_dir)
+            
+            _report_stage(progress, 'publishing')
+            bundle.directory = self.registry.publish(version, staging_dir)
+            print(f"Models saved successfully as version {version}.")
         except Exception as e:
             print(f"Error saving models: {e}")
+            self.registry.discard(staging_dir)
             raise
         
-        # Store in instance variables
-        self.encoder = encoder
-        self.difficulty_model = dt_diff
-        self.sets_model = rf_sets
-        self.reps_model = rf_reps
-        self.metrics = metrics
-        
+        self._install_bundle(bundle)
         return encoder, dt_diff, rf_sets, rf_reps, metrics
 
-    def load_models(self):
-        """Load trained models or train new ones if not available"""
+    def load_models(self, timings=None):
+        """Load the current model version, or train new models if none can be loaded.
+
+        If a timings dict is given, the seconds spent in each loading step are added to it.
+        """
         try:
-            # Try to load all models
-            self.encoder = joblib.load(f'{self.models_dir}/feature_encoder.pkl')
-            self.difficulty_model = joblib.load(f'{self.models_dir}/difficulty_model.pkl')
-            self.sets_model = joblib.load(f'{self.models_dir}/sets_model.pkl')
-            self.reps_model = joblib.load(f'{self.models_dir}/reps_model.pkl')
-            
-            # Try to load metrics
-            with open(f'{self.models_dir}/metrics.json', 'r') as f:
-                self.metrics = json.load(f)
-                
+            version = self.registry.current_version()
+            if version is not None:
+                bundle = self._load_bundle(self.registry.version_dir(version), version, timings)
+            else:
+                # Models saved before the registry existed live directly in models_dir
+                bundle = self._load_bundle(self.models_dir, None, timings)
             print("Models and metrics loaded successfully.")
-            return True
         except (FileNotFoundError, EOFError, Exception) as e:
             # If any error occurs during loading, retrain all models
             print(f"Error loading models or metrics: {e}. Training new models...")
+            started = time.perf_counter()
             self.train_models_with_metrics()
+            if timings is not None:
+                timings['train_models'] = round(time.perf_counter() - started, 3)
             return True
+        
+        self._install_bundle(bundle)
+        return True
 
-    def get_exercise_database(self):
-        """Database of exercises for different body parts"""
-        exercises = {
-            'knee': [
-                {
-                    'name': 'Straight Leg Raises',
-                    'description': 'Lie flat on your back with one leg bent and the other straight. Tighten the thigh muscle of the straight leg and slowly raise it to the height of the bent knee.',
-                    'bodyPart': 'Knee',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Hamstring Curls',
-                    'description': 'Stand facing a wall or sturdy object for balance. Bend your affected knee, bringing your heel toward your buttocks. Hold, then lower slowly.',
-                    'bodyPart': 'Knee',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Wall Squats',
-                    'description': 'Stand with your back against a wall, feet shoulder-width apart. Slide down the wall until your knees are bent at about 45 degrees. Hold, then slide back up.',
-                    'bodyPart': 'Knee',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Step-Ups',
-                    'description': 'Step up onto a platform with your affected leg, then step down. Repeat.',
-                    'bodyPart': 'Knee',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Knee Extensions',
-                    'description': 'Sit in a chair and extend your affected leg until straight, then lower slowly.',
-                    'bodyPart': 'Knee',
-                    'durationSeconds': 30,
-                }
-            ],
-            'shoulder': [
-                {
-                    'name': 'Pendulum Exercise',
-                    'description': 'Lean forward slightly with support, allowing your affected arm to hang down. Swing your arm gently in small circles, then in larger circles. Repeat in the opposite direction.',
-                    'bodyPart': 'Shoulder',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Wall Crawl',
-                    'description': 'Stand facing a wall with your affected arm. Walk your fingers up the wall as high as comfortable. Slowly lower back down.',
-                    'bodyPart': 'Shoulder',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'External Rotation',
-                    'description': 'Holding a light resistance band, keep your elbow at 90 degrees and close to your side. Rotate your forearm outward, away from your body.',
-                    'bodyPart': 'Shoulder',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Internal Rotation',
-                    'description': 'With your elbow at your side, rotate your arm inward against resistance.',
-                    'bodyPart': 'Shoulder',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Shoulder Flexion',
-                    'description': 'Raise your arm forward and upward as high as comfortable.',
-                    'bodyPart': 'Shoulder',
-                    'durationSeconds': 30,
-                }
-            ],
-            'ankle': [
-                {
-                    'name': 'Ankle Pumps',
-                    'description': 'Move your foot up and down, bending at the ankle. This improves circulation and range of motion.',
-                    'bodyPart': 'Ankle',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Ankle Circles',
-                    'description': 'Rotate your ankle clockwise and counterclockwise, making circles with your toes.',
-                    'bodyPart': 'Ankle',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Heel Raises',
-                    'description': 'Stand with feet shoulder-width apart. Raise up onto your toes, then lower back down.',
-                    'bodyPart': 'Ankle',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Resistance Band Eversion',
-                    'description': 'With a resistance band, turn your foot outward against the resistance.',
-                    'bodyPart': 'Ankle',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Resistance Band Inversion',
-                    'description': 'With a resistance band, turn your foot inward against the resistance.',
-                    'bodyPart': 'Ankle',
-                    'durationSeconds': 45,
-                }
-            ],
-            'wrist': [
-                {
-                    'name': 'Wrist Flexion and Extension',
-                    'description': 'Hold your arm out with palm facing down. Bend your wrist down, then up.',
-                    'bodyPart': 'Wrist',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Wrist Rotations',
-                    'description': 'Rotate your wrist in circles, clockwise and counterclockwise.',
-                    'bodyPart': 'Wrist',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Finger Stretches',
-                    'description': 'Spread your fingers wide, then make a fist. Repeat.',
-                    'bodyPart': 'Wrist',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Grip Strengthening',
-                    'description': 'Squeeze a soft ball or stress ball, hold, then release.',
-                    'bodyPart': 'Wrist',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Wrist Stretches',
-                    'description': 'Extend your arm with palm up, use your other hand to gently pull fingers back toward your body.',
-                    'bodyPart': 'Wrist',
-                    'durationSeconds': 30,
-                }
-            ],
-            'elbow': [
-                {
-                    'name': 'Elbow Flexion and Extension',
-                    'description': 'Bend and straighten your elbow slowly.',
-                    'bodyPart': 'Elbow',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Wrist Turns',
-                    'description': 'With elbow bent at 90 degrees, rotate your palm up and down.',
-                    'bodyPart': 'Elbow',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Bicep Curls',
-                    'description': 'Hold a light weight and bend your elbow to bring your hand toward your shoulder.',
-                    'bodyPart': 'Elbow',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Tricep Extensions',
-                    'description': 'Hold a light weight behind your head and extend your arm upward.',
-                    'bodyPart': 'Elbow',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Elbow Stretches',
-                    'description': 'Extend your arm and gently pull your hand toward your opposite shoulder.',
-                    'bodyPart': 'Elbow',
-                    'durationSeconds': 30,
-                }
-            ],
-            'hip': [
-                {
-                    'name': 'Hip Abduction',
-                    'description': 'Lie on your side and lift your top leg upward, away from your other leg.',
-                    'bodyPart': 'Hip',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Hip Flexion',
-                    'description': 'Standing, lift your knee toward your chest.',
-                    'bodyPart': 'Hip',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Hip Extensions',
-                    'description': 'Standing, extend one leg behind you, keeping it straight.',
-                    'bodyPart': 'Hip',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Bridges',
-                    'description': 'Lie on your back with knees bent. Lift your hips forming a bridge.',
-                    'bodyPart': 'Hip',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Clamshells',
-                    'description': 'Lie on your side with knees bent. Open your top knee like a clamshell while keeping feet together.',
-                    'bodyPart': 'Hip',
-                    'durationSeconds': 30,
-                }
-            ],
-            'back': [
-                {
-                    'name': 'Prone Press-ups',
-                    'description': 'Lie face down and press up with your hands, keeping your hips on the ground.',
-                    'bodyPart': 'Back',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Bridges',
-                    'description': 'Lie on your back with knees bent. Lift your hips forming a bridge.',
-                    'bodyPart': 'Back',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Cat-Camel Stretch',
-                    'description': 'On hands and knees, alternate between arching and rounding your back.',
-                    'bodyPart': 'Back',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Bird Dog',
-                    'description': 'On hands and knees, extend opposite arm and leg simultaneously.',
-                    'bodyPart': 'Back',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Pelvic Tilts',
-                    'description': 'Lie on your back with knees bent. Tilt your pelvis by flattening your back against the floor.',
-                    'bodyPart': 'Back',
-                    'durationSeconds': 30,
-                }
-            ],
-            'neck': [
-                {
-                    'name': 'Neck Rotation',
-                    'description': 'Slowly turn your head to look over each shoulder.',
-                    'bodyPart': 'Neck',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Chin Tucks',
-                    'description': 'Pull your chin straight back, creating a "double chin."',
-                    'bodyPart': 'Neck',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Side Bend Stretch',
-                    'description': 'Gently tilt your head toward each shoulder.',
-                    'bodyPart': 'Neck',
-                    'durationSeconds': 60,
-                },
-                {
-                    'name': 'Neck Flexion and Extension',
-                    'description': 'Gently nod your head forward and back.',
-                    'bodyPart': 'Neck',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Isometric Exercises',
-                    'description': 'Place your hand against your head and push gently, resisting with your neck muscles.',
-                    'bodyPart': 'Neck',
-                    'durationSeconds': 30,
-                }
-            ],
-            'default': [
-                {
-                    'name': 'Range of Motion Exercise',
-                    'description': 'Gently move the affected body part through its full range of motion, stopping when you feel pain or discomfort.',
-                    'bodyPart': 'General',
-                    'durationSeconds': 30,
-                },
-                {
-                    'name': 'Strengthening Exercise',
-                    'description': 'Using light resistance, perform targeted strengthening movements for the affected area.',
-                    'bodyPart': 'General',
-                    'durationSeconds': 45,
-                },
-                {
-                    'name': 'Stability Exercise',
-                    'description': 'Focus on maintaining balance and stability while engaging the affected area.',
-                    'bodyPart': 'General',
-                    'durationSeconds': 60,
-                }
-            ]
-        }
+    def _load_bundle(self, directory, version, timings=None):
+        """Load every artifact of one model version into a ready-to-serve bundle"""
+        import joblib
+        
+        timings = {} if timings is None else timings
+        started = [time.perf_counter()]
+        
+        def mark(step):
+            now = time.perf_counter()
+            timings[step] = round(now - started[0], 3)
+            started[0] = now
+        
+        if version is not None:
+            self.registry.load_manifest(version, verify=True)
+            mark('verify_manifest')
+        
+        bundle = ModelBundle(
+            joblib.load(os.path.join(directory, 'feature_encoder.pkl')),
+            joblib.load(os.path.join(directory, 'difficulty_model.pkl')),
+            joblib.load(os.path.join(directory, 'sets_model.pkl')),
+            joblib.load(os.path.join(directory, 'reps_model.pkl')),
+            metrics=None,
+            version=version,
+            directory=directory,
+        )
+        with open(os.path.join(directory, 'metrics.json'), 'r') as f:
+            bundle.metrics = json.load(f)
+        mark('load_models')
         
-        return exercises
+        bundle.compile_inference()
+        mark('compile_inference')
+        bundle.prediction_table = PredictionTable.load(
+            directory, FEATURE_VOCABULARY, bundle.fingerprint(directory)
+        )
+        if bundle.prediction_table is None:
+            # Published versions are immutable, so only the legacy layout gets the table saved
+            bundle.build_prediction_table(directory, save=version is None)
+        mark('prediction_table')
+        return bundle
+
+    def _install_bundle(self, bundle):
+        """Make a bundle the one used for serving with a single reference assignment"""
+        self.bundle = bundle
+        self._pointer_stamp = self.registry.pointer_stamp()
+
+    def refresh_models(self, wait=False):
+        """Start swapping in a newly published model version, if there is one.
+
+        Costs one stat() of the pointer file when nothing changed. The new
+        version is loaded on a background thread (or inline with wait=True)
+        while requests keep being served from the old bundle.
+        """
+        if self.bundle is None:
+            # Nothing loaded yet: the warmup (or load_models) picks up the current version
+            return False
+        stamp = self.registry.pointer_stamp()
+        if stamp is None or stamp == self._pointer_stamp:
+            return False
+        if not self._swap_lock.acquire(blocking=False):
+            return False
+        if wait:
+            self._swap_to_published(stamp)
+        else:
+            threading.Thread(target=self._swap_to_published, args=(stamp,), daemon=True).start()
+        return True
+
+    def _swap_to_published(self, stamp):
+        """Load the published version and install it; releases the swap lock"""
+        try:
+            version = self.registry.current_version()
+            if self.bundle is not None and version == self.bundle.version:
+                self._pointer_stamp = stamp
+                return
+            try:
+                bundle = self._load_bundle(self.registry.version_dir(version), version)
+            except Exception as e:
+                # Keep serving the previous bundle; a later publish changes the stamp again
+                logger.error(f"Failed to load model version {version}: {e}")
+                self._pointer_stamp = stamp
+                return
+            self.bundle = bundle
+            self._pointer_stamp = stamp
+            logger.info(f"Switched to model version {version}")
+        finally:
+            self._swap_lock.release()
+
+    def start_warmup(self):
+        """Import the ML stack and load the models on a background thread.
+
+        Until it finishes, plans are generated from the pain tiers alone,
+        without a model prediction.
+        """
+        if self.warmup_state != 'not_started':
+            return False
+        self.warmup_state = 'warming'
+        threading.Thread(target=self._warmup, name='model-warmup', daemon=True).start()
+        return True
+
+    def _warmup(self):
+        timings = self.warmup_timings
+        started = time.perf_counter()
+        try:
+            import pandas  # noqa: F401
+            import joblib  # noqa: F401
+            import sklearn.tree  # noqa: F401
+            import sklearn.ensemble  # noqa: F401
+            timings['import_ml_libraries'] = round(time.perf_counter() - started, 3)
+            
+            self.load_models(timings=timings)
+            timings['total'] = round(time.perf_counter() - started, 3)
+            self.warmup_state = 'ready'
+            logger.info("Model warmup finished: " + ", ".join(f"{k}={v:.3f}s" for k, v in timings.items()))
+        except Exception as e:
+            self.warmup_error = str(e)
+            self.warmup_state = 'failed'
+            logger.error(f"Model warmup failed: {e}")
+
+    def predict_exercise_parameters(self, features):
+        """Predict difficulty, sets and reps for a dict of raw model features.
+
+        Returns None if no models are loaded.
+        """
+        self.refresh_models()
+        bundle = self.bundle
+        return bundle.predict(features) if bundle is not None else None
+
+    def predict_exercise_parameters_batch(self, features_list):
+        """Batch version of predict_exercise_parameters"""
+        self.refresh_models()
+        bundle = self.bundle
+        if bundle is None:
+            return [None] * len(features_list)
+        return bundle.predict_batch(features_list)
+
+    # Read-only views of the bundle currently being served
+    @property
+    def encoder(self):
+        return self.bundle.encoder if self.bundle is not None else None
+
+    @property
+    def difficulty_model(self):
+        return self.bundle.difficulty_model if self.bundle is not None else None
+
+    @property
+    def sets_model(self):
+        return self.bundle.sets_model if self.bundle is not None else None
+
+    @property
+    def reps_model(self):
+        return self.bundle.reps_model if self.bundle is not None else None
+
+    @property
+    def metrics(self):
+        return self.bundle.metrics if self.bundle is not None else None
 
     def generate_plan(self, rehab_data):
         """Generate a personalized rehabilitation plan based on user data"""
@@ -554,58 +748,16 @@ class PlanGenerationModel:
             print(f"Processing plan for pain level: {pain_level}")
             
             # EXPLICIT LOGIC BASED ON PAIN LEVEL
-            if pain_level >= 8:  # High pain (8-10)
-                difficulty = 'beginner'
-                sets = 1
-                reps = 5
-                max_duration = 15
-                plan_type = "gentle, beginner-friendly"
-                pain_priority = 'high'
-                print(f"High pain detected: sets={sets}, reps={reps}, difficulty={difficulty}")
-                
-            elif pain_level >= 6:  # Moderate-high pain (6-7)
-                difficulty = 'beginner'
-                sets = 2
-                reps = 6
-                max_duration = 25
-                plan_type = "careful, low-intensity"
-                pain_priority = 'high'
-                print(f"Moderate-high pain detected: sets={sets}, reps={reps}, difficulty={difficulty}")
-                
-            elif pain_level >= 4:  # Moderate pain (4-5)
-                difficulty = 'intermediate'
-                sets = 2
-                reps = 10
-                max_duration = 45
-                plan_type = "balanced intensity"
-                pain_priority = 'medium'
-                print(f"Moderate pain detected: sets={sets}, reps={reps}, difficulty={difficulty}")
-                
-            elif pain_level >= 2:  # Low-moderate pain (2-3)
-                difficulty = 'intermediate'
-                sets = 3
-                reps = 12
-                max_duration = 60
-                plan_type = "progressive"
-                pain_priority = 'low'
-                print(f"Low-moderate pain detected: sets={sets}, reps={reps}, difficulty={difficulty}")
-                
-            else:  # Very low pain (0-1)
-                difficulty = 'advanced'
-                sets = 4
-                reps = 15
-                max_duration = 90
-                plan_type = "intensive, strength-focused"
-                pain_priority = 'low'
-                print(f"Very low pain detected: sets={sets}, reps={reps}, difficulty={difficulty}")
+            tier = PAIN_TIERS[pain_tier_index(pain_level)]
+            difficulty = tier['difficulty']
+            sets = tier['sets']
+            reps = tier['reps']
+            max_duration = tier['max_duration']
+            pain_priority = tier['pain_priority']
+            print(f"{tier['label']} detected: sets={sets}, reps={reps}, difficulty={difficulty}")
             
-            # Get exercises from database
-            exercise_db = self.get_exercise_database()
-            body_part_key = body_part.lower()
-            if body_part_key in exercise_db:
-                exercises_list = exercise_db[body_part_key]
-            else:
-                exercises_list = exercise_db['default']
+            # Get exercises from the catalog
+            exercises_list = get_catalog().exercises_for(body_part, difficulty)
             
             # Create exercises with our explicit parameters
             exercises = []
@@ -632,16 +784,7 @@ class PlanGenerationModel:
             title = f"{body_part} Rehabilitation Plan"
             
             # Create description based on pain level
-            if pain_level >= 8:
-                description = f"A gentle, beginner-friendly plan for {body_part} recovery with high pain management focus."
-            elif pain_level >= 6:
-                description = f"A careful, low-intensity plan for {body_part} recovery focusing on pain management."
-            elif pain_level >= 4:
-                description = f"A balanced intensity plan for {body_part} recovery with moderate pain management."
-            elif pain_level >= 2:
-                description = f"A progressive plan for {body_part} recovery with strength and mobility focus."
-            else:
-                description = f"An intensive, strength-focused plan for {body_part} recovery with advanced exercises."
+            description = tier['description'].format(body_part=body_part)
                 
             if goals:
                 description += f" Focusing on {', '.join(goals)}."
@@ -658,6 +801,17 @@ class PlanGenerationModel:
                 }
             }
             
+            model_prediction = self.predict_exercise_parameters({
+                'body_part': body_part,
+                'pain_level': pain_level,
+                'pain_location': pain_location,
+                'previous_injuries': previous_injuries,
+                'surgical_history': surgical_history,
+                'primary_goal': primary_goal,
+            })
+            if model_prediction is not None:
+                plan['modelPrediction'] = model_prediction
+            
             print(f"Generated plan with {len(exercises)} exercises, pain priority: {pain_priority}")
             return plan
         
@@ -665,21 +819,150 @@ class PlanGenerationModel:
             print(f"Error generating plan: {e}")
             raise
 
+    def generate_plans(self, rehab_data_list):
+        """Generate plans for many users in a single columnar pass.
+
+        Returns one result per payload in input order. A payload that cannot be
+        processed gets an error entry instead of failing the whole batch.
+        """
+        results = [None] * len(rehab_data_list)
+
+        # Feature extraction: collect the planning inputs into columns
+        rows = []
+        body_parts = []
+        pain_levels = []
+        goals_column = []
+        features_column = []
+        for i, rehab_data in enumerate(rehab_data_list):
+            try:
+                body_part, pain_level, goals, features = self._extract_plan_inputs(rehab_data)
+            except ValueError as e:
+                results[i] = {'index': i, 'status': 'error', 'error': str(e)}
+                continue
+            rows.append(i)
+            body_parts.append(body_part)
+            pain_levels.append(pain_level)
+            goals_column.append(goals)
+            features_column.append(features)
+
+        if not rows:
+            return results
+        
+        # Model predictions for all rows: one table gather plus one live call for misses
+        model_predictions = self.predict_exercise_parameters_batch(features_column)
+
+        # Tier assignment for every row at once
+        tier_indices = pain_tier_index(np.asarray(pain_levels)).tolist()
+
+        # Exercise templates only depend on (body part, tier), so build each once
+        catalog = get_catalog()
+        templates = {}
+        for body_part, tier_index in zip(body_parts, tier_indices):
+            key = (body_part.lower(), tier_index)
+            if key in templates:
+                continue
+            tier = PAIN_TIERS[tier_index]
+            exercises_list = catalog.exercises_for(body_part, tier['difficulty'])
+            templates[key] = [
+                {
+                    'name': ex['name'],
+                    'description': ex['description'],
+                    'bodyPart': ex['bodyPart'],
+                    'sets': tier['sets'],
+                    'reps': tier['reps'],
+                    'durationSeconds': min(ex['durationSeconds'], tier['max_duration']),
+                    'difficultyLevel': tier['difficulty'],
+                }
+                for ex in exercises_list
+            ]
+
+        # Exercise building: stamp the templates with per-plan exercise ids
+        for i, body_part, tier_index, goals, model_prediction in zip(
+                rows, body_parts, tier_indices, goals_column, model_predictions):
+            body_part_key = body_part.lower()
+            template = templates[(body_part_key, tier_index)]
+            suffixes = os.urandom(2 * len(template)).hex()
+            exercises = []
+            for j, ex in enumerate(template):
+                exercise = {'id': f"{body_part_key}_{j+1}_{suffixes[4*j:4*j+4]}"}
+                exercise.update(ex)
+                exercises.append(exercise)
+
+            tier = PAIN_TIERS[tier_index]
+            description = tier['description'].format(body_part=body_part)
+            if goals:
+                description += f" Focusing on {', '.join(goals)}."
+
+            plan = {
+                'title': f"{body_part} Rehabilitation Plan",
+                'description': description,
+                'exercises': exercises,
+                'goals': {
+                    'primary': goals[0] if goals else 'Pain reduction',
+                    'bodyPart': body_part,
+                    'painReduction': tier['pain_priority'],
+                }
+            }
+            if model_prediction is not None:
+                plan['modelPrediction'] = model_prediction
+            results[i] = {'index': i, 'status': 'success', 'plan': plan}
+
+        return results
+
+    def _extract_plan_inputs(self, rehab_data):
+        """Validate a payload and pull out (body_part, pain_level, goals, model features)"""
+        if not isinstance(rehab_data, dict):
+            raise ValueError('Payload must be a JSON object')
+        physical_condition = rehab_data.get('physicalCondition', {})
+        if not isinstance(physical_condition, dict):
+            raise ValueError('physicalCondition must be a JSON object')
+
+        body_part = physical_condition.get('bodyPart', 'Knee')
+        if not isinstance(body_part, str) or not body_part:
+            raise ValueError(f"Invalid bodyPart: {body_part!r}")
+
+        pain_level = physical_condition.get('painLevel', 5)
+        try:
+            pain_level = int(pain_level)
+        except (TypeError, ValueError, OverflowError):  # OverflowError: infinity
+            raise ValueError(f"Invalid painLevel: {pain_level!r}")
+
+        goals = rehab_data.get('rehabilitationGoals', [])
+        if not isinstance(goals, list) or not all(isinstance(g, str) for g in goals):
+            raise ValueError('rehabilitationGoals must be a list of strings')
+
+        medical_history = rehab_data.get('medicalHistory', {})
+        if not isinstance(medical_history, dict):
+            raise ValueError('medicalHistory must be a JSON object')
+
+        features = {
+            'body_part': body_part,
+            'pain_level': pain_level,
+            'pain_location': physical_condition.get('painLocation', 'Joint'),
+            'previous_injuries': medical_history.get('previousInjuries', 'None'),
+            'surgical_history': medical_history.get('surgicalHistory', 'None'),
+            'primary_goal': goals[0] if goals else 'Pain reduction',
+        }
+        return body_part, pain_level, goals, features
+
     def get_model_metrics(self):
         """Get model performance metrics"""
+        self.refresh_models()
         if self.metrics is None:
-            # Load metrics if not already loaded
+            # Load metrics if no models are loaded yet
+            version = self.registry.current_version()
+            directory = self.registry.version_dir(version) if version else self.models_dir
             try:
-                with open(f'{self.models_dir}/metrics.json', 'r') as f:
-                    self.metrics = json.load(f)
+                with open(os.path.join(directory, 'metrics.json'), 'r') as f:
+                    return json.load(f)
             except FileNotFoundError:
                 return {'error': 'No metrics available. Please train models first.'}
         
         return self.metrics
 
-    def retrain_models(self):
+    def retrain_models(self, progress=None):
         """Retrain all models"""
-        return self.train_models_with_metrics()
+        return self.train_models_with_metrics(progress=progress)
 
 # Global instance
 plan_generator = PlanGenerationModel()
@@ -689,10 +972,20 @@ def initialize_plan_generator():
     """Initialize the plan generation model"""
     return plan_generator.load_models()
 
+def start_plan_generator_warmup():
+    """Initialize the plan generation model in the background"""
+    return plan_generator.start_warmup()
+
 def generate_rehabilitation_plan(rehab_data):
     """Public interface to generate rehabilitation plan"""
     return plan_generator.generate_plan(rehab_data)
 
+def generate_rehabilitation_plans(rehab_data_list):
+    """Public interface to generate rehabilitation plans for a batch of users"""
+    if len(rehab_data_list) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch size {len(rehab_data_list)} exceeds the limit of {MAX_BATCH_SIZE}")
+    return plan_generator.generate_plans(rehab_data_list)
+
 def get_plan_model_metrics():
     """Public interface to get model metrics"""
     return plan_generator.get_model_metrics()
@@ -701,6 +994,13 @@ def retrain_plan_models():
     """Public interface to retrain models"""
     return plan_generator.retrain_models()
 
+def _catalog_health():
+    try:
+        catalog = get_catalog()
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+    return {'status': 'ok', 'version': catalog.version, 'exercises': catalog.size}
+
 def check_plan_generator_health():
     """Check if plan generator is ready"""
     return {
@@ -710,5 +1010,13 @@ def check_plan_generator_health():
             'difficulty_model': plan_generator.difficulty_model is not None,
             'sets_model': plan_generator.sets_model is not None,
             'reps_model': plan_generator.reps_model is not None,
-        }
+        },
+        'model_version': plan_generator.bundle.version if plan_generator.bundle is not None else None,
+        'ready': plan_generator.bundle is not None,
+        'exercise_catalog': _catalog_health(),
+        'warmup': {
+            'state': plan_generator.warmup_state,
+            'timings': plan_generator.warmup_timings,
+            'error': plan_generator.warmup_error,
+        },
     }
\ No newline at end of file
@@ -0,0 +1,145 @@
+# model_registry.py - Versioned, immutable model storage with an atomic "current" pointer
+#
+# Layout under the registry root:
+#   versions/<version>/          one directory per training run, never modified once published
+#   versions/<version>/manifest.json   file list with sha256 checksums
+#   CURRENT                      name of the version being served, replaced atomically
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = 'versions'
+POINTER_FILENAME = 'CURRENT'
+MANIFEST_FILENAME = 'manifest.json'
+STAGING_PREFIX = '.staging-'
+
+
+class RegistryError(Exception):
+    """Raised when a model version is missing or fails verification"""
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, root, keep_versions=5):
+        self.root = root
+        self.versions_dir = os.path.join(root, VERSIONS_DIR)
+        self.pointer_path = os.path.join(root, POINTER_FILENAME)
+        self.keep_versions = keep_versions
+
+    def begin_version(self):
+        """Create an empty staging directory for a new training run.
+
+        Returns (version, staging_dir). Write the artifacts into staging_dir and
+        call publish(); nothing is visible to readers until then.
+        """
+        version = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        staging_dir = os.path.join(self.versions_dir, STAGING_PREFIX + version)
+        os.makedirs(staging_dir)
+        return version, staging_dir
+
+    def publish(self, version, staging_dir, extra=None):
+        """Seal a staged version and make it the current one.
+
+        Writes the manifest, renames the staging directory into place and then
+        swaps the pointer file with os.replace, so readers see either the old
+        version or the complete new one.
+        """
+        files = sorted(
+            name for name in os.listdir(staging_dir)
+            if name != MANIFEST_FILENAME and os.path.isfile(os.path.join(staging_dir, name))
+        )
+        manifest = {
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'files': {name: file_checksum(os.path.join(staging_dir, name)) for name in files},
+        }
+        if extra:
+            manifest.update(extra)
+        with open(os.path.join(staging_dir, MANIFEST_FILENAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        version_dir = self.version_dir(version)
+        os.rename(staging_dir, version_dir)
+        self._write_pointer(version)
+        logger.info(f"Published model version {version}")
+
+        self._prune()
+        return version_dir
+
+    def _write_pointer(self, version):
+        tmp_path = f"{self.pointer_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+
+    def discard(self, staging_dir):
+        """Remove a staging directory from a failed run"""
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def current_version(self):
+        """Name of the published version, or None if nothing was published yet"""
+        try:
+            with open(self.pointer_path, 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def pointer_stamp(self):
+        """Cheap change marker for the pointer file (None if it does not exist)"""
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+    def load_manifest(self, version, verify=True):
+        """Read a version's manifest and, optionally, check every file against it"""
+        version_dir = self.version_dir(version)
+        try:
+            with open(os.path.join(version_dir, MANIFEST_FILENAME), 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            raise RegistryError(f"Model version {version} has no manifest")
+
+        if verify:
+            for name, checksum in manifest['files'].items():
+                path = os.path.join(version_dir, name)
+                if not os.path.exists(path) or file_checksum(path) != checksum:
+                    raise RegistryError(f"Checksum mismatch for {name} in model version {version}")
+        return manifest
+
+    def list_versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.versions_dir)
+            if not name.startswith(STAGING_PREFIX)
+        )
+
+    def _prune(self):
+        """Drop the oldest published versions beyond keep_versions, never the current one"""
+        current = self.current_version()
+        versions = [v for v in self.list_versions() if v != current]
+        excess = len(versions) + 1 - self.keep_versions
+        for version in versions[:max(excess, 0)]:
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
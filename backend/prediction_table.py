@@ -0,0 +1,147 @@
+# prediction_table.py - Precomputed model predictions over the finite feature space
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TABLE_FILENAME = 'prediction_table.npy'
+META_FILENAME = 'prediction_table.json'
+
+# Columns of the table, in storage order
+DIFFICULTY_COLUMN = 0
+SETS_COLUMN = 1
+REPS_COLUMN = 2
+
+
+def fingerprint_files(paths):
+    """Hash the contents of the given files so stale tables can be detected"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionTable:
+    """Dense lookup table holding the model outputs for every feature combination.
+
+    `vocabulary` is an ordered list of (feature_name, values) pairs. Each input
+    is mapped to a flat row index with mixed-radix arithmetic over the value
+    positions, so a lookup is a handful of dict hits and one array read.
+    """
+
+    def __init__(self, vocabulary, table, difficulty_classes, fingerprint=None):
+        self.vocabulary = [(name, list(values)) for name, values in vocabulary]
+        self.table = table
+        self.difficulty_classes = list(difficulty_classes)
+        self.fingerprint = fingerprint
+
+        self._positions = [
+            (name, {value: i for i, value in enumerate(values)})
+            for name, values in self.vocabulary
+        ]
+        self._shape = tuple(len(values) for _, values in self.vocabulary)
+
+    @classmethod
+    def build(cls, vocabulary, predict_fn, fingerprint=None):
+        """Run `predict_fn` over every combination in the vocabulary.
+
+        `predict_fn` takes a DataFrame of raw features and returns
+        (difficulty, sets, reps) arrays, i.e. the live inference path.
+        """
+        import pandas as pd
+
+        shape = tuple(len(values) for _, values in vocabulary)
+        grid = np.indices(shape).reshape(len(shape), -1)
+        features = pd.DataFrame({
+            name: np.asarray(values, dtype=object)[grid[i]]
+            for i, (name, values) in enumerate(vocabulary)
+        })
+
+        difficulty, sets, reps = predict_fn(features)
+        difficulty_classes, difficulty_codes = np.unique(np.asarray(difficulty, dtype=str), return_inverse=True)
+
+        table = np.empty((len(features), 3), dtype=np.int16)
+        table[:, DIFFICULTY_COLUMN] = difficulty_codes
+        table[:, SETS_COLUMN] = sets
+        table[:, REPS_COLUMN] = reps
+        return cls(vocabulary, table, difficulty_classes.tolist(), fingerprint)
+
+    def save(self, directory):
+        """Write the table and its metadata next to the model files"""
+        table_path = os.path.join(directory, TABLE_FILENAME)
+        meta_path = os.path.join(directory, META_FILENAME)
+
+        tmp_path = table_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.table))
+        os.replace(tmp_path, table_path)
+
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'vocabulary': self.vocabulary,
+                'difficulty_classes': self.difficulty_classes,
+                'fingerprint': self.fingerprint,
+            }, f, indent=2)
+        os.replace(tmp_path, meta_path)
+
+    @classmethod
+    def load(cls, directory, vocabulary, fingerprint=None):
+        """Memory-map a saved table; return None if it is missing or stale"""
+        try:
+            with open(os.path.join(directory, META_FILENAME), 'r') as f:
+                meta = json.load(f)
+            table = np.load(os.path.join(directory, TABLE_FILENAME), mmap_mode='r')
+        except (FileNotFoundError, ValueError) as e:
+            logger.info(f"No usable prediction table in {directory}: {e}")
+            return None
+
+        expected = [[name, list(values)] for name, values in vocabulary]
+        if meta.get('vocabulary') != expected or meta.get('fingerprint') != fingerprint:
+            logger.info("Prediction table does not match the current models")
+            return None
+        if table.shape != (int(np.prod([len(v) for _, v in vocabulary])), 3):
+            logger.info(f"Prediction table has unexpected shape {table.shape}")
+            return None
+
+        return cls(vocabulary, table, meta['difficulty_classes'], fingerprint)
+
+    def index_of(self, features):
+        """Flat row index for a feature dict, or None if any value is out of vocabulary"""
+        index = 0
+        for (name, positions), size in zip(self._positions, self._shape):
+            try:
+                position = positions.get(features[name])
+            except (KeyError, TypeError):
+                return None
+            if position is None:
+                return None
+            index = index * size + position
+        return index
+
+    def lookup(self, features):
+        """Return (difficulty, sets, reps) for a feature dict, or None on a miss"""
+        index = self.index_of(features)
+        if index is None:
+            return None
+        row = self.table[index]
+        return (
+            self.difficulty_classes[row[DIFFICULTY_COLUMN]],
+            int(row[SETS_COLUMN]),
+            int(row[REPS_COLUMN]),
+        )
+
+    def lookup_many(self, features_list):
+        """Vectorized lookup. Returns (rows, hit_mask); rows are only valid where hit"""
+        indices = np.array([self.index_of(f) for f in features_list], dtype=object)
+        hits = np.array([i is not None for i in indices], dtype=bool)
+        rows = np.zeros((len(features_list), 3), dtype=np.int16)
+        if hits.any():
+            rows[hits] = self.table[indices[hits].astype(np.int64)]
+        return rows, hits
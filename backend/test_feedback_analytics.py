@@ -0,0 +1,67 @@
+# test_feedback_analytics.py - Daily rollups with malformed stored feedback
+#
+# Run from the backend directory: python -m pytest test_feedback_analytics.py
+import time
+
+from feedback_analytics import FeedbackAnalytics, session_values
+from feedback_store import FeedbackStore
+
+
+def _payload(feedback_id, pain_before):
+    return {
+        'id': feedback_id,
+        'feedback': {
+            'userId': 'user_1',
+            'exerciseId': 'ex_1',
+            'painLevelBefore': pain_before,
+            'painLevelAfter': 3,
+            'completedSets': 3, 'targetSets': 3,
+            'completedReps': 10, 'targetReps': 10,
+            'difficultyRating': 'perfect',
+        },
+        'analysis': {'effectiveness_score': 7.5},
+    }
+
+
+def test_session_values_rejects_non_numeric_pain():
+    assert session_values(_payload('a', 'high')) is None
+    assert session_values(_payload('b', '7'))[0] == 7.0
+
+
+def test_rollups_skip_non_numeric_pain(tmp_path):
+    store = FeedbackStore(str(tmp_path))
+    analytics = FeedbackAnalytics(lambda: store)
+    now_ms = int(time.time() * 1000)
+
+    # Materialize the rollups, then ingest through record() as the endpoint does
+    store.append(_payload('f0', 6), user_id='user_1', exercise_id='ex_1', timestamp=now_ms)
+    assert analytics.user_analytics('user_1')['summary']['total_sessions'] == 1
+    for i, pain_before in enumerate([6, 'high', 6, 6], start=1):
+        payload = _payload(f'f{i}', pain_before)
+        timestamp_ms = store.append(payload, user_id='user_1', exercise_id='ex_1', timestamp=now_ms + i)
+        analytics.record('user_1', payload['id'], payload, timestamp_ms)
+
+    summary = analytics.user_analytics('user_1')['summary']
+    assert summary['total_sessions'] == 4
+    assert summary['overall_adherence'] == 1.0
+    assert summary['average_pain_reduction'] == 3.0
+
+    rebuilt = analytics.rebuild_rollups('user_1')
+    assert sum(bucket.sessions for bucket in rebuilt.buckets.values()) == 4
+    assert analytics.patient_overview('user_1')['summary']['total_sessions'] == 4
+
+
+def test_record_after_the_store_was_folded_in_counts_once(tmp_path):
+    store = FeedbackStore(str(tmp_path))
+    analytics = FeedbackAnalytics(lambda: store)
+    now_ms = int(time.time() * 1000)
+
+    store.append(_payload('f0', 6), user_id='user_1', exercise_id='ex_1', timestamp=now_ms)
+    assert analytics.user_analytics('user_1')['summary']['total_sessions'] == 1
+    # The writer flushes f1 and a query folds it in before the on_stored hook runs
+    payload = _payload('f1', 6)
+    timestamp_ms = store.append(payload, user_id='user_1', exercise_id='ex_1', timestamp=now_ms + 1)
+    assert analytics.user_analytics('user_1')['summary']['total_sessions'] == 2
+    analytics.record('user_1', payload['id'], payload, timestamp_ms)
+    assert analytics.user_analytics('user_1')['summary']['total_sessions'] == 2
+    store.close()
@@ -0,0 +1,35 @@
+# test_feedback_rules.py - Batch evaluation of unusual field values
+#
+# Run from the backend directory: python -m pytest test_feedback_rules.py
+from feedback_rules import FeedbackRules
+
+
+def _feedback(**fields):
+    feedback = {
+        'painLevelBefore': 5, 'painLevelAfter': 3,
+        'completedSets': 3, 'targetSets': 3,
+        'completedReps': 10, 'targetReps': 10,
+        'difficultyRating': 'perfect',
+    }
+    feedback.update(fields)
+    return feedback
+
+
+def test_batch_leaves_unconvertible_values_to_the_scalar_path():
+    rules = FeedbackRules.load()
+    feedback_list = [
+        _feedback(),
+        _feedback(completedSets=10 ** 400),
+        _feedback(painLevelAfter=[1, 2]),
+        _feedback(painLevelAfter='high'),
+        _feedback(painLevelBefore=4),
+    ]
+    results = rules.evaluate_batch(feedback_list)
+    assert results[1] is None and results[2] is None and results[3] is None
+    assert results[0] == rules.evaluate(feedback_list[0])
+    assert results[4] == rules.evaluate(feedback_list[4])
+
+
+def test_batch_with_only_list_values():
+    rules = FeedbackRules.load()
+    assert rules.evaluate_batch([_feedback(painLevelAfter=[1, 2]), _feedback(painLevelAfter=[3, 4])]) == [None, None]
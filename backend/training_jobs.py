@@ -0,0 +1,281 @@
+# training_jobs.py - Background model retraining through a local job queue
+#
+# Training runs in a separate low-priority process so it never holds a web
+# worker. Each job is a JSON file under models/jobs/, which every web worker
+# can read, and models/jobs/ACTIVE names the job that is queued or running so
+# concurrent retrain requests from any worker join it instead of starting
+# another. Finished jobs publish through the model registry, and serving
+# processes pick the new version up on their next request.
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.path.join('models', 'jobs')
+ACTIVE_FILENAME = 'ACTIVE'
+FINISHED_STATUSES = ('succeeded', 'failed')
+# A job whose record has not been touched for this long is treated as dead
+STALE_AFTER_SECONDS = 2 * 60 * 60
+# Keep this many finished job records around
+KEEP_JOBS = 50
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class JobStore:
+    """Job records on disk, shared by every process that uses the same directory"""
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.active_path = os.path.join(jobs_dir, ACTIVE_FILENAME)
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def get(self, job_id):
+        # Job ids are generated hex strings; reject anything that could escape the directory
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        return _read_json(self._path(job_id))
+
+    def save(self, job):
+        job['updated_at'] = datetime.now().isoformat()
+        _write_json_atomic(self._path(job['job_id']), job)
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id) or {'job_id': job_id}
+        job.update(fields)
+        self.save(job)
+        return job
+
+    def claim_active(self, job_id):
+        """Mark job_id as the active job; False if another job already is"""
+        try:
+            fd = os.open(self.active_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(job_id)
+        return True
+
+    def active_job(self):
+        """The queued or running job, clearing the marker if that job is finished or dead"""
+        try:
+            with open(self.active_path, 'r') as f:
+                job_id = f.read().strip()
+        except FileNotFoundError:
+            return None
+
+        job = self.get(job_id)
+        if job is not None and job['status'] not in FINISHED_STATUSES:
+            updated = datetime.fromisoformat(job['updated_at'])
+            if (datetime.now() - updated).total_seconds() < STALE_AFTER_SECONDS:
+                return job
+            self.update(job_id, status='failed', error='Job stopped responding')
+
+        self.release_active(job_id)
+        return None
+
+    def release_active(self, job_id):
+        """Remove the active marker if it still names job_id"""
+        try:
+            with open(self.active_path, 'r') as f:
+                if f.read().strip() != job_id:
+                    return
+            os.remove(self.active_path)
+        except FileNotFoundError:
+            pass
+
+    def prune(self, keep=KEEP_JOBS):
+        records = [
+            name for name in os.listdir(self.jobs_dir)
+            if name.endswith('.json')
+        ]
+        if len(records) <= keep:
+            return
+        records.sort(key=lambda name: os.path.getmtime(os.path.join(self.jobs_dir, name)))
+        for name in records[:len(records) - keep]:
+            job = _read_json(os.path.join(self.jobs_dir, name))
+            if job is None or job.get('status') in FINISHED_STATUSES:
+                os.remove(os.path.join(self.jobs_dir, name))
+
+
+def _lower_priority():
+    """Pool initializer: keep training from competing with request handling"""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def run_training_job(job_id, jobs_dir):
+    """Entry point inside the worker process: train, publish and record the outcome"""
+    # Imported here so the web process does not pay for it when submitting
+    import contextlib
+    import io
+    import generate_plan
+
+    store = JobStore(jobs_dir)
+    stages = []
+    started = time.perf_counter()
+    stage_started = [started]
+
+    def progress(stage):
+        now = time.perf_counter()
+        if stages:
+            stages[-1]['seconds'] = round(now - stage_started[0], 3)
+        stage_started[0] = now
+        stages.append({'name': stage, 'seconds': None})
+        store.update(job_id, stage=stage, stages=stages)
+
+    store.update(job_id, status='running', started_at=datetime.now().isoformat())
+    try:
+        model = generate_plan.PlanGenerationModel()
+        # The classification reports are saved with the metrics; keep them out of the server log
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.retrain_models(progress=progress)
+        if stages:
+            stages[-1]['seconds'] = round(time.perf_counter() - stage_started[0], 3)
+        store.update(
+            job_id,
+            status='succeeded',
+            stage=None,
+            stages=stages,
+            finished_at=datetime.now().isoformat(),
+            total_seconds=round(time.perf_counter() - started, 3),
+            model_version=model.bundle.version,
+            metrics=model.metrics,
+        )
+    except Exception as e:
+        store.update(
+            job_id,
+            status='failed',
+            stages=stages,
+            finished_at=datetime.now().isoformat(),
+            total_seconds=round(time.perf_counter() - started, 3),
+            error=str(e),
+            traceback=traceback.format_exc(),
+        )
+    finally:
+        store.release_active(job_id)
+    return job_id
+
+
+class TrainingJobQueue:
+    """Submits retraining jobs to a single background worker process"""
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self._store = None
+        self._executor = None
+        # Reentrant: a done callback can run on the submitting thread
+        self._lock = threading.RLock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = JobStore(self.jobs_dir)
+        return self._store
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn rather than fork: the web process may hold threads and locks
+            self._executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_lower_priority,
+            )
+        return self._executor
+
+    def submit(self):
+        """Queue a retraining job, or join the one already queued or running.
+
+        Returns (job, created).
+        """
+        with self._lock:
+            active = self.store.active_job()
+            if active is not None:
+                return active, False
+
+            job_id = uuid.uuid4().hex
+            if not self.store.claim_active(job_id):
+                # Another worker claimed it between the check and the claim
+                active = self.store.active_job()
+                if active is not None:
+                    return active, False
+                if not self.store.claim_active(job_id):
+                    raise RuntimeError("Could not queue a retraining job")
+
+            job = {
+                'job_id': job_id,
+                'status': 'queued',
+                'created_at': datetime.now().isoformat(),
+                'stage': None,
+                'stages': [],
+            }
+            self.store.save(job)
+            self.store.prune()
+
+            try:
+                future = self._get_executor().submit(run_training_job, job_id, self.jobs_dir)
+            except Exception as e:
+                self._fail(job_id, e)
+                raise
+            future.add_done_callback(lambda f: self._on_done(job_id, f))
+            return job, True
+
+    def _on_done(self, job_id, future):
+        # run_training_job records its own outcome; this only catches a dead worker process
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Training job {job_id} crashed: {error}")
+            self._fail(job_id, error)
+            with self._lock:
+                self._executor = None
+
+    def _fail(self, job_id, error):
+        self.store.update(
+            job_id,
+            status='failed',
+            finished_at=datetime.now().isoformat(),
+            error=str(error),
+        )
+        self.store.release_active(job_id)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+
+training_queue = TrainingJobQueue()
+
+
+def submit_retrain_job():
+    """Public interface to start (or join) a background retraining job"""
+    return training_queue.submit()
+
+
+def get_retrain_job(job_id):
+    """Public interface to read a retraining job's status, or None if unknown"""
+    return training_queue.get(job_id)
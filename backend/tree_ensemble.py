@@ -0,0 +1,135 @@
+# tree_ensemble.py - Flattened array representation of fitted tree classifiers
+import numpy as np
+
+ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes')
+
+
+class FlatTreeEnsemble:
+    """Every node of every tree in a classifier, packed into contiguous arrays.
+
+    Node i of the ensemble tests `X[:, feature[i]] <= threshold[i]` and moves to
+    `left[i]` or `right[i]`. Leaves point to themselves, so a batch can be walked
+    a fixed number of steps with no per-sample branching. `value[i]` holds the
+    class probabilities of node i, normalized exactly as
+    DecisionTreeClassifier.predict_proba does, and `roots` holds the first node
+    of each tree.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def leaf_class(self):
+        """Majority class index of each node (meaningful at the leaves)"""
+        return np.argmax(self.value, axis=1)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Export a fitted DecisionTreeClassifier or RandomForestClassifier"""
+        estimators = getattr(model, 'estimators_', None) or [model]
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+
+            left = np.where(is_leaf, node_ids, tree.children_left + offset)
+            right = np.where(is_leaf, node_ids, tree.children_right + offset)
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Single-output classifier: value is (n_nodes, 1, n_classes)
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+            features.append(feature.astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left.astype(np.intp))
+            rights.append(right.astype(np.intp))
+            values.append(value)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            np.ascontiguousarray(np.concatenate(features)),
+            np.ascontiguousarray(np.concatenate(thresholds)),
+            np.ascontiguousarray(np.concatenate(lefts)),
+            np.ascontiguousarray(np.concatenate(rights)),
+            np.ascontiguousarray(np.concatenate(values)),
+            np.asarray(roots, dtype=np.intp),
+            # Object arrays cannot be saved without pickle, and labels here are strings or ints
+            np.asarray(model.classes_.tolist()),
+            max_depth,
+        )
+
+    def apply(self, X):
+        """Walk all trees for the whole batch; returns leaf ids of shape (n_samples, n_trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        # children[2 * node + went_left] is the next node
+        children = np.stack([self.right, self.left], axis=1).ravel()
+
+        # One lane per (sample, tree) pair, sample-major
+        leaves = np.empty(n_samples * self.n_trees, dtype=np.intp)
+        lanes = np.arange(leaves.size)
+        row_offsets = np.repeat(np.arange(n_samples) * n_features, self.n_trees)
+        current = np.tile(self.roots, n_samples)
+
+        for step in range(self.max_depth):
+            went_left = X_flat.take(row_offsets + self.feature.take(current)) <= self.threshold.take(current)
+            following = children.take(2 * current + went_left)
+
+            # Leaves point to themselves. Every few steps, retire the lanes that
+            # have reached one so the remaining steps only touch live lanes.
+            if step % 4 == 3:
+                moving = following != current
+                if not moving.all():
+                    finished = ~moving
+                    leaves[lanes[finished]] = following[finished]
+                    lanes = lanes[moving]
+                    row_offsets = row_offsets[moving]
+                    following = following[moving]
+            current = following
+
+        leaves[lanes] = current
+        return leaves.reshape(n_samples, self.n_trees)
+
+    def predict_proba(self, X):
+        """Mean class probabilities over the trees, summed in sklearn's order"""
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for t in range(self.n_trees):
+            proba += self.value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, path):
+        """Store the arrays in a single .npz file"""
+        np.savez(path, max_depth=self.max_depth, **{name: getattr(self, name) for name in ARRAY_FIELDS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in ARRAY_FIELDS}
+            return cls(max_depth=int(data['max_depth']), **arrays)
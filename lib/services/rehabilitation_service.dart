@@ -103,6 +103,10 @@ class RehabilitationService {
     }
   }
 
+  // Sessions the server holds per user/exercise, from the last optimize_plan
+  // response. Only feedback after that point is uploaded.
+  static final Map<String, int> _optimizeSequences = {};
+
   // NEW: Optimize exercise plan based on feedback history
   Future<Map<String, dynamic>> optimizePlan({
     required String userId,
@@ -112,25 +116,25 @@ class RehabilitationService {
     try {
       log("🔧 Optimizing plan for user: $userId, exercise: $exerciseId");
 
-      final response = await http
-          .post(
-            Uri.parse('$baseUrl/optimize_plan'),
-            headers: {
-              'Content-Type': 'application/json',
-              'Accept': 'application/json',
-            },
-            body: jsonEncode({
-              'userId': userId,
-              'exerciseId': exerciseId,
-              'feedbackHistory': feedbackHistory,
-            }),
-          )
-          .timeout(const Duration(seconds: 15));
+      final sequenceKey = '$userId/$exerciseId';
+      var response = await _postOptimizePlan(userId, exerciseId,
+          feedbackHistory, _optimizeSequences[sequenceKey] ?? 0);
+      if (response.statusCode == 200) {
+        final resync = jsonDecode(response.body);
+        if (resync['status'] == 'resync') {
+          // The server holds less than we assumed; resend from its count
+          response = await _postOptimizePlan(
+              userId, exerciseId, feedbackHistory, resync['sequence'] ?? 0);
+        }
+      }
 
       log("📈 Plan optimization response status: ${response.statusCode}");
 
       if (response.statusCode == 200) {
         final responseData = jsonDecode(response.body);
+        if (responseData['sequence'] != null) {
+          _optimizeSequences[sequenceKey] = responseData['sequence'];
+        }
 
         // Log optimization results
         if (responseData['optimized_parameters'] != null) {
@@ -149,6 +153,31 @@ class RehabilitationService {
     }
   }
 
+  Future<http.Response> _postOptimizePlan(
+    String userId,
+    String exerciseId,
+    List<Map<String, dynamic>> feedbackHistory,
+    int sequence,
+  ) {
+    final start =
+        sequence < feedbackHistory.length ? sequence : feedbackHistory.length;
+    return http
+        .post(
+          Uri.parse('$baseUrl/optimize_plan'),
+          headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+          },
+          body: jsonEncode({
+            'userId': userId,
+            'exerciseId': exerciseId,
+            'newFeedback': feedbackHistory.sublist(start),
+            'sequence': start,
+          }),
+        )
+        .timeout(const Duration(seconds: 15));
+  }
+
   // NEW: Get AI-powered user analytics
   Future<Map<String, dynamic>> getUserAnalytics({
     required String userId,
@@ -186,6 +215,92 @@ class RehabilitationService {
     }
   }
 
+  // One page of stored feedback, newest first. Pass the returned
+  // 'next_cursor' as cursor to load the next page; it is null on the last one.
+  Future<Map<String, dynamic>> getFeedbackHistory({
+    required String userId,
+    String? exerciseId,
+    String? cursor,
+    int limit = 50,
+    DateTime? start,
+    DateTime? end,
+    List<String>? fields,
+  }) async {
+    try {
+      log("📜 Getting feedback history for user: $userId");
+
+      final response = await http
+          .post(
+            Uri.parse('$baseUrl/feedback_history'),
+            headers: {
+              'Content-Type': 'application/json',
+              'Accept': 'application/json',
+            },
+            body: jsonEncode({
+              'userId': userId,
+              if (exerciseId != null) 'exerciseId': exerciseId,
+              if (cursor != null) 'cursor': cursor,
+              'limit': limit,
+              if (start != null) 'start': start.toIso8601String(),
+              if (end != null) 'end': end.toIso8601String(),
+              if (fields != null) 'fields': fields,
+            }),
+          )
+          .timeout(const Duration(seconds: 15));
+
+      if (response.statusCode == 200) {
+        final responseData = jsonDecode(response.body);
+        return {
+          'items': responseData['items'] ?? [],
+          'next_cursor': responseData['next_cursor'],
+        };
+      } else {
+        log("⚠️ Feedback history request failed: ${response.statusCode}");
+        return {'items': [], 'next_cursor': null};
+      }
+    } catch (e) {
+      log("❌ Error in getFeedbackHistory: $e");
+      return {'items': [], 'next_cursor': null};
+    }
+  }
+
+  // Summary metrics for all of a therapist's patients in one request
+  Future<List<Map<String, dynamic>>> getTherapistOverview({
+    required List<String> patientIds,
+    int timePeriod = 30,
+  }) async {
+    try {
+      log("📊 Getting therapist overview for ${patientIds.length} patients");
+
+      final response = await http
+          .post(
+            Uri.parse('$baseUrl/therapist_overview'),
+            headers: {
+              'Content-Type': 'application/json',
+              'Accept': 'application/json',
+            },
+            body: jsonEncode({
+              'patientIds': patientIds,
+              'timePeriod': timePeriod,
+            }),
+          )
+          .timeout(const Duration(seconds: 15));
+
+      log("📈 Therapist overview response status: ${response.statusCode}");
+
+      if (response.statusCode == 200) {
+        final responseData = jsonDecode(response.body);
+        return List<Map<String, dynamic>>.from(responseData['patients'] ?? []);
+      } else {
+        log("⚠️ Therapist overview request failed: ${response.statusCode}");
+        return [];
+      }
+    } catch (e) {
+      log("❌ Error in getTherapistOverview: $e");
+      return [];
+    }
+  }
+
   // NEW: Get feedback trends
   Future<Map<String, dynamic>> getFeedbackTrends({
     required String userId,
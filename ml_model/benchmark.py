@@ -0,0 +1,222 @@
+# benchmark.py - Micro-benchmarks for the training data pipeline
+#
+# Usage (from the ml_model directory):
+#   python benchmark.py                 # run every benchmark
+#   python benchmark.py load_data       # run a single benchmark
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Records (patients + plans + progress logs) per generated patient, on average
+RECORDS_PER_PATIENT = 13
+
+
+def _timeit(fn, repeat=3):
+    """Return the best wall-clock time of fn() over `repeat` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _generate(directory, n_records, seed=0):
+    """JSONL simulated data with about n_records patients, plans and progress logs"""
+    from data_generator import generate_all_data
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_all_data(max(1, n_records // RECORDS_PER_PATIENT), output_dir=directory, seed=seed,
+                          reference_date='2025-01-01')
+
+
+def _write_per_file(source, directory):
+    """Rewrite JSONL data in the one-indented-file-per-record layout of the old generator"""
+    for jsonl_name, subdirectory in (('patients.jsonl', 'users'), ('plans.jsonl', 'plans'),
+                                     ('progress.jsonl', 'progress')):
+        os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+        with open(os.path.join(source, jsonl_name)) as f:
+            for line in f:
+                record = json.loads(line)
+                with open(os.path.join(directory, subdirectory, f"{record['id']}.json"), 'w') as out:
+                    json.dump(record, out, indent=2)
+
+
+def _legacy_load_data(data_dir):
+    """The previous model_training.load_data: listdir, then open and json.load every file"""
+    loaded = []
+    for subdirectory, prefix in (('users', 'patient_'), ('plans', ''), ('progress', '')):
+        records = []
+        directory = os.path.join(data_dir, subdirectory)
+        for filename in os.listdir(directory):
+            if filename.startswith(prefix):
+                with open(os.path.join(directory, filename), 'r') as f:
+                    records.append(json.load(f))
+        loaded.append(records)
+    return loaded
+
+
+def benchmark_load_data(sizes=(10000, 100000, 1000000), per_file_limit=100000):
+    """Loading n records: per-record JSON files vs JSONL, as lists of dicts and as DataFrames"""
+    from data_loader import load_records, load_tables
+
+    print(f"\n=== Training data loading ({os.cpu_count()} cores) ===")
+    root = tempfile.mkdtemp()
+    try:
+        for n in sizes:
+            jsonl_dir = os.path.join(root, f'jsonl-{n}')
+            _generate(jsonl_dir, n)
+            tables = load_tables(jsonl_dir, verbose=False)
+            records = len(tables['patients']) + len(tables['plans']) + len(tables['progress'])
+            timings = []
+            if n <= per_file_limit:
+                files_dir = os.path.join(root, f'files-{n}')
+                _write_per_file(jsonl_dir, files_dir)
+                timings.append(('files, old load_data', _timeit(lambda: _legacy_load_data(files_dir), repeat=1)))
+                timings.append(('files, load_tables', _timeit(lambda: load_tables(files_dir, verbose=False), repeat=1)))
+                shutil.rmtree(files_dir)
+            timings.append(('jsonl, load_records', _timeit(lambda: load_records(jsonl_dir), repeat=1)))
+            timings.append(('jsonl, load_tables', _timeit(lambda: load_tables(jsonl_dir, verbose=False), repeat=1)))
+            shutil.rmtree(jsonl_dir)
+            for name, seconds in timings:
+                print(f"{records:>8} records | {name:>20}: {seconds:7.2f} s {records / seconds:>10,.0f} records/s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _synthetic_tables(n_plans, seed=0):
+    """load_tables-shaped DataFrames for n_plans plans, built directly with NumPy"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    n_patients = max(1, n_plans // 2)
+    patient_ids = np.array([f'patient_{i}' for i in range(n_patients)], dtype=object)
+    plan_ids = np.array([f'plan_{i}' for i in range(n_plans)], dtype=object)
+    dates = np.array([f'2025-{m:02d}-{d:02d}T00:00:00' for m in range(1, 13) for d in range(1, 29)], dtype=object)
+
+    def categorical(values, n):
+        return pd.Categorical.from_codes(rng.integers(len(values), size=n), values)
+
+    patients = pd.DataFrame({
+        'id': patient_ids,
+        'body_part': categorical(['Knee', 'Shoulder', 'Ankle', 'Hip'], n_patients),
+        'pain_level': rng.integers(1, 11, size=n_patients),
+        'pain_location': categorical(['Joint', 'Muscle', 'Tendon', 'Ligament'], n_patients),
+        'previous_injuries': categorical(['ACL tear', 'Fracture', 'None'], n_patients),
+        'surgical_history': categorical(['Arthroscopy', 'None'], n_patients),
+        'primary_goal': categorical(['Pain reduction', 'Increase strength'], n_patients),
+    })
+    plans = pd.DataFrame({'id': plan_ids, 'user_id': patient_ids[rng.integers(n_patients, size=n_plans)]})
+    exercise_plan = np.repeat(np.arange(n_plans), rng.integers(3, 7, size=n_plans))
+    plan_exercises = pd.DataFrame({
+        'plan': exercise_plan,
+        'name': categorical(['Wall Squats', 'Step-Ups', 'Heel Raises'], len(exercise_plan)),
+        'difficulty': categorical(['beginner', 'intermediate', 'advanced'], len(exercise_plan)),
+        'sets': rng.integers(2, 5, size=len(exercise_plan)),
+        'reps': rng.integers(8, 16, size=len(exercise_plan)),
+    })
+    log_plan = rng.permutation(np.repeat(np.arange(n_plans), rng.integers(0, 11, size=n_plans)))
+    progress = pd.DataFrame({
+        'plan_id': plan_ids[log_plan],
+        'date': dates[rng.integers(len(dates), size=len(log_plan))],
+        'adherence': rng.integers(0, 101, size=len(log_plan)),
+        'rating': rng.integers(1, 6, size=len(log_plan)),
+    })
+    exercise_progress = np.repeat(np.arange(len(log_plan)), rng.integers(0, 7, size=len(log_plan)))
+    exercise_logs = pd.DataFrame({
+        'progress': exercise_progress,
+        'pain_level': rng.integers(1, 11, size=len(exercise_progress)),
+    })
+    return patients, plans, plan_exercises, progress, exercise_logs
+
+
+def benchmark_prepare_data(sizes=(1000, 10000, 100000, 1000000)):
+    """Joining plans to patients and progress logs to plans, from 1k to 1M plans"""
+    from model_training import prepare_data_for_exercise_recommendation, prepare_data_for_plan_adjustment
+
+    print("\n=== Training data preparation ===")
+    for n in sizes:
+        patients, plans, plan_exercises, progress, exercise_logs = _synthetic_tables(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            exercise = _timeit(lambda: prepare_data_for_exercise_recommendation(patients, plans, plan_exercises), repeat=1)
+            adjustment = _timeit(lambda: prepare_data_for_plan_adjustment(plans, progress, exercise_logs), repeat=1)
+        print(f"{n:>8} plans | exercise recommendation {exercise:7.2f} s ({exercise / n * 1e6:5.2f} us/plan) | "
+              f"plan adjustment {adjustment:7.2f} s ({adjustment / n * 1e6:6.2f} us/plan)")
+
+
+def _materialize(outputs):
+    """Read every array of (possibly nested) stage outputs, as fitting would"""
+    from collections.abc import Mapping
+
+    for value in outputs.values():
+        if isinstance(value, Mapping):
+            _materialize(value)
+        elif hasattr(value, 'shape'):
+            array = value.to_numpy() if hasattr(value, 'to_numpy') else value
+            if array.dtype.kind in 'biuf':
+                array.sum()
+
+
+def benchmark_feature_cache(sizes=(100000, 1000000)):
+    """Training pipeline up to the split: empty cache, full cache, changed parameters and changed data"""
+    import model_training
+    from feature_cache import FeatureCache
+
+    print("\n=== Training pipeline feature cache ===")
+    root = tempfile.mkdtemp()
+    try:
+        for n in sizes:
+            data_dir = os.path.join(root, f'data-{n}')
+            cache_dir = os.path.join(root, f'cache-{n}')
+            _generate(data_dir, n)
+            runs = [
+                ('cold', model_training.ADJUSTMENT_WINDOW, None),
+                ('warm', model_training.ADJUSTMENT_WINDOW, None),
+                ('window', model_training.ADJUSTMENT_WINDOW + 1, None),
+                ('new data', model_training.ADJUSTMENT_WINDOW, lambda: _generate(data_dir, n, seed=1)),
+            ]
+            for name, window, before in runs:
+                if before is not None:
+                    before()
+                cache = FeatureCache(cache_dir, code_paths=[model_training.__file__])
+
+                def run():
+                    split, _, _ = model_training.run_pipeline(cache, data_dir, window)
+                    _materialize(split)
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds = _timeit(run, repeat=1)
+                stages = ', '.join(f"{stage} {'hit' if totals['hits'] else 'miss'} {totals['seconds']:.2f}s"
+                                   for stage, totals in cache.summary().items())
+                print(f"{n:>8} records | {name:>8}: {seconds:7.2f} s ({stages})")
+            shutil.rmtree(data_dir)
+            shutil.rmtree(cache_dir)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+BENCHMARKS = {
+    'load_data': benchmark_load_data,
+    'prepare_data': benchmark_prepare_data,
+    'feature_cache': benchmark_feature_cache,
+}
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,370 +1,437 @@
-import pandas as pd
-import numpy as np
+import argparse
 import json
 import os
-import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
-# Set random seed for reproducibility
-np.random.seed(42)
+import numpy as np
+
+# Generates simulated patients, therapists, plans and progress logs as one
+# JSON Lines file per entity type (patients.jsonl, therapists.jsonl,
+# plans.jsonl, progress.jsonl). Patients are split into fixed-size shards,
+# each with its own seed, and the shards run in a process pool, so the output
+# only depends on --seed, --shard-size and --reference-date, never on --workers.
+#
+# Usage (from the ml_model directory):
+#   python data_generator.py                       # 100 patients
+#   python data_generator.py --patients 1000000    # all cores
 
-# Define the number of samples to generate
+# Default number of samples to generate
 NUM_PATIENTS = 100
-NUM_THERAPISTS = 10
+PATIENTS_PER_THERAPIST = 10
 PLANS_PER_PATIENT = 3
 PROGRESS_LOGS_PER_PLAN = 10
 
-# Create directory for the simulated data
-os.makedirs('simulated_data', exist_ok=True)
-
-# Helper functions for generating random data
-def generate_patient_id():
-    return f"patient_{random.randint(1000, 9999)}"
-
-def generate_therapist_id():
-    return f"therapist_{random.randint(1000, 9999)}"
-
-def generate_plan_id():
-    return f"plan_{random.randint(10000, 99999)}"
-
-def generate_progress_id():
-    return f"progress_{random.randint(10000, 99999)}"
-
-def generate_email(user_type, user_id):
-    domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'example.com']
-    return f"{user_type}_{user_id}@{random.choice(domains)}"
+# Patients per shard; changing it changes the generated data
+SHARD_SIZE = 10000
+# Patients generated at once within a shard
+BLOCK_SIZE = 2000
+# Generated dates fall between DAYS_BACK days before and MAX_DAYS_AFTER days after the reference date
+DAYS_BACK = 365
+MAX_DAYS_AFTER = 30 + 60
+SEED = 42
+OUTPUT_DIR = 'simulated_data'
+ENTITIES = ('patients', 'therapists', 'plans', 'progress')
 
-def generate_name():
-    first_names = ['James', 'Robert', 'John', 'Michael', 'David', 'William', 'Richard', 'Joseph', 'Thomas', 'Charles',
-                  'Mary', 'Patricia', 'Jennifer', 'Linda', 'Elizabeth', 'Barbara', 'Susan', 'Jessica', 'Sarah', 'Karen']
-    last_names = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
-                 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
-    return f"{random.choice(first_names)} {random.choice(last_names)}"
+FIRST_NAMES = ['James', 'Robert', 'John', 'Michael', 'David', 'William', 'Richard', 'Joseph', 'Thomas', 'Charles',
+               'Mary', 'Patricia', 'Jennifer', 'Linda', 'Elizabeth', 'Barbara', 'Susan', 'Jessica', 'Sarah', 'Karen']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'example.com']
+BODY_PARTS = ['Knee', 'Shoulder', 'Ankle', 'Wrist', 'Elbow', 'Hip', 'Back', 'Neck']
+PAIN_LOCATIONS = ['Joint', 'Muscle', 'Tendon', 'Ligament']
+PREVIOUS_INJURIES = ['ACL tear', 'Meniscus tear', 'Rotator cuff injury', 'Ankle sprain', 'Tendonitis',
+                     'Fracture', 'Dislocation', 'Muscle strain', 'Ligament sprain', 'None']
+SURGICAL_HISTORY = ['ACL reconstruction', 'Meniscus repair', 'Rotator cuff repair', 'Ankle ligament reconstruction',
+                    'Joint replacement', 'Fracture fixation', 'Arthroscopy', 'None']
+MEDICATIONS = ['NSAIDs', 'Pain relievers', 'Muscle relaxants', 'Anti-inflammatory medication', 'None']
+ALLERGIES = ['Penicillin', 'Aspirin', 'NSAIDs', 'Latex', 'None']
+REHAB_GOALS = ['Pain reduction', 'Improve range of motion', 'Increase strength', 'Return to sports',
+               'Improve daily function', 'Prevent re-injury', 'Post-surgery recovery']
+PLAN_STATUSES = ['active', 'completed', 'paused']
+EXERCISE_NOTES = [None, 'Felt good', 'Too challenging', 'Getting easier', 'Need to modify']
+PROGRESS_FEEDBACK = [
+    None,
+    'Feeling improvement in range of motion',
+    'Still experiencing pain during certain movements',
+    'Exercises are getting easier to perform',
+    'Need modifications for some exercises'
+]
 
-def generate_body_part():
-    return random.choice(['Knee', 'Shoulder', 'Ankle', 'Wrist', 'Elbow', 'Hip', 'Back', 'Neck'])
-
-def generate_pain_level():
-    return random.randint(1, 10)
-
-def generate_previous_injuries():
-    injuries = ['ACL tear', 'Meniscus tear', 'Rotator cuff injury', 'Ankle sprain', 'Tendonitis',
-                'Fracture', 'Dislocation', 'Muscle strain', 'Ligament sprain', 'None']
-    return random.choice(injuries)
-
-def generate_surgical_history():
-    surgeries = ['ACL reconstruction', 'Meniscus repair', 'Rotator cuff repair', 'Ankle ligament reconstruction',
-                'Joint replacement', 'Fracture fixation', 'Arthroscopy', 'None']
-    return random.choice(surgeries)
-
-def generate_medications():
-    medications = ['NSAIDs', 'Pain relievers', 'Muscle relaxants', 'Anti-inflammatory medication', 'None']
-    return random.choice(medications)
-
-def generate_allergies():
-    allergies = ['Penicillin', 'Aspirin', 'NSAIDs', 'Latex', 'None']
-    return random.choice(allergies)
-
-def generate_rehab_goal():
-    goals = ['Pain reduction', 'Improve range of motion', 'Increase strength', 'Return to sports',
-            'Improve daily function', 'Prevent re-injury', 'Post-surgery recovery']
-    return random.choice(goals)
-
-def generate_exercises(body_part, goal, pain_level):
-    """
-    Generate a list of exercises based on body part, goal, and pain level
-    """
-    exercises = []
-    exercise_count = random.randint(3, 6)
-    
-    knee_exercises = [
+EXERCISE_POOLS = {
+    'Knee': [
         {'name': 'Straight Leg Raises', 'description': 'Lie flat on your back and lift your leg straight up', 'bodyPart': 'Knee'},
         {'name': 'Hamstring Curls', 'description': 'Lie face down and bend your knee, bringing your heel toward your buttock', 'bodyPart': 'Knee'},
         {'name': 'Wall Squats', 'description': 'Stand with your back against a wall and bend your knees', 'bodyPart': 'Knee'},
         {'name': 'Step-Ups', 'description': 'Step up onto a platform with one leg, then the other', 'bodyPart': 'Knee'},
         {'name': 'Knee Extensions', 'description': 'Sit in a chair and straighten your knee', 'bodyPart': 'Knee'},
         {'name': 'Terminal Knee Extensions', 'description': 'Extend your knee against resistance', 'bodyPart': 'Knee'}
-    ]
-    
-    shoulder_exercises = [
+    ],
+    'Shoulder': [
         {'name': 'Pendulum Exercise', 'description': 'Lean forward and let your arm hang, make small circles', 'bodyPart': 'Shoulder'},
         {'name': 'Wall Crawl', 'description': 'Face a wall and walk your fingers up the wall', 'bodyPart': 'Shoulder'},
         {'name': 'External Rotation', 'description': 'With elbow at side, rotate arm outward', 'bodyPart': 'Shoulder'},
         {'name': 'Internal Rotation', 'description': 'With elbow at side, rotate arm inward', 'bodyPart': 'Shoulder'},
         {'name': 'Shoulder Flexion', 'description': 'Raise your arm forward and upward', 'bodyPart': 'Shoulder'},
         {'name': 'Shoulder Abduction', 'description': 'Raise your arm out to the side', 'bodyPart': 'Shoulder'}
-    ]
-    
-    ankle_exercises = [
+    ],
+    'Ankle': [
         {'name': 'Ankle Pumps', 'description': 'Move your foot up and down', 'bodyPart': 'Ankle'},
         {'name': 'Ankle Circles', 'description': 'Rotate your ankle in circles', 'bodyPart': 'Ankle'},
         {'name': 'Heel Raises', 'description': 'Stand and rise up on your toes', 'bodyPart': 'Ankle'},
         {'name': 'Toe Raises', 'description': 'Stand and lift your toes off the ground', 'bodyPart': 'Ankle'},
         {'name': 'Resistance Band Eversion', 'description': 'Turn foot outward against resistance', 'bodyPart': 'Ankle'},
         {'name': 'Resistance Band Inversion', 'description': 'Turn foot inward against resistance', 'bodyPart': 'Ankle'}
+    ],
+}
+for _body_part in ('Wrist', 'Elbow', 'Hip', 'Back', 'Neck'):
+    EXERCISE_POOLS[_body_part] = [
+        {'name': f'{_body_part} Exercise {i}', 'description': f'Description for {_body_part.lower()} exercise {i}', 'bodyPart': _body_part}
+        for i in range(1, 7)
+    ]
+
+POOL_SIZE = 6
+assert all(len(pool) == POOL_SIZE for pool in EXERCISE_POOLS.values())
+
+# One reusable compact encoder; json.dumps with separators= builds a new one per call.
+# Generated rows never contain cycles, so skip the circular reference check.
+_encode = json.JSONEncoder(separators=(',', ':'), check_circular=False).encode
+
+
+# Each generate_* function draws every random column of a shard with one NumPy
+# call and then assembles the rows, instead of drawing values one at a time.
+def date_table(reference):
+    """ISO dates indexed by day offset + DAYS_BACK, for offsets from DAYS_BACK before to MAX_DAYS_AFTER after reference"""
+    reference = datetime.fromisoformat(reference)
+    return [(reference + timedelta(days=day)).isoformat() for day in range(-DAYS_BACK, MAX_DAYS_AFTER + 1)]
+
+def generate_therapists(rng, num_therapists, dates):
+    """Generate random therapist profiles"""
+    first = rng.integers(len(FIRST_NAMES), size=num_therapists).tolist()
+    last = rng.integers(len(LAST_NAMES), size=num_therapists).tolist()
+    domain = rng.integers(len(EMAIL_DOMAINS), size=num_therapists).tolist()
+    created = (DAYS_BACK - rng.integers(0, DAYS_BACK + 1, size=num_therapists)).tolist()
+    return [
+        {
+            'id': f"therapist_{number}",
+            'name': f"{FIRST_NAMES[first[number]]} {LAST_NAMES[last[number]]}",
+            'email': f"therapist_{number}@{EMAIL_DOMAINS[domain[number]]}",
+            'role': 'therapist',
+            'profileImageUrl': None,
+            'createdAt': dates[created[number]]
+        }
+        for number in range(num_therapists)
     ]
-    
-    # Exercise pools for other body parts
-    exercise_pools = {
-        'Knee': knee_exercises,
-        'Shoulder': shoulder_exercises,
-        'Ankle': ankle_exercises,
-        'Wrist': [{'name': f'Wrist Exercise {i}', 'description': f'Description for wrist exercise {i}', 'bodyPart': 'Wrist'} for i in range(1, 7)],
-        'Elbow': [{'name': f'Elbow Exercise {i}', 'description': f'Description for elbow exercise {i}', 'bodyPart': 'Elbow'} for i in range(1, 7)],
-        'Hip': [{'name': f'Hip Exercise {i}', 'description': f'Description for hip exercise {i}', 'bodyPart': 'Hip'} for i in range(1, 7)],
-        'Back': [{'name': f'Back Exercise {i}', 'description': f'Description for back exercise {i}', 'bodyPart': 'Back'} for i in range(1, 7)],
-        'Neck': [{'name': f'Neck Exercise {i}', 'description': f'Description for neck exercise {i}', 'bodyPart': 'Neck'} for i in range(1, 7)]
+
+def generate_patients(rng, first_patient, num_patients, dates):
+    """Generate random patient profiles; returns the rows and the columns plans depend on"""
+    n = num_patients
+    columns = {
+        'body_part': rng.integers(len(BODY_PARTS), size=n),
+        'pain_level': rng.integers(1, 11, size=n),
+        # Day index into the date table
+        'created': DAYS_BACK - rng.integers(0, DAYS_BACK + 1, size=n),
     }
-    
+    body_part = columns['body_part'].tolist()
+    pain_level = columns['pain_level'].tolist()
+    created = columns['created'].tolist()
+    injuries, surgeries, medications, allergies, locations, first, last, domain = (
+        rng.integers(size, size=n).tolist() for size in (
+            len(PREVIOUS_INJURIES), len(SURGICAL_HISTORY), len(MEDICATIONS), len(ALLERGIES),
+            len(PAIN_LOCATIONS), len(FIRST_NAMES), len(LAST_NAMES), len(EMAIL_DOMAINS)
+        )
+    )
+    goal_counts = rng.integers(1, 4, size=n).tolist()
+    goals = rng.integers(len(REHAB_GOALS), size=(n, 3)).tolist()
+
+    rows = []
+    for i in range(n):
+        number = first_patient + i
+        rows.append({
+            'id': f"patient_{number}",
+            'name': f"{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i]]}",
+            'email': f"patient_{number}@{EMAIL_DOMAINS[domain[i]]}",
+            'role': 'patient',
+            'profileImageUrl': None,
+            'medicalHistory': {
+                'previousInjuries': PREVIOUS_INJURIES[injuries[i]],
+                'surgicalHistory': SURGICAL_HISTORY[surgeries[i]],
+                'medications': MEDICATIONS[medications[i]],
+                'allergies': ALLERGIES[allergies[i]]
+            },
+            'physicalCondition': {
+                'bodyPart': BODY_PARTS[body_part[i]],
+                'painLevel': pain_level[i],
+                'mobilityLimitations': 'Limited range of motion and strength',
+                'painLocation': PAIN_LOCATIONS[locations[i]]
+            },
+            'rehabilitationGoals': [REHAB_GOALS[goal] for goal in goals[i][:goal_counts[i]]],
+            'createdAt': dates[created[i]]
+        })
+    return rows, columns
+
+def _difficulty(pain_level):
     # Select appropriate difficulty level based on pain
     if pain_level > 7:
-        difficulty = 'beginner'
-    elif pain_level > 4:
-        difficulty = 'intermediate'
-    else:
-        difficulty = 'advanced'
-    
-    # Select exercises from the appropriate pool
-    pool = exercise_pools.get(body_part, exercise_pools['Knee'])  # Default to knee if body part not found
-    selected_exercises = random.sample(pool, min(exercise_count, len(pool)))
-    
-    for i, ex in enumerate(selected_exercises):
-        exercise_id = f"ex_{body_part.lower()}_{i+1}_{random.randint(1000, 9999)}"
-        exercise = {
-            'id': exercise_id,
-            'name': ex['name'],
-            'description': ex['description'],
-            'bodyPart': ex['bodyPart'],
-            'sets': random.randint(2, 4),
-            'reps': random.randint(8, 15),
-            'durationSeconds': random.randint(30, 90),
-            'difficultyLevel': difficulty
-        }
-        exercises.append(exercise)
-    
-    return exercises
-
-def generate_date_in_past(days_back=365):
-    """Generate a random date within the last year"""
-    days_ago = random.randint(0, days_back)
-    return (datetime.now() - timedelta(days=days_ago)).isoformat()
-
-def generate_random_patient():
-    """Generate a random patient profile"""
-    patient_id = generate_patient_id()
-    body_part = generate_body_part()
-    medical_history = {
-        'previousInjuries': generate_previous_injuries(),
-        'surgicalHistory': generate_surgical_history(),
-        'medications': generate_medications(),
-        'allergies': generate_allergies()
-    }
-    
-    physical_condition = {
-        'bodyPart': body_part,
-        'painLevel': generate_pain_level(),
-        'mobilityLimitations': 'Limited range of motion and strength',
-        'painLocation': random.choice(['Joint', 'Muscle', 'Tendon', 'Ligament'])
-    }
-    
-    rehab_goals = [generate_rehab_goal() for _ in range(random.randint(1, 3))]
-    
-    patient = {
-        'id': patient_id,
-        'name': generate_name(),
-        'email': generate_email('patient', patient_id.split('_')[1]),
-        'role': 'patient',
-        'profileImageUrl': None,
-        'medicalHistory': medical_history,
-        'physicalCondition': physical_condition,
-        'rehabilitationGoals': rehab_goals,
-        'createdAt': generate_date_in_past()
-    }
-    
-    return patient, patient_id
-
-def generate_random_therapist():
-    """Generate a random therapist profile"""
-    therapist_id = generate_therapist_id()
-    
-    therapist = {
-        'id': therapist_id,
-        'name': generate_name(),
-        'email': generate_email('therapist', therapist_id.split('_')[1]),
-        'role': 'therapist',
-        'profileImageUrl': None,
-        'createdAt': generate_date_in_past()
-    }
-    
-    return therapist, therapist_id
-
-def generate_rehabilitation_plan(patient_id, therapist_id=None):
-    """Generate a random rehabilitation plan"""
-    plan_id = generate_plan_id()
-    
-    # Fetch patient data to use consistent body part and goals
-    with open(f'simulated_data/users/{patient_id}.json', 'r') as f:
-        patient = json.load(f)
-    
-    body_part = patient['physicalCondition']['bodyPart']
-    pain_level = patient['physicalCondition']['painLevel']
-    
-    goals = {}
-    if patient['rehabilitationGoals']:
-        goals['primary'] = patient['rehabilitationGoals'][0]
-        goals['bodyPart'] = body_part
-        if pain_level > 7:
-            goals['painReduction'] = 'high'
-        elif pain_level > 4:
-            goals['painReduction'] = 'medium'
-        else:
-            goals['painReduction'] = 'low'
-    
-    # Generate exercises
-    exercises = generate_exercises(body_part, goals.get('primary', 'Pain reduction'), pain_level)
-    
-    # Generate random dates
-    start_date = datetime.fromisoformat(patient['createdAt'].replace('Z', ''))
-    start_date = start_date + timedelta(days=random.randint(1, 30))
-    
-    plan = {
-        'id': plan_id,
-        'userId': patient_id,
-        'therapistId': therapist_id,
-        'title': f"{body_part} Rehabilitation Plan",
-        'description': f"Personalized rehabilitation plan for {body_part} recovery",
-        'exercises': exercises,
-        'startDate': start_date.isoformat(),
-        'endDate': None,
-        'status': random.choice(['active', 'completed', 'paused']),
-        'goals': goals,
-        'lastUpdated': start_date.isoformat(),
-        'isDynamicallyAdjusted': random.choice([True, False])
+        return 'beginner'
+    if pain_level > 4:
+        return 'intermediate'
+    return 'advanced'
+
+def _pain_reduction(pain_level):
+    if pain_level > 7:
+        return 'high'
+    if pain_level > 4:
+        return 'medium'
+    return 'low'
+
+def generate_plans(rng, patient_rows, patient_columns, num_therapists, dates):
+    """Generate 1 to PLANS_PER_PATIENT plans per patient, with 3-6 exercises from the body part's pool"""
+    plans_per_patient = rng.integers(1, PLANS_PER_PATIENT + 1, size=len(patient_rows))
+    owner = np.repeat(np.arange(len(patient_rows)), plans_per_patient)
+    n = len(owner)
+    plan_number = (np.arange(n) - np.repeat(np.cumsum(plans_per_patient) - plans_per_patient, plans_per_patient)).tolist()
+    # Randomly assign a therapist or None (0)
+    therapist = rng.integers(num_therapists + 1, size=n).tolist()
+    start = patient_columns['created'][owner] + rng.integers(1, 31, size=n)
+    status = rng.integers(len(PLAN_STATUSES), size=n).tolist()
+    adjusted = (rng.random(n) < 0.5).tolist()
+
+    # Pool exercises in random order; a plan takes the first exercise_count of them
+    exercise_count = rng.integers(3, 7, size=n)
+    order = np.argsort(rng.random((n, POOL_SIZE)), axis=1).tolist()
+    sets = rng.integers(2, 5, size=(n, POOL_SIZE))
+    reps = rng.integers(8, 16, size=(n, POOL_SIZE))
+    duration = rng.integers(30, 91, size=(n, POOL_SIZE)).tolist()
+
+    columns = {
+        'start': start,
+        'exercise_count': exercise_count,
+        'sets': sets,
+        'reps': reps,
+        'body_part': patient_columns['body_part'][owner],
     }
-    
-    return plan, plan_id
-
-def generate_progress_log(patient_id, plan_id):
-    """Generate a random progress log for a plan"""
-    progress_id = generate_progress_id()
-    
-    # Load plan to get exercises
-    with open(f'simulated_data/plans/{plan_id}.json', 'r') as f:
-        plan = json.load(f)
-    
-    # Generate log date after plan start date
-    plan_start = datetime.fromisoformat(plan['startDate'].replace('Z', ''))
-    log_date = plan_start + timedelta(days=random.randint(1, 60))
-    
-    # Generate exercise logs
-    exercise_logs = []
-    for exercise in plan['exercises']:
-        # Some exercises might be skipped
-        if random.random() < 0.9:  # 90% chance of doing each exercise
-            sets_completed = random.randint(1, exercise['sets'])
-            reps_completed = random.randint(1, exercise['reps'])
-            
-            exercise_log = {
+    owner = owner.tolist()
+    start = start.tolist()
+    exercise_count = exercise_count.tolist()
+    sets = sets.tolist()
+    reps = reps.tolist()
+
+    rows = []
+    for p in range(n):
+        patient = patient_rows[owner[p]]
+        condition = patient['physicalCondition']
+        body_part = condition['bodyPart']
+        pain_level = condition['painLevel']
+        difficulty = _difficulty(pain_level)
+        key = f"{patient['id'][8:]}_{plan_number[p]}"
+        pool = EXERCISE_POOLS[body_part]
+        plan_order, plan_sets, plan_reps, plan_duration = order[p], sets[p], reps[p], duration[p]
+        exercises = []
+        for i in range(exercise_count[p]):
+            ex = pool[plan_order[i]]
+            exercises.append({
+                'id': f"ex_{body_part.lower()}_{i + 1}_{key}",
+                'name': ex['name'],
+                'description': ex['description'],
+                'bodyPart': ex['bodyPart'],
+                'sets': plan_sets[i],
+                'reps': plan_reps[i],
+                'durationSeconds': plan_duration[i],
+                'difficultyLevel': difficulty
+            })
+        goals = {}
+        if patient['rehabilitationGoals']:
+            goals = {
+                'primary': patient['rehabilitationGoals'][0],
+                'bodyPart': body_part,
+                'painReduction': _pain_reduction(pain_level)
+            }
+        rows.append({
+            'id': f"plan_{key}",
+            'userId': patient['id'],
+            'therapistId': f"therapist_{therapist[p] - 1}" if therapist[p] else None,
+            'title': f"{body_part} Rehabilitation Plan",
+            'description': f"Personalized rehabilitation plan for {body_part} recovery",
+            'exercises': exercises,
+            'startDate': dates[start[p]],
+            'endDate': None,
+            'status': PLAN_STATUSES[status[p]],
+            'goals': goals,
+            'lastUpdated': dates[start[p]],
+            'isDynamicallyAdjusted': adjusted[p]
+        })
+    return rows, columns
+
+def generate_progress_logs(rng, plan_rows, plan_columns, dates):
+    """Generate 0 to PROGRESS_LOGS_PER_PLAN progress logs per plan"""
+    logs_per_plan = rng.integers(0, PROGRESS_LOGS_PER_PLAN + 1, size=len(plan_rows))
+    plan = np.repeat(np.arange(len(plan_rows)), logs_per_plan)
+    n = len(plan)
+    log_number = (np.arange(n) - np.repeat(np.cumsum(logs_per_plan) - logs_per_plan, logs_per_plan)).tolist()
+    log_date = (plan_columns['start'][plan] + rng.integers(1, 61, size=n)).tolist()
+
+    # One column per pool slot; slots past the plan's exercise count are never done
+    planned = np.arange(POOL_SIZE) < plan_columns['exercise_count'][plan][:, None]
+    # Some exercises might be skipped: 90% chance of doing each exercise
+    done = planned & (rng.random((n, POOL_SIZE)) < 0.9)
+    planned_sets = plan_columns['sets'][plan]
+    sets_completed = (rng.random((n, POOL_SIZE)) * planned_sets).astype(np.int64) + 1
+    reps_completed = (rng.random((n, POOL_SIZE)) * plan_columns['reps'][plan]).astype(np.int64) + 1
+    pain = rng.integers(1, 11, size=(n, POOL_SIZE)).tolist()
+    notes = rng.integers(len(EXERCISE_NOTES), size=(n, POOL_SIZE)).tolist()
+
+    # Calculate adherence
+    total_planned = (planned_sets * planned).sum(axis=1)
+    total_completed = (sets_completed * done).sum(axis=1)
+    adherence = np.minimum(((total_completed / total_planned) * 100).astype(np.int64), 100).tolist()
+
+    rom = rng.integers(60, 181, size=n).tolist()  # Range of motion (degrees)
+    strength = rng.integers(3, 11, size=n).tolist()  # Strength (1-10 scale)
+    feedback = rng.integers(len(PROGRESS_FEEDBACK), size=n).tolist()
+    rating = rng.integers(1, 6, size=n).tolist()
+    done = done.tolist()
+    sets_completed = sets_completed.tolist()
+    reps_completed = reps_completed.tolist()
+    plan = plan.tolist()
+
+    rows = []
+    for l in range(n):
+        plan_row = plan_rows[plan[l]]
+        log_done, log_sets, log_reps, log_pain, log_notes = done[l], sets_completed[l], reps_completed[l], pain[l], notes[l]
+        exercise_logs = [
+            {
                 'exerciseId': exercise['id'],
                 'exerciseName': exercise['name'],
-                'setsCompleted': sets_completed,
-                'repsCompleted': reps_completed,
+                'setsCompleted': log_sets[i],
+                'repsCompleted': log_reps[i],
                 'durationSeconds': exercise['durationSeconds'],
-                'painLevel': random.randint(1, 10),
-                'notes': random.choice([None, 'Felt good', 'Too challenging', 'Getting easier', 'Need to modify'])
+                'painLevel': log_pain[i],
+                'notes': EXERCISE_NOTES[log_notes[i]]
             }
-            exercise_logs.append(exercise_log)
-    
-    # Calculate adherence
-    adherence = 0
-    if plan['exercises']:
-        total_sets_planned = sum(ex['sets'] for ex in plan['exercises'])
-        total_sets_completed = sum(log['setsCompleted'] for log in exercise_logs)
-        adherence = min(int((total_sets_completed / total_sets_planned) * 100), 100)
-    
-    # Generate metrics
-    body_part = plan['goals'].get('bodyPart', 'General')
-    metrics = {
-        f"{body_part.lower()}_rom": random.randint(60, 180),  # Range of motion (degrees)
-        f"{body_part.lower()}_strength": random.randint(3, 10)  # Strength (1-10 scale)
-    }
-    
-    progress_log = {
-        'id': progress_id,
-        'userId': patient_id,
-        'planId': plan_id,
-        'date': log_date.isoformat(),
-        'exerciseLogs': exercise_logs,
-        'metrics': metrics,
-        'feedback': random.choice([
-            None,
-            'Feeling improvement in range of motion',
-            'Still experiencing pain during certain movements',
-            'Exercises are getting easier to perform',
-            'Need modifications for some exercises'
-        ]),
-        'overallRating': random.randint(1, 5),
-        'adherencePercentage': adherence
-    }
-    
-    return progress_log, progress_id
+            for i, exercise in enumerate(plan_row['exercises']) if log_done[i]
+        ]
+        body_part = plan_row['goals'].get('bodyPart', 'General').lower()
+        rows.append({
+            'id': f"progress_{plan_row['id'][5:]}_{log_number[l]}",
+            'userId': plan_row['userId'],
+            'planId': plan_row['id'],
+            'date': dates[log_date[l]],
+            'exerciseLogs': exercise_logs,
+            'metrics': {
+                f"{body_part}_rom": rom[l],
+                f"{body_part}_strength": strength[l]
+            },
+            'feedback': PROGRESS_FEEDBACK[feedback[l]],
+            'overallRating': rating[l],
+            'adherencePercentage': adherence[l]
+        })
+    return rows
+
+def _shard_path(parts_dir, entity, shard):
+    return os.path.join(parts_dir, f"{entity}-{shard:05d}.jsonl")
+
+def _write_rows(path, rows):
+    with open(path, 'a') as f:
+        f.write('\n'.join(map(_encode, rows)))
+        f.write('\n')
+
+def generate_shard(shard, first_patient, num_patients, num_therapists, seed, reference, parts_dir):
+    """Write one shard of patients with their plans and progress logs; returns row counts.
+
+    Ids embed the global patient number, so shards never collide. Patients are
+    generated in blocks of BLOCK_SIZE to bound memory.
+    """
+    rng = np.random.default_rng(seed)
+    dates = date_table(reference)
+    counts = {'patients': 0, 'plans': 0, 'progress': 0}
+    for entity in counts:
+        open(_shard_path(parts_dir, entity, shard), 'w').close()
+    for block_start in range(first_patient, first_patient + num_patients, BLOCK_SIZE):
+        block_size = min(BLOCK_SIZE, first_patient + num_patients - block_start)
+        patients, patient_columns = generate_patients(rng, block_start, block_size, dates)
+        plans, plan_columns = generate_plans(rng, patients, patient_columns, num_therapists, dates)
+        progress = generate_progress_logs(rng, plans, plan_columns, dates)
+        for entity, rows in (('patients', patients), ('plans', plans), ('progress', progress)):
+            if rows:
+                _write_rows(_shard_path(parts_dir, entity, shard), rows)
+            counts[entity] += len(rows)
+    return counts
+
+def _generate_therapists(num_therapists, seed, reference, parts_dir):
+    rows = generate_therapists(np.random.default_rng(seed), num_therapists, date_table(reference))
+    open(_shard_path(parts_dir, 'therapists', 0), 'w').close()
+    if rows:
+        _write_rows(_shard_path(parts_dir, 'therapists', 0), rows)
+    return {'therapists': len(rows)}
 
 # Generate and save the data
-def generate_all_data():
-    """Generate all simulated data"""
-    print("Generating simulated data...")
-    
-    # Create directories
-    os.makedirs('simulated_data/users', exist_ok=True)
-    os.makedirs('simulated_data/plans', exist_ok=True)
-    os.makedirs('simulated_data/progress', exist_ok=True)
-    
-    # Generate patients
-    patient_ids = []
-    for _ in range(NUM_PATIENTS):
-        patient, patient_id = generate_random_patient()
-        patient_ids.append(patient_id)
-        
-        # Save patient data
-        with open(f'simulated_data/users/{patient_id}.json', 'w') as f:
-            json.dump(patient, f, indent=2)
-    
-    # Generate therapists
-    therapist_ids = []
-    for _ in range(NUM_THERAPISTS):
-        therapist, therapist_id = generate_random_therapist()
-        therapist_ids.append(therapist_id)
-        
-        # Save therapist data
-        with open(f'simulated_data/users/{therapist_id}.json', 'w') as f:
-            json.dump(therapist, f, indent=2)
-    
-    # Generate rehabilitation plans
-    plan_ids = []
-    for patient_id in patient_ids:
-        for _ in range(random.randint(1, PLANS_PER_PATIENT)):
-            # Randomly assign a therapist or None
-            therapist_id = random.choice([None] + therapist_ids)
-            plan, plan_id = generate_rehabilitation_plan(patient_id, therapist_id)
-            plan_ids.append((patient_id, plan_id))
-            
-            # Save plan data
-            with open(f'simulated_data/plans/{plan_id}.json', 'w') as f:
-                json.dump(plan, f, indent=2)
-    
-    # Generate progress logs
-    for patient_id, plan_id in plan_ids:
-        for _ in range(random.randint(0, PROGRESS_LOGS_PER_PLAN)):
-            progress, progress_id = generate_progress_log(patient_id, plan_id)
-            
-            # Save progress data
-            with open(f'simulated_data/progress/{progress_id}.json', 'w') as f:
-                json.dump(progress, f, indent=2)
-    
-    print(f"Generated {len(patient_ids)} patients")
-    print(f"Generated {len(therapist_ids)} therapists")
-    print(f"Generated {len(plan_ids)} rehabilitation plans")
-    print("Data generation complete!")
+def generate_all_data(num_patients=NUM_PATIENTS, num_therapists=None, output_dir=OUTPUT_DIR,
+                      shard_size=SHARD_SIZE, workers=None, seed=SEED, reference_date=None):
+    """Generate all simulated data into one JSON Lines file per entity type"""
+    started = time.perf_counter()
+    if num_therapists is None:
+        num_therapists = max(1, num_patients // PATIENTS_PER_THERAPIST)
+    reference = (reference_date or datetime.now().date().isoformat())
+    num_shards = max(1, -(-num_patients // shard_size))
+    workers = min(workers or os.cpu_count() or 1, num_shards)
+    print(f"Generating simulated data: {num_patients} patients in {num_shards} shards on {workers} workers...")
+
+    # Independent, reproducible streams: one per shard plus one for the therapists
+    seeds = [int(child.generate_state(1, dtype=np.uint64)[0])
+             for child in np.random.SeedSequence(seed).spawn(num_shards + 1)]
+    parts_dir = os.path.join(output_dir, '.parts')
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+
+    shard_args = [
+        (shard, shard * shard_size, min(shard_size, num_patients - shard * shard_size),
+         num_therapists, seeds[shard], reference, parts_dir)
+        for shard in range(num_shards)
+    ]
+    counts = _generate_therapists(num_therapists, seeds[-1], reference, parts_dir)
+    if workers == 1:
+        results = [generate_shard(*args) for args in shard_args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(generate_shard, *zip(*shard_args)))
+    for result in results:
+        for entity, count in result.items():
+            counts[entity] = counts.get(entity, 0) + count
+
+    # Concatenate the shard files in shard order
+    for entity in ENTITIES:
+        path = os.path.join(output_dir, f"{entity}.jsonl")
+        with open(path + '.tmp', 'wb') as out:
+            for shard in range(num_shards if entity != 'therapists' else 1):
+                with open(_shard_path(parts_dir, entity, shard), 'rb') as part:
+                    shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+        os.replace(path + '.tmp', path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    for entity in ENTITIES:
+        print(f"Generated {counts[entity]} {entity} -> {os.path.join(output_dir, entity + '.jsonl')}")
+    print(f"Data generation complete in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate simulated rehabilitation data as JSON Lines")
+    parser.add_argument('--patients', type=int, default=NUM_PATIENTS)
+    parser.add_argument('--therapists', type=int, default=None,
+                        help=f"default: one per {PATIENTS_PER_THERAPIST} patients")
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="default: all cores")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--reference-date', default=None,
+                        help="ISO date the generated dates count back from (default: today)")
+    args = parser.parse_args(argv)
+    generate_all_data(args.patients, args.therapists, args.output, args.shard_size,
+                      args.workers, args.seed, args.reference_date)
 
 if __name__ == "__main__":
-    generate_all_data()
\ No newline at end of file
+    main()
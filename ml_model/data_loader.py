@@ -0,0 +1,288 @@
+import contextlib
+import gc
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# Bulk loader for the simulated training data.
+#
+# Reads the consolidated JSON Lines files written by data_generator.py
+# (patients.jsonl, plans.jsonl, progress.jsonl) and falls back to the older
+# one-file-per-record layout (users/, plans/, progress/). Either way the work is
+# split into chunks parsed on a process pool, and the nested records are
+# flattened into typed DataFrames:
+#
+#   patients        one row per patient, with the features model_training uses
+#   plans           one row per plan
+#   plan_exercises  one row per exercise of a plan; 'plan' is the row in plans
+#   progress        one row per progress log
+#   exercise_logs   one row per exercise of a log; 'progress' is the row in progress
+
+DATA_DIR = 'simulated_data'
+# JSONL byte ranges and per-file batches handed to one worker
+JSONL_CHUNK_BYTES = 16 * 1024 * 1024
+FILES_PER_CHUNK = 2000
+
+# entity -> (JSONL file, per-file directory, required filename prefix)
+SOURCES = {
+    'patients': ('patients.jsonl', 'users', 'patient_'),
+    'plans': ('plans.jsonl', 'plans', ''),
+    'progress': ('progress.jsonl', 'progress', ''),
+}
+
+# Columns stored as pandas categoricals; everything else is numeric or object
+CATEGORICAL_COLUMNS = {
+    'patients': ('body_part', 'pain_location', 'previous_injuries', 'surgical_history', 'primary_goal'),
+    'plans': ('status', 'body_part'),
+    'plan_exercises': ('name', 'difficulty'),
+    'progress': (),
+    'exercise_logs': (),
+}
+INTEGER_COLUMNS = {
+    'patients': ('pain_level',),
+    'plans': ('exercise_count',),
+    'plan_exercises': ('plan', 'sets', 'reps'),
+    'progress': ('adherence', 'rating', 'exercise_log_count'),
+    'exercise_logs': ('progress', 'pain_level', 'sets_completed', 'reps_completed'),
+}
+
+
+def _flatten_patients(records):
+    """Patient feature columns, with the defaults model_training applies to missing fields"""
+    columns = {name: [] for name in ('id', 'body_part', 'pain_level', 'pain_location', 'previous_injuries',
+                                     'surgical_history', 'primary_goal', 'created_at')}
+    for patient in records:
+        condition = patient['physicalCondition']
+        history = patient['medicalHistory']
+        goals = patient.get('rehabilitationGoals', [])
+        columns['id'].append(patient['id'])
+        columns['body_part'].append(condition.get('bodyPart', 'Unknown'))
+        columns['pain_level'].append(condition.get('painLevel', 5))
+        columns['pain_location'].append(condition.get('painLocation', 'Unknown'))
+        columns['previous_injuries'].append(history.get('previousInjuries', 'None'))
+        columns['surgical_history'].append(history.get('surgicalHistory', 'None'))
+        columns['primary_goal'].append(goals[0] if goals else 'Pain reduction')
+        columns['created_at'].append(patient.get('createdAt'))
+    return {'patients': columns}
+
+def _flatten_plans(records):
+    plans = {name: [] for name in ('id', 'user_id', 'therapist_id', 'status', 'start_date', 'body_part',
+                                   'exercise_count')}
+    exercises = {name: [] for name in ('plan', 'exercise_id', 'name', 'difficulty', 'sets', 'reps')}
+    plan_column, exercise_id, name, difficulty, sets, reps = exercises.values()
+    for row, plan in enumerate(records):
+        plan_exercises = plan['exercises']
+        plans['id'].append(plan['id'])
+        plans['user_id'].append(plan['userId'])
+        plans['therapist_id'].append(plan.get('therapistId'))
+        plans['status'].append(plan.get('status'))
+        plans['start_date'].append(plan.get('startDate'))
+        plans['body_part'].append((plan.get('goals') or {}).get('bodyPart'))
+        plans['exercise_count'].append(len(plan_exercises))
+        plan_column.extend([row] * len(plan_exercises))
+        for exercise in plan_exercises:
+            exercise_id.append(exercise['id'])
+            name.append(exercise['name'])
+            difficulty.append(exercise['difficultyLevel'])
+            sets.append(exercise['sets'])
+            reps.append(exercise['reps'])
+    return {'plans': plans, 'plan_exercises': exercises}
+
+def _flatten_progress(records):
+    logs = {name: [] for name in ('id', 'plan_id', 'user_id', 'date', 'adherence', 'rating', 'exercise_log_count')}
+    exercise_logs = {name: [] for name in ('progress', 'exercise_id', 'pain_level', 'sets_completed', 'reps_completed')}
+    progress_column, exercise_id, pain_level, sets_completed, reps_completed = exercise_logs.values()
+    for row, log in enumerate(records):
+        entries = log['exerciseLogs']
+        logs['id'].append(log['id'])
+        logs['plan_id'].append(log['planId'])
+        logs['user_id'].append(log.get('userId'))
+        logs['date'].append(log['date'])
+        logs['adherence'].append(log['adherencePercentage'])
+        logs['rating'].append(log['overallRating'])
+        logs['exercise_log_count'].append(len(entries))
+        progress_column.extend([row] * len(entries))
+        for entry in entries:
+            exercise_id.append(entry['exerciseId'])
+            pain_level.append(entry['painLevel'])
+            sets_completed.append(entry['setsCompleted'])
+            reps_completed.append(entry['repsCompleted'])
+    return {'progress': logs, 'exercise_logs': exercise_logs}
+
+FLATTEN = {
+    'patients': _flatten_patients,
+    'plans': _flatten_plans,
+    'progress': _flatten_progress,
+}
+# Child table -> (parent table, column holding the parent row)
+CHILD_TABLES = {'plan_exercises': ('plans', 'plan'), 'exercise_logs': ('progress', 'progress')}
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Parsing allocates millions of containers that are all kept; collections would only rescan them"""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def _read_jsonl_range(path, start, end):
+    """Records of the lines that start within [start, end) of a JSON Lines file"""
+    with open(path, 'rb') as f:
+        if start:
+            # Skip the line straddling start; the previous range owns it
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        if position >= end:
+            return []
+        data = f.read(end - position)
+        if data and not data.endswith(b'\n'):
+            # Finish the last line; when data ends on a line break the next line starts at end
+            data += f.readline()
+    text = data.decode('utf-8').strip()
+    if not text:
+        return []
+    try:
+        # One decoder call for the whole range instead of one per line
+        return json.loads('[' + text.replace('\n', ',') + ']')
+    except ValueError:
+        # e.g. blank lines
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def _read_json_files(paths):
+    records = []
+    for path in paths:
+        with open(path, 'r') as f:
+            records.append(json.load(f))
+    return records
+
+def _parse_chunk(entity, kind, source):
+    """Flattened columns of one chunk: a JSONL (path, start, end) range or a list of JSON files.
+
+    Integer columns come back as arrays, which are far cheaper to send back from a worker.
+    """
+    with _gc_paused():
+        records = _read_jsonl_range(*source) if kind == 'jsonl' else _read_json_files(source)
+        tables = FLATTEN[entity](records)
+        del records
+    for table, columns in tables.items():
+        for name in INTEGER_COLUMNS[table]:
+            columns[name] = np.asarray(columns[name], dtype=np.int64)
+    return tables
+
+def _source_paths(data_dir, entity):
+    """(kind, paths) load_tables reads for an entity, preferring the consolidated JSONL file"""
+    jsonl_name, directory, prefix = SOURCES[entity]
+    jsonl_path = os.path.join(data_dir, jsonl_name)
+    if os.path.exists(jsonl_path):
+        return 'jsonl', [jsonl_path]
+    directory = os.path.join(data_dir, directory)
+    if not os.path.isdir(directory):
+        return 'files', []
+    return 'files', [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                     if name.startswith(prefix) and name.endswith('.json')]
+
+def _chunks(data_dir, entity):
+    """(kind, chunk sources) for an entity: JSONL byte ranges or batches of per-record files"""
+    kind, paths = _source_paths(data_dir, entity)
+    if kind == 'jsonl':
+        size = os.path.getsize(paths[0])
+        return kind, [(paths[0], start, min(start + JSONL_CHUNK_BYTES, size))
+                      for start in range(0, size, JSONL_CHUNK_BYTES)]
+    return kind, [paths[i:i + FILES_PER_CHUNK] for i in range(0, len(paths), FILES_PER_CHUNK)]
+
+def source_files(data_dir=DATA_DIR):
+    """Every file load_tables(data_dir) would read, in a stable order"""
+    return [path for entity in SOURCES for path in _source_paths(data_dir, entity)[1]]
+
+def _to_frame(table, columns):
+    frame = {}
+    for name, values in columns.items():
+        if name in INTEGER_COLUMNS[table]:
+            frame[name] = values
+        elif name in CATEGORICAL_COLUMNS[table]:
+            frame[name] = pd.Categorical(values)
+        else:
+            frame[name] = np.asarray(values, dtype=object)
+    return pd.DataFrame(frame)
+
+def _merge_chunks(results):
+    """Concatenate per-chunk columns, shifting child rows by the parent rows of earlier chunks"""
+    merged = {}
+    for table in results[0]:
+        parent = CHILD_TABLES.get(table)
+        columns = {}
+        if parent is not None:
+            offsets = np.cumsum([0] + [len(result[parent[0]]['id']) for result in results[:-1]])
+        for name in results[0][table]:
+            if parent is not None and name == parent[1]:
+                columns[name] = np.concatenate([
+                    result[table][name] + offset for result, offset in zip(results, offsets)
+                ])
+            elif name in INTEGER_COLUMNS[table]:
+                columns[name] = np.concatenate([result[table][name] for result in results])
+            else:
+                columns[name] = list(chain.from_iterable(result[table][name] for result in results))
+        merged[table] = columns
+    return merged
+
+def load_tables(data_dir=DATA_DIR, workers=None, verbose=True):
+    """Load the simulated data as a dict of DataFrames; see the table list at the top of this file"""
+    started = time.perf_counter()
+    jobs = []
+    kinds = {}
+    for entity in SOURCES:
+        kind, chunks = _chunks(data_dir, entity)
+        kinds[entity] = kind
+        jobs.extend((entity, kind, chunk) for chunk in chunks)
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers == 1:
+        parsed = [_parse_chunk(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_chunk, *zip(*jobs)))
+
+    tables = {}
+    for entity in SOURCES:
+        results = [result for job, result in zip(jobs, parsed) if job[0] == entity]
+        if not results:
+            results = [_parse_chunk(entity, 'files', [])]
+        for table, columns in _merge_chunks(results).items():
+            tables[table] = _to_frame(table, columns)
+
+    elapsed = time.perf_counter() - started
+    if verbose:
+        rows = sum(len(tables[entity]) for entity in SOURCES)
+        sources = ', '.join(f"{entity} from {kinds[entity]}" for entity in SOURCES)
+        print(f"Loaded {len(tables['patients'])} patients, {len(tables['plans'])} plans and "
+              f"{len(tables['progress'])} progress logs ({sources}) on {workers} workers "
+              f"in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} records/s)")
+    return tables
+
+def load_records(data_dir=DATA_DIR, workers=None):
+    """Patients, plans and progress logs as lists of dicts, in file order.
+
+    Reads the JSONL files when present, otherwise the per-record files on a
+    thread pool so file opens overlap.
+    """
+    loaded = []
+    with _gc_paused():
+        for entity in SOURCES:
+            kind, chunks = _chunks(data_dir, entity)
+            if kind == 'jsonl':
+                records = list(chain.from_iterable(_read_jsonl_range(*chunk) for chunk in chunks))
+            else:
+                with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+                    records = list(chain.from_iterable(pool.map(_read_json_files, chunks)))
+            loaded.append(records)
+    return tuple(loaded)
@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from collections.abc import Mapping
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Content-addressed cache for the stages of the training pipeline.
+#
+# Every stage (load -> prepare -> encode -> split) is keyed by a hash of its
+# name, its parameters, the keys of the stages it reads from and the code that
+# computes it; the load stage is keyed by the contents of the data files. A
+# stage whose key is already on disk is not run again, so an unchanged
+# pipeline goes straight to fitting. Layout under the cache root:
+#
+#   <stage>/<key>/meta.json      item layout, compute time, creation time
+#   <stage>/<key>/<item>.npy     arrays, numeric columns, category and string codes
+#   <stage>/<key>/<item>.txt     distinct values of a string column, NUL separated
+#   <stage>/<key>/<item>.pkl     anything else (fitted encoders and scalers)
+#   fingerprints.json            data file hashes, reused while size and mtime match
+#
+# Arrays are memory-mapped when read back and items are only read when used.
+# String columns keep their distinct values in memory and their codes mapped.
+
+CACHE_DIR = 'feature_cache'
+META_FILENAME = 'meta.json'
+FINGERPRINTS_FILENAME = 'fingerprints.json'
+STAGING_PREFIX = '.staging-'
+# Bump when the on-disk layout changes; every key changes with it
+FORMAT_VERSION = 1
+# Entries kept per stage; the least recently used ones beyond this are deleted
+KEEP_ENTRIES = 3
+STRING_SEPARATOR = '\x00'
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_array(directory, name, values):
+    """Write one column or array; returns the item metadata needed to read it back"""
+    if isinstance(values, (pd.Series, pd.Index)):
+        values = values.array
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(values.codes))
+        return {'codec': 'categorical', 'ordered': bool(values.ordered),
+                'categories': _save_array(directory, f'{name}.categories', values.categories)}
+    if values.dtype.kind in 'biufcmM':
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(values))
+        return {'codec': 'npy'}
+
+    # Strings: codes into the distinct values, with -1 for missing ones
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    try:
+        text = STRING_SEPARATOR.join(uniques)
+    except TypeError:
+        text = None
+    if text is None or text.count(STRING_SEPARATOR) != max(len(uniques) - 1, 0):
+        # Not all strings, or strings containing the separator
+        joblib.dump(values, os.path.join(directory, f'{name}.pkl'))
+        return {'codec': 'pickle'}
+    codes = codes.astype(np.int32 if len(uniques) < 2**31 else np.int64)
+    np.save(os.path.join(directory, f'{name}.npy'), codes)
+    with open(os.path.join(directory, f'{name}.txt'), 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    return {'codec': 'strings', 'dtype': str(values.dtype), 'count': len(uniques)}
+
+def _load_array(directory, name, meta):
+    codec = meta['codec']
+    if codec == 'pickle':
+        return joblib.load(os.path.join(directory, f'{name}.pkl'))
+    codes = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+    if codec == 'npy':
+        return codes
+    if codec == 'categorical':
+        categories = _load_array(directory, f'{name}.categories', meta['categories'])
+        return pd.Categorical.from_codes(codes, categories=pd.Index(categories), ordered=meta['ordered'])
+
+    with open(os.path.join(directory, f'{name}.txt'), 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+    lookup = np.empty(meta['count'] + 1, dtype=object)
+    if meta['count']:
+        lookup[:-1] = text.split(STRING_SEPARATOR)
+    # Code -1 picks the trailing None
+    values = lookup[codes]
+    if meta['dtype'] != 'object':
+        return pd.array(values, dtype=meta['dtype'])
+    return values
+
+def _save_item(directory, name, value):
+    """Write one stage output; dicts become subdirectories"""
+    if isinstance(value, dict):
+        subdirectory = os.path.join(directory, name)
+        os.makedirs(subdirectory)
+        return {'kind': 'dict', 'items': {key: _save_item(subdirectory, key, item) for key, item in value.items()}}
+    if isinstance(value, pd.DataFrame):
+        dtypes = set(value.dtypes)
+        if len(dtypes) == 1 and isinstance(next(iter(dtypes)), np.dtype) and next(iter(dtypes)).kind in 'biuf':
+            # One numeric block, mapped back as a single array
+            np.save(os.path.join(directory, f'{name}.npy'), value.to_numpy())
+            return {'kind': 'frame', 'columns': list(value.columns), 'block': True}
+        return {'kind': 'frame', 'columns': list(value.columns), 'block': False, 'arrays': [
+            _save_array(directory, f'{name}.{i}', value.iloc[:, i]) for i in range(value.shape[1])
+        ]}
+    if isinstance(value, pd.Series):
+        return {'kind': 'series', 'name': value.name, 'array': _save_array(directory, name, value)}
+    if isinstance(value, np.ndarray):
+        return {'kind': 'array', 'array': _save_array(directory, name, value)}
+    joblib.dump(value, os.path.join(directory, f'{name}.pkl'))
+    return {'kind': 'object'}
+
+def _load_item(directory, name, meta, on_load):
+    kind = meta['kind']
+    if kind == 'dict':
+        return StageOutputs(None, os.path.join(directory, name), meta['items'], on_load)
+    if kind == 'frame':
+        if meta['block']:
+            return pd.DataFrame(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r'),
+                                columns=meta['columns'], copy=False)
+        return pd.DataFrame({
+            column: _load_array(directory, f'{name}.{i}', array_meta)
+            for i, (column, array_meta) in enumerate(zip(meta['columns'], meta['arrays']))
+        }, columns=meta['columns'])
+    if kind == 'series':
+        return pd.Series(_load_array(directory, name, meta['array']), name=meta['name'], copy=False)
+    if kind == 'array':
+        return _load_array(directory, name, meta['array'])
+    return joblib.load(os.path.join(directory, f'{name}.pkl'))
+
+
+class StageOutputs(Mapping):
+    """Outputs of one pipeline stage, by name.
+
+    `key` identifies the stage run and is what downstream stages are keyed on.
+    Outputs read from the cache are loaded on first access, so a stage whose
+    outputs are only needed by a later cached stage costs nothing.
+    """
+
+    def __init__(self, key, directory=None, items=None, on_load=None, values=None):
+        self.key = key
+        self._directory = directory
+        self._items = items if items is not None else {}
+        self._on_load = on_load
+        self._values = dict(values) if values is not None else {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            if name not in self._items:
+                raise KeyError(name)
+            started = time.perf_counter()
+            self._values[name] = _load_item(self._directory, name, self._items[name], self._on_load)
+            if self._on_load is not None:
+                self._on_load(time.perf_counter() - started)
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._items if self._directory is not None else self._values)
+
+    def __len__(self):
+        return len(self._items if self._directory is not None else self._values)
+
+
+class FeatureCache:
+    """Stage outputs on disk, keyed by a hash of everything that determines them.
+
+    code_paths are source files whose contents are folded into every key, so
+    editing the pipeline invalidates what it cached. With enabled=False every
+    stage is computed and nothing is read or written.
+    """
+
+    def __init__(self, root=CACHE_DIR, enabled=True, code_paths=(), keep=KEEP_ENTRIES):
+        self.root = root
+        self.enabled = enabled
+        self.keep = keep
+        self.code_version = hashlib.sha256(
+            ''.join(_file_digest(path) for path in code_paths).encode()
+        ).hexdigest()
+        # One entry per run() call, in call order
+        self.events = []
+
+    def fingerprint_files(self, paths, base_dir):
+        """Content hash of data files, named relative to base_dir.
+
+        File hashes are remembered in fingerprints.json and reused while a
+        file's size and modification time are unchanged.
+        """
+        memo_path = os.path.join(self.root, FINGERPRINTS_FILENAME)
+        memo = (_read_json(memo_path) or {}) if self.enabled else {}
+        updated = {}
+        digest = hashlib.sha256()
+        for path in paths:
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            cached = memo.get(path)
+            if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                file_digest = cached[2]
+            else:
+                file_digest = _file_digest(path)
+            updated[path] = [stat.st_size, stat.st_mtime_ns, file_digest]
+            digest.update(f"{os.path.relpath(path, os.path.abspath(base_dir))}\n{file_digest}\n".encode())
+        if self.enabled and any(memo.get(path) != entry for path, entry in updated.items()):
+            os.makedirs(self.root, exist_ok=True)
+            memo.update(updated)
+            _write_json_atomic(memo_path, memo)
+        return digest.hexdigest()
+
+    def key(self, stage, inputs=(), params=None):
+        """Hash of a stage's name, its inputs (stage outputs or strings) and its parameters"""
+        spec = {
+            'format': FORMAT_VERSION,
+            'code': self.code_version,
+            'stage': stage,
+            'inputs': [getattr(source, 'key', source) for source in inputs],
+            'params': params or {},
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def run(self, stage, compute, inputs=(), params=None):
+        """Return the outputs of compute() (a dict), from the cache when the key is already stored"""
+        key = self.key(stage, inputs, params)
+        event = {'stage': stage, 'key': key, 'status': 'disabled', 'seconds': 0.0, 'saved_seconds': 0.0}
+        self.events.append(event)
+        directory = os.path.join(self.root, stage, key)
+
+        if self.enabled:
+            meta = _read_json(os.path.join(directory, META_FILENAME))
+            if meta is not None and meta.get('key') == key:
+                # Bump the entry's recency for pruning
+                os.utime(os.path.join(directory, META_FILENAME))
+                event['status'] = 'hit'
+                event['compute_seconds'] = meta['compute_seconds']
+
+                def on_load(seconds):
+                    event['seconds'] += seconds
+
+                return StageOutputs(key, directory, meta['items'], on_load)
+
+        started = time.perf_counter()
+        values = compute()
+        event['seconds'] = time.perf_counter() - started
+        if self.enabled:
+            event['status'] = 'miss'
+            started = time.perf_counter()
+            self._store(stage, key, values, event['seconds'])
+            event['store_seconds'] = time.perf_counter() - started
+        return StageOutputs(key, values=values)
+
+    def _store(self, stage, key, values, compute_seconds):
+        stage_dir = os.path.join(self.root, stage)
+        staging_dir = os.path.join(stage_dir, f'{STAGING_PREFIX}{uuid.uuid4().hex}')
+        os.makedirs(staging_dir)
+        try:
+            items = {name: _save_item(staging_dir, name, value) for name, value in values.items()}
+            _write_json_atomic(os.path.join(staging_dir, META_FILENAME), {
+                'stage': stage,
+                'key': key,
+                'created_at': datetime.now().isoformat(),
+                'compute_seconds': compute_seconds,
+                'items': items,
+            })
+            target = os.path.join(stage_dir, key)
+            # A corrupt or concurrently written entry under the same key is replaced
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(staging_dir, target)
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        self._prune(stage_dir)
+
+    def _prune(self, stage_dir):
+        entries = []
+        for name in os.listdir(stage_dir):
+            path = os.path.join(stage_dir, name)
+            if name.startswith(STAGING_PREFIX) or not os.path.isdir(path):
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(path, META_FILENAME)), path))
+            except OSError:
+                entries.append((0, path))
+        for _, path in sorted(entries, reverse=True)[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def summary(self):
+        """Hits, misses, seconds spent and seconds saved per stage, in pipeline order"""
+        stages = {}
+        for event in self.events:
+            totals = stages.setdefault(event['stage'], {
+                'hits': 0, 'misses': 0, 'seconds': 0.0, 'saved_seconds': 0.0
+            })
+            totals['hits'] += event['status'] == 'hit'
+            totals['misses'] += event['status'] == 'miss'
+            totals['seconds'] += event['seconds'] + event.get('store_seconds', 0.0)
+            if event['status'] == 'hit':
+                totals['saved_seconds'] += max(event['compute_seconds'] - event['seconds'], 0.0)
+        return stages
+
+    def print_report(self):
+        if not self.enabled:
+            print("Feature cache disabled.")
+            return
+        stages = self.summary()
+        print(f"\nFeature cache ({self.root}):")
+        for stage, totals in stages.items():
+            print(f"{stage:>8}: {totals['hits']} hit(s), {totals['misses']} miss(es), "
+                  f"{totals['seconds']:.2f}s spent, {totals['saved_seconds']:.2f}s saved")
+        print(f"   total: {sum(t['hits'] for t in stages.values())} hit(s), "
+              f"{sum(t['misses'] for t in stages.values())} miss(es), "
+              f"{sum(t['saved_seconds'] for t in stages.values()):.2f}s saved")
@@ -1,7 +1,9 @@
+import argparse
 import os
 import json
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.model_selection import train_test_split
@@ -9,200 +11,170 @@ from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
+import data_loader
+from data_loader import load_tables, source_files
+from feature_cache import CACHE_DIR, FeatureCache
+
+# Consecutive progress logs summarized by one plan adjustment example
+ADJUSTMENT_WINDOW = 3
+DATA_DIR = 'simulated_data'
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+CATEGORICAL_FEATURES = ['body_part', 'pain_location', 'previous_injuries', 
+                        'surgical_history', 'primary_goal']
+
 # Load simulated data
-def load_data():
-    """Load simulated data from JSON files and prepare for training"""
+def load_data(data_dir=DATA_DIR):
+    """Load simulated data as DataFrames (see data_loader) for training"""
     print("Loading simulated data...")
     
-    patients = []
-    plans = []
-    progress_logs = []
-    
-    # Load patient data
-    patient_dir = 'simulated_data/users'
-    for filename in os.listdir(patient_dir):
-        if filename.startswith('patient_'):
-            with open(os.path.join(patient_dir, filename), 'r') as f:
-                patient = json.load(f)
-                patients.append(patient)
-    
-    # Load plan data
-    plan_dir = 'simulated_data/plans'
-    for filename in os.listdir(plan_dir):
-        with open(os.path.join(plan_dir, filename), 'r') as f:
-            plan = json.load(f)
-            plans.append(plan)
-    
-    # Load progress data
-    progress_dir = 'simulated_data/progress'
-    for filename in os.listdir(progress_dir):
-        with open(os.path.join(progress_dir, filename), 'r') as f:
-            progress = json.load(f)
-            progress_logs.append(progress)
-    
-    print(f"Loaded {len(patients)} patients, {len(plans)} plans, and {len(progress_logs)} progress logs.")
-    return patients, plans, progress_logs
+    tables = load_tables(data_dir)
+    
+    print(f"Loaded {len(tables['patients'])} patients, {len(tables['plans'])} plans, and {len(tables['progress'])} progress logs.")
+    return tables
 
-def prepare_data_for_exercise_recommendation(patients, plans):
+def _values(column):
+    """Plain object array of a column, so categoricals come out as the strings they hold"""
+    return np.asarray(column, dtype=object)
+
+def prepare_data_for_exercise_recommendation(patients, plans, plan_exercises):
     """Prepare data for exercise recommendation model"""
     print("Preparing data for exercise recommendation model...")
     
-    data = []
-    
-    for plan in plans:
-        # Skip plans without exercises
-        if not plan['exercises']:
-            continue
-        
-        # Find the patient for this plan
-        patient_id = plan['userId']
-        patient = next((p for p in patients if p['id'] == patient_id), None)
-        
-        if not patient:
-            continue
-        
-        # Extract features
-        body_part = patient['physicalCondition'].get('bodyPart', 'Unknown')
-        pain_level = patient['physicalCondition'].get('painLevel', 5)
-        pain_location = patient['physicalCondition'].get('painLocation', 'Unknown')
-        previous_injuries = patient['medicalHistory'].get('previousInjuries', 'None')
-        surgical_history = patient['medicalHistory'].get('surgicalHistory', 'None')
-        
-        # Get rehab goals
-        goals = patient.get('rehabilitationGoals', [])
-        primary_goal = goals[0] if goals else 'Pain reduction'
-        
-        # For each exercise in the plan, create a training example
-        for exercise in plan['exercises']:
-            data.append({
-                'body_part': body_part,
-                'pain_level': pain_level,
-                'pain_location': pain_location,
-                'previous_injuries': previous_injuries,
-                'surgical_history': surgical_history,
-                'primary_goal': primary_goal,
-                'exercise_name': exercise['name'],
-                'exercise_difficulty': exercise['difficultyLevel'],
-                'sets': exercise['sets'],
-                'reps': exercise['reps']
-            })
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    # Find the patient for every plan through an id index; the first profile with an id wins
+    patients = patients.drop_duplicates('id')
+    plan_patient = pd.Index(patients['id']).get_indexer(plans['user_id'])
+    
+    # One training example per exercise of a plan whose patient exists
+    exercise_patient = plan_patient[plan_exercises['plan'].to_numpy()]
+    found = exercise_patient >= 0
+    exercises = plan_exercises[found]
+    patient = patients.iloc[exercise_patient[found]]
+    
+    df = pd.DataFrame({
+        'body_part': _values(patient['body_part']),
+        'pain_level': patient['pain_level'].to_numpy(),
+        'pain_location': _values(patient['pain_location']),
+        'previous_injuries': _values(patient['previous_injuries']),
+        'surgical_history': _values(patient['surgical_history']),
+        'primary_goal': _values(patient['primary_goal']),
+        'exercise_name': _values(exercises['name']),
+        'exercise_difficulty': _values(exercises['difficulty']),
+        'sets': exercises['sets'].to_numpy(),
+        'reps': exercises['reps'].to_numpy()
+    })
     print(f"Created {len(df)} training examples for exercise recommendation.")
     return df
 
-def prepare_data_for_plan_adjustment(plans, progress_logs):
-    """Prepare data for plan adjustment model"""
+def prepare_data_for_plan_adjustment(plans, progress, exercise_logs, window=ADJUSTMENT_WINDOW):
+    """Prepare data for plan adjustment model: one example per `window` consecutive logs of a plan"""
     print("Preparing data for plan adjustment model...")
     
-    data = []
-    
-    # Group progress logs by plan
-    plan_logs = {}
-    for log in progress_logs:
-        plan_id = log['planId']
-        if plan_id not in plan_logs:
-            plan_logs[plan_id] = []
-        plan_logs[plan_id].append(log)
-    
-    for plan_id, logs in plan_logs.items():
-        # Find the plan
-        plan = next((p for p in plans if p['id'] == plan_id), None)
-        if not plan:
-            continue
-        
-        # Sort logs by date
-        logs.sort(key=lambda x: x['date'])
-        
-        # Need at least 3 logs to make adjustment decisions
-        if len(logs) < 3:
-            continue
-        
-        # For each consecutive set of 3 logs, create a training example
-        for i in range(len(logs) - 3):
-            log1, log2, log3 = logs[i], logs[i+1], logs[i+2]
-            
-            # Extract features
-            avg_pain = np.mean([
-                np.mean([ex_log['painLevel'] for ex_log in log1['exerciseLogs']]),
-                np.mean([ex_log['painLevel'] for ex_log in log2['exerciseLogs']]),
-                np.mean([ex_log['painLevel'] for ex_log in log3['exerciseLogs']])
-            ])
-            
-            avg_adherence = np.mean([
-                log1['adherencePercentage'],
-                log2['adherencePercentage'],
-                log3['adherencePercentage']
-            ])
-            
-            avg_rating = np.mean([
-                log1['overallRating'],
-                log2['overallRating'],
-                log3['overallRating']
-            ])
-            
-            # Determine if plan was adjusted after these logs
-            # In real application, this would be based on actual data
-            # For simulation, we'll use a heuristic
-            should_adjust = (avg_pain > 7 and avg_adherence < 70) or (avg_pain < 3 and avg_adherence > 90)
-            
-            # Determine adjustment type
-            adjustment_type = 'no_change'
-            if avg_pain > 7 and avg_adherence < 70:
-                adjustment_type = 'decrease_difficulty'
-            elif avg_pain < 3 and avg_adherence > 90:
-                adjustment_type = 'increase_difficulty'
-            
-            data.append({
-                'avg_pain': avg_pain,
-                'avg_adherence': avg_adherence,
-                'avg_rating': avg_rating,
-                'should_adjust': should_adjust,
-                'adjustment_type': adjustment_type
-            })
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    # Mean exercise pain of every progress log
+    log_row = exercise_logs['progress'].to_numpy()
+    pain_sum = np.bincount(log_row, weights=exercise_logs['pain_level'].to_numpy(), minlength=len(progress))
+    pain_count = np.bincount(log_row, minlength=len(progress))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_pain = pain_sum / pain_count
+    
+    # Logs of known plans, grouped by plan in order of first appearance and sorted by date
+    logs = pd.DataFrame({
+        'plan': pd.factorize(progress['plan_id'])[0],
+        'date': progress['date'].to_numpy(),
+        'pain': log_pain,
+        'adherence': progress['adherence'].to_numpy(),
+        'rating': progress['rating'].to_numpy()
+    })
+    logs = logs[progress['plan_id'].isin(set(plans['id'])).to_numpy()]
+    logs = logs.sort_values(['plan', 'date'], kind='stable')
+    
+    # Every run of `window` consecutive sorted logs that stays within one plan
+    plan_codes = logs['plan'].to_numpy()
+    if len(plan_codes) >= window:
+        starts = np.flatnonzero(plan_codes[:len(plan_codes) - window + 1] == plan_codes[window - 1:])
+    else:
+        starts = np.empty(0, dtype=np.int64)
+    
+    def window_means(column):
+        return sliding_window_view(logs[column].to_numpy(), window).mean(axis=1)[starts] if len(starts) else np.empty(0)
+    
+    avg_pain = window_means('pain')
+    avg_adherence = window_means('adherence')
+    avg_rating = window_means('rating')
+    
+    # Determine if plan was adjusted after these logs
+    # In real application, this would be based on actual data
+    # For simulation, we'll use a heuristic
+    decrease = (avg_pain > 7) & (avg_adherence < 70)
+    increase = (avg_pain < 3) & (avg_adherence > 90)
+    
+    df = pd.DataFrame({
+        'avg_pain': avg_pain,
+        'avg_adherence': avg_adherence,
+        'avg_rating': avg_rating,
+        'should_adjust': decrease | increase,
+        'adjustment_type': np.select(
+            [decrease, increase], ['decrease_difficulty', 'increase_difficulty'], 'no_change'
+        ).astype(object)
+    })
     print(f"Created {len(df)} training examples for plan adjustment.")
     return df
 
-def train_exercise_recommendation_model(df):
-    """Train a model to recommend exercises based on patient and condition data"""
-    print("Training exercise recommendation model...")
+def encode_exercise_features(df):
+    """One-hot encode the patient features of the exercise recommendation examples"""
+    print("Encoding features for exercise recommendation model...")
     
     # Prepare features and target
     X = df[['body_part', 'pain_level', 'pain_location', 'previous_injuries', 
             'surgical_history', 'primary_goal']]
-    y_difficulty = df['exercise_difficulty']
-    y_sets = df['sets']
-    y_reps = df['reps']
     
     # Encode categorical features
-    categorical_features = ['body_part', 'pain_location', 'previous_injuries', 
-                           'surgical_history', 'primary_goal']
-    encoder = OneHotEncoder(sparse=False, handle_unknown='ignore')
+    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
     X_cat = pd.DataFrame(
-        encoder.fit_transform(X[categorical_features]),
-        columns=encoder.get_feature_names_out(categorical_features)
+        encoder.fit_transform(X[CATEGORICAL_FEATURES]),
+        columns=encoder.get_feature_names_out(CATEGORICAL_FEATURES)
     )
     
-    # Combine with numerical features
+    # Combine with numerical features into one float matrix, which the cache maps back in one piece
     X_num = X[['pain_level']].reset_index(drop=True)
-    X_processed = pd.concat([X_num, X_cat], axis=1)
-    
-    # Split data
-    X_train, X_test, y_train_diff, y_test_diff = train_test_split(
-        X_processed, y_difficulty, test_size=0.2, random_state=42
-    )
-    _, _, y_train_sets, y_test_sets = train_test_split(
-        X_processed, y_sets, test_size=0.2, random_state=42
-    )
-    _, _, y_train_reps, y_test_reps = train_test_split(
-        X_processed, y_reps, test_size=0.2, random_state=42
+    X_processed = pd.concat([X_num, X_cat], axis=1).astype(np.float64)
+    return {
+        'X': X_processed,
+        'y_difficulty': df['exercise_difficulty'],
+        'y_sets': df['sets'],
+        'y_reps': df['reps'],
+        'encoder': encoder
+    }
+
+def split_exercise_data(encoded):
+    """Split encoded exercise examples into training and test sets, the same rows for every target"""
+    (X_train, X_test, y_train_diff, y_test_diff, y_train_sets, y_test_sets,
+     y_train_reps, y_test_reps) = train_test_split(
+        encoded['X'], encoded['y_difficulty'], encoded['y_sets'], encoded['y_reps'],
+        test_size=TEST_SIZE, random_state=RANDOM_STATE
     )
+    return {
+        'X_train': X_train, 'X_test': X_test,
+        'y_train_diff': y_train_diff, 'y_test_diff': y_test_diff,
+        'y_train_sets': y_train_sets, 'y_test_sets': y_test_sets,
+        'y_train_reps': y_train_reps, 'y_test_reps': y_test_reps
+    }
+
+def train_exercise_recommendation_model(df):
+    """Train a model to recommend exercises based on patient and condition data"""
+    encoded = encode_exercise_features(df)
+    return fit_exercise_recommendation_model(split_exercise_data(encoded), encoded['encoder'])
+
+def fit_exercise_recommendation_model(split, encoder):
+    """Fit, evaluate and save the exercise recommendation models on split data"""
+    print("Training exercise recommendation model...")
     
-     # Train models for difficulty, sets, and reps
+    X_train, X_test = split['X_train'], split['X_test']
+    y_train_diff, y_test_diff = split['y_train_diff'], split['y_test_diff']
+    y_train_sets, y_test_sets = split['y_train_sets'], split['y_test_sets']
+    y_train_reps, y_test_reps = split['y_train_reps'], split['y_test_reps']
+    
+    # Train models for difficulty, sets, and reps
     # Decision Tree for difficulty level (categorical)
     dt_diff = DecisionTreeClassifier(max_depth=5, random_state=42)
     dt_diff.fit(X_train, y_train_diff)
@@ -233,26 +205,47 @@ def train_exercise_recommendation_model(df):
     print("Exercise recommendation models saved.")
     return dt_diff, rf_sets, rf_reps, encoder
 
-def train_plan_adjustment_model(df):
-    """Train a model to decide when and how to adjust rehabilitation plans"""
-    print("Training plan adjustment model...")
+def encode_plan_adjustment_features(df):
+    """Standardize the progress features of the plan adjustment examples"""
+    print("Encoding features for plan adjustment model...")
     
     # Prepare features and targets
     X = df[['avg_pain', 'avg_adherence', 'avg_rating']]
-    y_should_adjust = df['should_adjust']
-    y_adjustment_type = df['adjustment_type']
     
     # Normalize numerical features
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
-    
-    # Split data
-    X_train, X_test, y_train_adj, y_test_adj = train_test_split(
-        X_scaled, y_should_adjust, test_size=0.2, random_state=42
-    )
-    _, _, y_train_type, y_test_type = train_test_split(
-        X_scaled, y_adjustment_type, test_size=0.2, random_state=42
+    return {
+        'X': X_scaled,
+        'y_should_adjust': df['should_adjust'],
+        'y_adjustment_type': df['adjustment_type'],
+        'scaler': scaler
+    }
+
+def split_plan_adjustment_data(encoded):
+    """Split encoded plan adjustment examples into training and test sets"""
+    (X_train, X_test, y_train_adj, y_test_adj, y_train_type, y_test_type) = train_test_split(
+        encoded['X'], encoded['y_should_adjust'], encoded['y_adjustment_type'],
+        test_size=TEST_SIZE, random_state=RANDOM_STATE
     )
+    return {
+        'X_train': X_train, 'X_test': X_test,
+        'y_train_adj': y_train_adj, 'y_test_adj': y_test_adj,
+        'y_train_type': y_train_type, 'y_test_type': y_test_type
+    }
+
+def train_plan_adjustment_model(df):
+    """Train a model to decide when and how to adjust rehabilitation plans"""
+    encoded = encode_plan_adjustment_features(df)
+    return fit_plan_adjustment_model(split_plan_adjustment_data(encoded), encoded['scaler'])
+
+def fit_plan_adjustment_model(split, scaler):
+    """Fit, evaluate and save the plan adjustment models on split data"""
+    print("Training plan adjustment model...")
+    
+    X_train, X_test = split['X_train'], split['X_test']
+    y_train_adj, y_test_adj = split['y_train_adj'], split['y_test_adj']
+    y_train_type, y_test_type = split['y_train_type'], split['y_test_type']
     
     # Train models
     # Decision Tree for adjustment decision (binary)
@@ -298,11 +291,9 @@ def test_models_with_sample_data(encoder, dt_diff, rf_sets, rf_reps, scaler, dt_
     sample_df = pd.DataFrame([sample_patient])
     
     # Encode categorical features
-    categorical_features = ['body_part', 'pain_location', 'previous_injuries', 
-                           'surgical_history', 'primary_goal']
     X_cat = pd.DataFrame(
-        encoder.transform(sample_df[categorical_features]),
-        columns=encoder.get_feature_names_out(categorical_features)
+        encoder.transform(sample_df[CATEGORICAL_FEATURES]),
+        columns=encoder.get_feature_names_out(CATEGORICAL_FEATURES)
     )
     
     # Combine with numerical features
@@ -357,23 +348,63 @@ def test_models_with_sample_data(encoder, dt_diff, rf_sets, rf_reps, scaler, dt_
     print(f"Should adjust plan: {should_adjust}")
     print(f"Recommended adjustment: {adjustment_type}")
 
-def main():
-    """Main function to run the model training pipeline"""
-    # Create models directory
-    os.makedirs('models', exist_ok=True)
+def run_pipeline(cache, data_dir=DATA_DIR, window=ADJUSTMENT_WINDOW):
+    """Load, prepare, encode and split the training data, reusing every stage the cache holds.
+
+    Returns the split data for both models and the fitted encoder and scaler.
+    """
+    data_files = source_files(data_dir)
+    if not data_files:
+        raise FileNotFoundError(f"No simulated data in {data_dir}; run data_generator.py first")
     
     # Load data
-    patients, plans, progress_logs = load_data()
+    tables = cache.run('load', lambda: load_data(data_dir),
+                       inputs=[cache.fingerprint_files(data_files, data_dir)])
+    
+    # Prepare data for exercise recommendation and plan adjustment
+    prepared = cache.run('prepare', lambda: {
+        'exercise': prepare_data_for_exercise_recommendation(
+            tables['patients'], tables['plans'], tables['plan_exercises']
+        ),
+        'adjustment': prepare_data_for_plan_adjustment(
+            tables['plans'], tables['progress'], tables['exercise_logs'], window
+        )
+    }, inputs=[tables], params={'window': window})
+    
+    # Encode features
+    encoded = cache.run('encode', lambda: {
+        'exercise': encode_exercise_features(prepared['exercise']),
+        'adjustment': encode_plan_adjustment_features(prepared['adjustment'])
+    }, inputs=[prepared], params={'categorical_features': CATEGORICAL_FEATURES})
+    
+    # Split data
+    split = cache.run('split', lambda: {
+        'exercise': split_exercise_data(encoded['exercise']),
+        'adjustment': split_plan_adjustment_data(encoded['adjustment'])
+    }, inputs=[encoded], params={'test_size': TEST_SIZE, 'random_state': RANDOM_STATE})
+    
+    return split, encoded['exercise']['encoder'], encoded['adjustment']['scaler']
+
+def main(argv=None):
+    """Main function to run the model training pipeline"""
+    parser = argparse.ArgumentParser(description="Train the plan models on the simulated data")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help="recompute every stage and cache nothing")
+    args = parser.parse_args(argv)
     
-    # Prepare data for exercise recommendation
-    exercise_df = prepare_data_for_exercise_recommendation(patients, plans)
+    # Create models directory
+    os.makedirs('models', exist_ok=True)
     
-    # Prepare data for plan adjustment
-    adjustment_df = prepare_data_for_plan_adjustment(plans, progress_logs)
+    # Load, prepare, encode and split the data; unchanged stages come from the cache
+    cache = FeatureCache(args.cache_dir, enabled=not args.no_cache,
+                         code_paths=[__file__, data_loader.__file__])
+    split, encoder, scaler = run_pipeline(cache, args.data_dir)
+    cache.print_report()
     
     # Train models
-    dt_diff, rf_sets, rf_reps, encoder = train_exercise_recommendation_model(exercise_df)
-    dt_adjust, rf_type, scaler = train_plan_adjustment_model(adjustment_df)
+    dt_diff, rf_sets, rf_reps, encoder = fit_exercise_recommendation_model(split['exercise'], encoder)
+    dt_adjust, rf_type, scaler = fit_plan_adjustment_model(split['adjustment'], scaler)
     
     # Test models
     test_models_with_sample_data(encoder, dt_diff, rf_sets, rf_reps, scaler, dt_adjust, rf_type)
@@ -381,4 +412,4 @@ def main():
     print("\nModel training complete. The models are ready for use in the application.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
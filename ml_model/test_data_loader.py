@@ -0,0 +1,29 @@
+# test_data_loader.py - JSONL chunk boundaries
+#
+# Run from the ml_model directory: python -m pytest test_data_loader.py
+import json
+
+import data_loader
+from data_loader import SOURCES, _read_jsonl_range, load_records
+
+
+def test_ranges_ending_on_a_line_break_do_not_share_a_line(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    path.write_bytes(b'{"a":1}\n{"a":2}\n{"a":3}\n')
+    ranges = [(0, 8), (8, 16), (16, 24)]
+    assert [_read_jsonl_range(str(path), start, end) for start, end in ranges] == [[{'a': 1}], [{'a': 2}], [{'a': 3}]]
+
+
+def test_chunk_size_does_not_change_the_records(tmp_path, monkeypatch):
+    for entity, (jsonl_name, _, _) in SOURCES.items():
+        with open(tmp_path / jsonl_name, 'w') as f:
+            for i in range(200):
+                f.write(json.dumps({'entity': entity, 'id': i, 'pad': 'x' * (i % 13)}) + '\n')
+    expected = load_records(str(tmp_path))
+    assert [len(records) for records in expected] == [200, 200, 200]
+
+    line_length = len(json.dumps({'entity': 'plans', 'id': 0, 'pad': ''})) + 1
+    # Every size in a range around the line lengths, so many chunks end exactly on a line break
+    for chunk_bytes in range(line_length // 2, 3 * line_length):
+        monkeypatch.setattr(data_loader, 'JSONL_CHUNK_BYTES', chunk_bytes)
+        assert load_records(str(tmp_path)) == expected